@@ -33,10 +33,17 @@ if DEVICE == "cuda":
 else:
     print("WARNING: CUDA not found. Running on CPU (slower).")
 
-print(f"Loading Whisper model ({MODEL_SIZE})...")
-model = whisper.load_model(MODEL_SIZE, device=DEVICE)
-print("Whisper model loaded.")
-print("Whisper model loaded.")
+# Models are owned by the registry: loaded on first use (or up front with
+# MODEL_PRELOAD, see preload_from_env below), once per process
+from utilities.model_registry import registry, preload_from_env
+
+WHISPER_MODEL = f"whisper-{MODEL_SIZE}"
+registry.register(
+    WHISPER_MODEL,
+    lambda: whisper.load_model(MODEL_SIZE, device=DEVICE),
+    # One second of silence: the first real request doesn't pay for kernel setup
+    warmup=lambda m: m.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, fp16=(DEVICE == "cuda")),
+)
 
 # Lock for thread safety
 import threading
@@ -94,7 +101,7 @@ def transcribe():
             # fp16=True is safe and faster on CUDA, but not CPU
             use_fp16 = (DEVICE == "cuda")
             # beam_size=1 (greedy) is much faster and prevents queue buildup during real-time streaming
-            result = model.transcribe(audio, beam_size=1, fp16=use_fp16) 
+            result = registry.get(WHISPER_MODEL).transcribe(audio, beam_size=1, fp16=use_fp16)
         text = result['text']
         language = result['language']
         
@@ -123,37 +130,36 @@ def transcribe():
 
 
 # --- RAG / Weaviate Integration ---
-import weaviate
-from sentence_transformers import SentenceTransformer
+from utilities.weaviate_manager import client_pool
+from utilities.embedding_cache import cached_encode, get_cache
+from utilities.embedder import EMBEDDING_MODEL, EMBEDDING_BACKEND, encode_batches, register_model
 
-print("Loading Embedding Model (all-MiniLM-L6-v2)...")
-# Initialize embedding model on the same device as Whisper (or CUDA if available)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device=DEVICE)
-print("Embedding Model Loaded.")
+# The configured embedding model (EMBEDDING_MODEL / EMBEDDING_BACKEND) through the registry:
+# the same copy generate_embeddings uses. Its registry name is also its embedding cache namespace.
+EMBEDDING_MODEL_ID = register_model(EMBEDDING_MODEL, EMBEDDING_BACKEND)
 
 def search_weaviate(query_text, limit=5):
     """
     Search Weaviate for similar chunks
     """
     try:
-        # Generate vector
-        vector = embedding_model.encode(query_text, convert_to_numpy=True).tolist()
-        
-        # Connect to Weaviate (Local 8081)
-        client = weaviate.connect_to_local(
-            port=8081,
-            grpc_port=50052
-        )
+        # Generate vector (repeated queries come from the embedding cache)
+        vector = cached_encode(
+            [query_text],
+            lambda texts: registry.get(EMBEDDING_MODEL_ID).encode(texts, convert_to_numpy=True),
+            EMBEDDING_MODEL_ID,
+            get_cache(),
+        )[0].tolist()
         
-        collection = client.collections.get("ContractChunk")
-        
-        results = collection.query.near_vector(
-            near_vector=vector,
-            limit=limit,
-            return_properties=["text", "section", "clause_number", "document_id", "contract_type"]
-        )
-        
-        client.close()
+        # Long-lived pooled connection (WEAVIATE_HOST / WEAVIATE_HTTP_PORT / WEAVIATE_GRPC_PORT)
+        with client_pool().connection() as client:
+            collection = client.collections.get("ContractChunk")
+
+            results = collection.query.near_vector(
+                near_vector=vector,
+                limit=limit,
+                return_properties=["text", "section", "clause_number", "document_id", "contract_type"]
+            )
         
         # Format results
         hits = []
@@ -186,16 +192,61 @@ def query_rag():
     return jsonify({'results': results})
 
 # --- New Endpoint for Continuous Learning ---
-from utilities.text_cleaner import clean_contract_text
-from utilities.contract_parser import parse_contract
-from utilities.chunker import create_hierarchical_chunks
-from utilities.weaviate_manager import batch_insert_chunks
+from utilities.weaviate_manager import submit_chunks, get_inserter, replace_batch_documents
+from utilities.pipeline import contract_documents, ingest_documents
+from utilities.metrics import Metrics, timed
+from utilities.dedup import DedupIndex
+from utilities.centroid_classifier import load_centroids, refresh_centroids
+from utilities.embed_pool import get_pool
+
+# Canonical chunks of every /process_contracts call, so boilerplate clauses
+# that were already embedded in an earlier call reuse their vectors. It lives as
+# long as the server, so it is kept much smaller than a process_data.py run's
+# (20000 entries: about 30 MB of 384-dim vectors)
+DEDUP_INDEX = DedupIndex(max_entries=int(os.getenv("PROCESS_CONTRACTS_DEDUP_MAX_ENTRIES", "20000")))
+
+# Contract type centroids (None until built): contracts sent without a
+# contract_type are classified by keywords, then by their chunk vectors
+CENTROIDS = load_centroids()
+
+# Worker processes for parsing /process_contracts payloads (1 = in-process)
+PARSE_WORKERS = int(os.getenv("PROCESS_CONTRACTS_PARSE_WORKERS", "1"))
+
+# Load the models listed in MODEL_PRELOAD now (e.g. "all" under gunicorn --preload),
+# so forked workers, including the embedding workers below, share their weights
+preload_from_env()
+
+# Embedding worker processes for /process_contracts (0 = the registry's embedding
+# model, in-process). Started now, before Flask's request threads, so the fork is clean.
+EMBED_PROCESSES = int(os.getenv("PROCESS_CONTRACTS_EMBED_PROCESSES", "0"))
+EMBED_POOL = get_pool(EMBED_PROCESSES, threads=int(os.getenv("PROCESS_CONTRACTS_EMBED_THREADS", "0")),
+                      model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND)
+if EMBED_POOL is not None:
+    EMBED_POOL.warmup()
+
+@timed("embed", items=lambda result, chunks: len(chunks))
+def encode_chunks(chunks):
+    """
+    Embeds chunks with the registry's embedding model (pipeline embed stage).
+    Chunks already in the embedding cache are not sent to the model.
+    """
+    token_counts = {c["text"]: c.get("token_count") for c in chunks}
+    embeddings = cached_encode(
+        [c["text"] for c in chunks],
+        lambda texts: encode_batches(registry.get(EMBEDDING_MODEL_ID), texts, [token_counts.get(t) for t in texts]),
+        EMBEDDING_MODEL_ID,
+        get_cache(),
+    )
+    for i, chunk in enumerate(chunks):
+        chunk["vector"] = embeddings[i]  # row view of the batch's float32 array
+    return chunks
 
 @app.route('/process_contracts', methods=['POST'])
 def process_contracts():
     """
     Endpoint to process a batch of contracts from the backend.
     Payload: { "contracts": [ { "text": "...", "document_id": "...", "contract_type": "..." } ] }
+    Every contract needs a document_id (400 otherwise): it determines its chunk ids.
     """
     data = request.json
     contracts = data.get('contracts', [])
@@ -205,51 +256,65 @@ def process_contracts():
 
     print(f"Received batch of {len(contracts)} contracts for RAG processing...")
     
-    processed_count = 0
-    chunk_buffer = []
-    
     try:
-        for doc in contracts:
-            raw_text = doc.get("text", "")
-            doc_id = doc.get("document_id", "unknown")
-            c_type = doc.get("contract_type", "General")
-            
-            if not raw_text:
-                continue
-                
-            # 1. Pipeline Steps
-            cleaned_text = clean_contract_text(raw_text)
-            parsed_structure = parse_contract(cleaned_text)
-            doc_chunks = create_hierarchical_chunks(parsed_structure, doc_id)
-            
-            # 2. Add metadata
-            for chunk in doc_chunks:
-                chunk["contract_type"] = c_type
-            
-            chunk_buffer.extend(doc_chunks)
-            processed_count += 1
-        
-        if chunk_buffer:
-            print(f"Generating embeddings for {len(chunk_buffer)} new chunks...")
-            # Use the global embedding_model initialized above
-            embeddings = embedding_model.encode(
-                [c["text"] for c in chunk_buffer], 
-                batch_size=256, 
-                convert_to_numpy=True
-            ).tolist()
-            
-            for i, chunk in enumerate(chunk_buffer):
-                chunk["vector"] = embeddings[i]
-            
-            print(f"Inserting {len(chunk_buffer)} chunks to Weaviate...")
-            batch_insert_chunks(chunk_buffer)
+        docs = contract_documents(contracts)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    metrics = Metrics()
+    try:
+        # Same parse -> embed -> insert pipeline as process_data.py
+        # (embed threads: INGEST_EMBED_WORKERS; inserts run in the background: INSERT_BATCH_SIZE / INSERT_CONCURRENCY)
+        stats = ingest_documents(
+            docs,
+            embed_fn=EMBED_POOL if EMBED_POOL is not None else encode_chunks,
+            insert_fn=submit_chunks,
+            parse_workers=PARSE_WORKERS,
+            batch_size=256,
+            metrics=metrics,
+            dedup_index=DEDUP_INDEX,
+            centroids=CENTROIDS,
+            # Contracts are re-sent when updated: each inserted document replaces its previous chunks
+            on_batch=replace_batch_documents,
+        )
+        processed_count = stats["documents"] - stats["failed_documents"]
+        print(f"Inserted {stats['inserted_chunks']} of {stats['chunks']} chunks to Weaviate.")
             
-        return jsonify({'success': True, 'processed_contracts': processed_count, 'chunks_inserted': len(chunk_buffer)})
+        return jsonify({
+            'success': True,
+            'processed_contracts': processed_count,
+            'chunks_inserted': stats['inserted_chunks'],
+            'centroid_classified': stats['centroid_classified'],
+            'insert': get_inserter().report(),
+            'metrics': metrics.summary(),
+        })
         
     except Exception as e:
         print(f"Error in /process_contracts: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/models', methods=['GET'])
+def models():
+    """
+    Registered models: loaded or not, load/warmup time and memory.
+    """
+    return jsonify(registry.report())
+
+@app.route('/refresh_centroids', methods=['POST'])
+def refresh_contract_centroids():
+    """
+    Rebuilds the contract type centroids from the labeled chunks in Weaviate,
+    stores them and starts using them for /process_contracts.
+    """
+    global CENTROIDS
+    try:
+        centroids = refresh_centroids()
+    except Exception as e:
+        print(f"Error refreshing centroids: {e}")
+        return jsonify({'error': str(e)}), 500
+    CENTROIDS = centroids if len(centroids) else None
+    return jsonify({'success': True, 'contract_types': dict(zip(centroids.labels, centroids.counts))})
+
 if __name__ == '__main__':
     # Run on port 5001 to avoid conflict with Express backend (port 5000)
     app.run(debug=True, use_reloader=False, port=5001)
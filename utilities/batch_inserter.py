@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+import numpy as np
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utilities.metrics import Metrics, current
+
+# Background insertion: objects are sent to Weaviate by `INSERT_CONCURRENCY`
+# threads in requests of `INSERT_BATCH_SIZE`. Failed objects are retried with
+# exponential backoff, then written to a dead-letter file that can be replayed.
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "200"))      # objects per request
+INSERT_CONCURRENCY = int(os.getenv("INSERT_CONCURRENCY", "2"))      # requests in flight
+INSERT_QUEUE_SIZE = int(os.getenv("INSERT_QUEUE_SIZE", "8"))        # requests waiting; submit() blocks beyond
+INSERT_MAX_RETRIES = int(os.getenv("INSERT_MAX_RETRIES", "5"))      # attempts after the first one
+INSERT_BACKOFF_BASE = float(os.getenv("INSERT_BACKOFF_BASE", "0.5"))  # seconds before the first retry
+INSERT_BACKOFF_MAX = float(os.getenv("INSERT_BACKOFF_MAX", "30"))     # cap of the doubling delay
+INSERT_DEAD_LETTER_PATH = os.getenv(
+    "INSERT_DEAD_LETTER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "insert_dead_letter.jsonl"),
+)
+
+# An object to insert: { "properties": dict, "vector": sequence of floats, "uuid": optional str }
+InsertObject = Dict[str, Any]
+# Sends objects in one request; returns { index in `objects`: error message } for
+# the objects that failed, and raises if the request as a whole failed.
+InsertObjectsFn = Callable[[List[InsertObject]], Dict[int, str]]
+
+class _Job:
+    """
+    The objects of one submit() call, sent as one or more requests.
+    """
+
+    def __init__(self, requests: int, failed: int, metrics: Metrics):
+        self.remaining = requests
+        self.failed = failed
+        self.metrics = metrics
+        self.future: Future = Future()
+        self.lock = threading.Lock()
+
+    def request_done(self, failed: int):
+        with self.lock:
+            self.failed += failed
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done:
+            self.future.set_result(self.failed == 0)
+
+_STOP = object()
+
+class BatchInserter:
+    """
+    Inserts objects in the background. submit() queues them in requests of
+    `batch_size` and returns a Future (True if every object was inserted);
+    `concurrency` threads send the requests. When Weaviate falls behind and
+    `queue_size` requests are waiting, submit() blocks: the pipeline stages
+    feeding it slow down instead of piling batches up in memory.
+
+    Objects that fail (the whole request, or individually) are retried up to
+    `max_retries` times, with exponential backoff (doubling from
+    `backoff_base`, capped at `backoff_max`, with jitter). Objects that still
+    fail are appended to the dead-letter file (see replay_dead_letters).
+    """
+
+    def __init__(self, insert_objects: InsertObjectsFn, to_object: Optional[Callable[[Any], Optional[InsertObject]]] = None,
+                 batch_size: int = INSERT_BATCH_SIZE, concurrency: int = INSERT_CONCURRENCY,
+                 queue_size: int = INSERT_QUEUE_SIZE, max_retries: int = INSERT_MAX_RETRIES,
+                 backoff_base: float = INSERT_BACKOFF_BASE, backoff_max: float = INSERT_BACKOFF_MAX,
+                 dead_letter_path: str = INSERT_DEAD_LETTER_PATH, sleep: Callable[[float], None] = time.sleep):
+        self.insert_objects = insert_objects
+        self.to_object = to_object
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dead_letter_path = dead_letter_path
+        self._sleep = sleep
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._closed = False
+        self.stats = {"objects": 0, "inserted": 0, "retried": 0, "dead_lettered": 0, "skipped": 0,
+                      "requests": 0, "request_seconds": 0.0}
+        self._threads = [threading.Thread(target=self._work, name=f"batch-inserter-{i}", daemon=True)
+                         for i in range(self.concurrency)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, items: Iterable[Any]) -> "Future[bool]":
+        """
+        Queues `items` (converted by to_object; items it maps to None are
+        skipped and count as failed). Blocks while the queue is full.
+        Raises RuntimeError once the inserter is closed.
+        """
+        return self._submit(items).future
+
+    def _submit(self, items: Iterable[Any], convert: bool = True) -> _Job:
+        objects, skipped = [], 0
+        for item in items:
+            obj = self.to_object(item) if convert and self.to_object is not None else item
+            if obj is None:
+                skipped += 1
+            else:
+                objects.append(obj)
+
+        requests = [objects[i:i + self.batch_size] for i in range(0, len(objects), self.batch_size)]
+        job = _Job(len(requests), skipped, current())
+        # Held while queueing, so close() cannot queue the stop markers in between
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("BatchInserter is closed")
+            with self._lock:
+                if self._started_at is None:
+                    self._started_at = time.perf_counter()
+                self.stats["objects"] += len(objects)
+                self.stats["skipped"] += skipped
+            if not requests:
+                job.future.set_result(skipped == 0)
+            for request in requests:
+                self._queue.put((job, request))
+        return job
+
+    def __call__(self, items: Iterable[Any]) -> bool:
+        """
+        Synchronous insert: submit() and wait.
+        """
+        return self.submit(items).result()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            job, objects = task
+            try:
+                with job.metrics.activate():
+                    failed = self._send(objects)
+            except Exception as e:  # never let a worker die: the job would never complete
+                print(f"Insert worker error: {e}")
+                failed = len(objects)
+            job.request_done(failed)
+
+    def _send(self, objects: List[InsertObject]) -> int:
+        """
+        Inserts `objects`, retrying failures. Returns the number dead-lettered.
+        """
+        metrics = current()
+        pending = objects
+        errors: Dict[int, str] = {}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.record("insert_retry", items=len(pending), calls=0)
+                with self._lock:
+                    self.stats["retried"] += len(pending)
+                self._sleep(self._backoff(attempt - 1))
+
+            start = time.perf_counter()
+            try:
+                errors = self.insert_objects(pending)
+            except Exception as e:
+                errors = {i: str(e) for i in range(len(pending))}
+            elapsed = time.perf_counter() - start
+
+            inserted = len(pending) - len(errors)
+            metrics.record("insert_request", elapsed, items=inserted, errors=len(errors))
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["request_seconds"] += elapsed
+                self.stats["inserted"] += inserted
+            if not errors:
+                return 0
+            pending = [pending[i] for i in sorted(errors)]
+            errors = {new: errors[old] for new, old in enumerate(sorted(errors))}
+
+        print(f"Giving up on {len(pending)} objects after {self.max_retries} retries "
+              f"(e.g. {next(iter(errors.values()))}): written to {self.dead_letter_path}")
+        self._dead_letter(pending, errors)
+        metrics.record("insert_dead_letter", items=len(pending), calls=0)
+        with self._lock:
+            self.stats["dead_lettered"] += len(pending)
+        return len(pending)
+
+    def _dead_letter(self, objects: List[InsertObject], errors: Dict[int, str]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+        now = time.time()
+        with self._dead_letter_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for i, obj in enumerate(objects):
+                f.write(json.dumps({
+                    "uuid": obj.get("uuid"),
+                    "properties": obj["properties"],
+                    "vector": np.asarray(obj["vector"], dtype=np.float32).tolist(),
+                    "error": errors.get(i, ""),
+                    "attempts": self.max_retries + 1,
+                    "failed_at": now,
+                }) + "\n")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Counters, and the insertion rate: inserted objects per second since
+        the first submit() (wall clock) and per second of request time.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            wall = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        stats["request_seconds"] = round(stats["request_seconds"], 3)
+        stats["objects_per_sec"] = round(stats["inserted"] / wall, 1) if wall else 0.0
+        stats["objects_per_request_sec"] = (round(stats["inserted"] / stats["request_seconds"], 1)
+                                            if stats["request_seconds"] else 0.0)
+        return stats
+
+    def close(self):
+        """
+        Waits for the queued requests, then stops the threads. Later calls
+        (e.g. the atexit hook of get_inserter) do nothing; later submit()
+        calls raise.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+def read_dead_letters(path: str = INSERT_DEAD_LETTER_PATH) -> List[InsertObject]:
+    objects = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                objects.append({"uuid": record.get("uuid"), "properties": record["properties"], "vector": record["vector"]})
+    return objects
+
+def replay_dead_letters(inserter: BatchInserter, path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Re-submits every object of the dead-letter file (already Weaviate
+    objects: to_object is not applied). The file is moved aside first, so
+    objects that fail again end up in a fresh dead-letter file. `failed`
+    counts only the replayed objects, even if other submits run meanwhile.
+    """
+    path = path or inserter.dead_letter_path
+    if not os.path.exists(path):
+        return {"replayed": 0, "failed": 0}
+    replaying = path + ".replaying"
+    os.replace(path, replaying)
+    objects = read_dead_letters(replaying)
+    job = inserter._submit(objects, convert=False)
+    job.future.result()
+    failed = job.failed
+    os.remove(replaying)
+    return {"replayed": len(objects), "failed": failed}
+
+if __name__ == "__main__":  # pragma: no cover
+    # python -m utilities.batch_inserter --replay (from the project root)
+    parser = argparse.ArgumentParser(description="Replay the objects of the insert dead-letter file into Weaviate.")
+    parser.add_argument("--replay", action="store_true", help="Re-insert the dead-lettered objects.")
+    parser.add_argument("--path", default=INSERT_DEAD_LETTER_PATH, help="Dead-letter file. Default: $INSERT_DEAD_LETTER_PATH.")
+    args = parser.parse_args()
+    if args.replay:
+        from utilities.weaviate_manager import get_inserter
+
+        inserter = get_inserter()
+        result = replay_dead_letters(inserter, args.path)
+        inserter.close()
+        print(f"Replayed {result['replayed']} objects, {result['failed']} failed again.")
+    else:
+        parser.print_help()
@@ -0,0 +1,104 @@
+"""
+Embedding batching benchmark on the real mix of chunk levels (short level-1
+clause chunks, up-to-1200-token level-2 section chunks) of a synthetic corpus:
+- fixed: batch_size texts per batch, in arrival order (the previous
+  generate_embeddings call; "fixed_sorted" is the same after
+  SentenceTransformer.encode's own sort by text length)
+- token_budget: embedder.token_batches (longest first, batches sized by
+  padded tokens)
+
+Padding (padded tokens / real tokens, lengths capped at the model's
+max_seq_length) needs no model. --encode also times model.encode for each
+strategy (needs sentence-transformers and the model weights).
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_batching --docs 20 --token-budget 16384 --encode --out batching.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import Any, Dict, List
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.embedder import token_batches, encode_batches, EMBEDDING_MODEL, EMBEDDING_TOKEN_BUDGET
+from utilities.benchmarks.bench_embedder import corpus_chunks
+
+def fixed_batches(count: int, batch_size: int) -> List[List[int]]:
+    return [list(range(i, min(i + batch_size, count))) for i in range(0, count, batch_size)]
+
+def padding(lengths: List[int], batches: List[List[int]]) -> Dict[str, Any]:
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    real = sum(lengths)
+    return {
+        "batches": len(batches),
+        "padded_tokens": padded,
+        "padding_ratio": round(padded / real, 3) if real else None,
+        "largest_batch_tokens": max(len(batch) * max(lengths[i] for i in batch) for batch in batches),
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Embedding batching benchmark (padding and throughput).")
+    parser.add_argument("--docs", type=int, default=20, help="Synthetic contracts to chunk.")
+    parser.add_argument("--batch-size", type=int, default=512, help="Texts per batch of the fixed strategy.")
+    parser.add_argument("--token-budget", type=int, default=EMBEDDING_TOKEN_BUDGET, help="Padded tokens per batch.")
+    parser.add_argument("--max-seq-length", type=int, default=256, help="Model truncation length (all-MiniLM-L6-v2: 256).")
+    parser.add_argument("--encode", action="store_true", help="Also time model.encode (needs the model).")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    chunks = corpus_chunks(args.docs, seed=args.seed)
+    texts = [chunk["text"] for chunk in chunks]
+    lengths = [min(chunk["token_count"], args.max_seq_length) for chunk in chunks]
+    by_length = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+
+    strategies = {
+        "fixed": fixed_batches(len(texts), args.batch_size),
+        "fixed_sorted": [[by_length[i] for i in batch] for batch in fixed_batches(len(texts), args.batch_size)],
+        "token_budget": token_batches(lengths, args.token_budget, max_batch=args.batch_size),
+    }
+    results = {
+        "benchmark": "batching",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "chunks": len(texts),
+        "chunks_per_level": {str(level): sum(c["chunk_level"] == level for c in chunks) for level in (1, 2, 3)},
+        "strategies": {name: padding(lengths, batches) for name, batches in strategies.items()},
+    }
+
+    if args.encode:
+        from utilities.embedder import load_model
+
+        model = load_model(args.model)
+        model.encode(texts[:8], batch_size=8, convert_to_numpy=True)  # warmup
+
+        t0 = time.perf_counter()
+        fixed = np.asarray(model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True), dtype=np.float32)
+        results["strategies"]["fixed_sorted"]["encode_seconds"] = round(time.perf_counter() - t0, 3)
+
+        t0 = time.perf_counter()
+        budget = encode_batches(model, texts, [c["token_count"] for c in chunks], args.token_budget)
+        results["strategies"]["token_budget"]["encode_seconds"] = round(time.perf_counter() - t0, 3)
+        # Same vectors, same order (up to float noise from different batch shapes)
+        results["max_abs_diff"] = float(np.abs(fixed - budget).max())
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
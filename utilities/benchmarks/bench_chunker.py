@@ -0,0 +1,141 @@
+"""
+Token accounting benchmark for chunker.create_hierarchical_chunks.
+
+Compares the current chunker (every clause/section tokenized once, in one
+batched call per document) against the previous implementation, which
+re-encoded the growing clause buffer for every clause and re-encoded
+sections for their counts. Uses long synthetic contracts, where sections
+with many clauses made the old approach quadratic.
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_chunker --pages 300 --section-clauses 400 --out chunker.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from typing import Any, Dict, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.text_cleaner import clean_contract_text
+from utilities.contract_parser import parse_contract_index
+from utilities.chunker import create_hierarchical_chunks, get_token_count, chunk_text_semantically
+from utilities.benchmarks.synthetic_corpus import long_contract, _paragraph
+
+def legacy_hierarchical_chunks(parsed_structure: List[Dict[str, Any]], filename: str) -> List[Dict[str, Any]]:
+    """
+    The previous create_hierarchical_chunks, kept as the benchmark baseline.
+    """
+    final_chunks = []
+    total_clauses = sum(len(s.get("clauses", [])) for s in parsed_structure)
+    if len(parsed_structure) <= 1 and total_clauses <= 1:
+        full_text = "\n".join([s["section_text"] for s in parsed_structure])
+        for ch in chunk_text_semantically(full_text, max_tokens=512, overlap=128):
+            final_chunks.append({"document_id": filename, "section": "Fallback", "clause_number": None,
+                                 "chunk_level": 3, "text": ch, "token_count": get_token_count(ch)})
+        return final_chunks
+
+    for sec in parsed_structure:
+        buffer_text = ""
+        buffer_ids = []
+        for clause in sec["clauses"]:
+            combined_text = (buffer_text + "\n" + clause["text"]).strip()
+            if get_token_count(combined_text) > 350 and buffer_text:
+                final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                     "clause_number": ", ".join(str(x) for x in buffer_ids if x), "chunk_level": 1,
+                                     "text": buffer_text, "token_count": get_token_count(buffer_text)})
+                buffer_text = clause["text"]
+                buffer_ids = [clause["number"]]
+            else:
+                buffer_text = combined_text
+                buffer_ids.append(clause["number"])
+        if buffer_text:
+            final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                 "clause_number": ", ".join(str(x) for x in buffer_ids if x), "chunk_level": 1,
+                                 "text": buffer_text, "token_count": get_token_count(buffer_text)})
+
+    for sec in parsed_structure:
+        sec_text = sec["section_text"]
+        if get_token_count(sec_text) <= 1200:
+            final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                 "clause_number": "SECTION_SUMMARY", "chunk_level": 2,
+                                 "text": sec_text, "token_count": get_token_count(sec_text)})
+        else:
+            for sc in chunk_text_semantically(sec_text, max_tokens=1000, overlap=150):
+                final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                     "clause_number": "SECTION_PART", "chunk_level": 2,
+                                     "text": sc, "token_count": get_token_count(sc)})
+    return final_chunks
+
+def wide_section_contract(rng: random.Random, clauses: int) -> str:
+    """
+    One section with many short clauses (schedules, definitions lists).
+    """
+    lines = ["1. Definitions"]
+    for c in range(1, clauses + 1):
+        lines.append(f"({c}) {_paragraph(rng, rng.randint(1, 2))}")
+    return "\n".join(lines)
+
+def _time(fn, parsed, repeat: int) -> Dict[str, Any]:
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chunks = fn(parsed, "bench.pdf")
+        best = min(best, time.perf_counter() - t0)
+    return {"seconds": round(best, 4), "chunks": len(chunks), "tokens": sum(c["token_count"] for c in chunks)}, chunks
+
+def bench_document(name: str, text: str, repeat: int) -> Dict[str, Any]:
+    index = parse_contract_index(clean_contract_text(text))
+    parsed = index.to_parsed_structure()
+    current, new_chunks = _time(create_hierarchical_chunks.__wrapped__, index, repeat)
+    legacy, old_chunks = _time(legacy_hierarchical_chunks, parsed, repeat)
+    return {
+        "document": name,
+        "characters": len(text),
+        "sections": len(parsed),
+        "clauses": sum(len(s["clauses"]) for s in parsed),
+        "legacy": legacy,
+        "current": current,
+        "speedup": round(legacy["seconds"] / current["seconds"], 2) if current["seconds"] else None,
+        # Same chunk boundaries? (token counts may differ slightly: the new ones are summed)
+        "same_chunk_texts": [c["text"] for c in new_chunks] == [c["text"] for c in old_chunks],
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Chunker token accounting benchmark.")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the long synthetic contract.")
+    parser.add_argument("--section-clauses", type=int, default=400, help="Clauses in the single-section contract.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {
+        "benchmark": "chunker",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "documents": [
+            bench_document("long_contract", "\n".join(long_contract(rng, pages=args.pages)), args.repeat),
+            bench_document("wide_section", wide_section_contract(rng, args.section_clauses), args.repeat),
+        ],
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Contract classifier benchmark: the Aho-Corasick KeywordClassifier (one pass
+over the text, whatever the number of terms) against the previous approach
+of one text.count() scan per term, for taxonomies of growing size.
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_classifier --docs 200 --extra-terms 0 500 2000 --out classifier.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import platform
+from typing import Any, Dict, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.classifier import KeywordClassifier, DEFAULT_TAXONOMY
+from utilities.benchmarks.synthetic_corpus import long_contract
+
+def count_classify(taxonomy: Dict[str, List[str]], text: str) -> str:
+    """
+    The previous classify_contract_type, generalized to any taxonomy.
+    """
+    text = text.lower()
+    scores = {category: sum(text.count(term) for term in terms) for category, terms in taxonomy.items()}
+    best_category = max(scores, key=scores.get)
+    return best_category if scores[best_category] else "Other"
+
+def grown_taxonomy(rng: random.Random, extra_terms: int) -> Dict[str, List[str]]:
+    taxonomy = {category: list(terms) for category, terms in DEFAULT_TAXONOMY.items()}
+    for i in range(extra_terms):
+        term = "".join(rng.choice(string.ascii_lowercase + " ") for _ in range(rng.randint(5, 15)))
+        taxonomy.setdefault(f"Category {i % 20}", []).append(term)
+    return taxonomy
+
+def bench_taxonomy(taxonomy: Dict[str, List[str]], texts: List[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    classifier = KeywordClassifier(taxonomy)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    automaton_labels = classifier.classify_batch(texts)
+    automaton_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    count_labels = [count_classify(taxonomy, text) for text in texts]
+    count_s = time.perf_counter() - t0
+
+    return {
+        "terms": sum(len(terms) for terms in taxonomy.values()),
+        "build_seconds": round(build_s, 4),
+        "per_term_count_ms_per_doc": round(count_s * 1000 / len(texts), 3),
+        "automaton_ms_per_doc": round(automaton_s * 1000 / len(texts), 3),
+        "speedup": round(count_s / automaton_s, 2) if automaton_s else None,
+        "identical": automaton_labels == count_labels,
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Contract classifier benchmark.")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic documents to classify.")
+    parser.add_argument("--extra-terms", type=int, nargs="+", default=[0, 500, 2000],
+                        help="Random terms added to the default taxonomy, one run per value.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    # Same input as the pipeline: the first 5000 characters of each document
+    texts = ["\n".join(long_contract(rng, pages=3))[:5000] for _ in range(args.docs)]
+    results = {
+        "benchmark": "classifier",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "taxonomies": [bench_taxonomy(grown_taxonomy(rng, n), texts) for n in args.extra_terms],
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
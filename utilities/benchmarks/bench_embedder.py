@@ -0,0 +1,110 @@
+"""
+Embedding backend benchmark: throughput of each backend (fp32 torch, int8
+dynamic quantization) on the chunks of a synthetic corpus, and parity of
+their vectors with the fp32 ones (cosine similarity per chunk).
+
+Needs sentence-transformers/torch and the model weights (downloaded on first use).
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_embedder --docs 20 --backends torch int8 --threads 4 --out embedder.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import Any, Dict, List
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.text_cleaner import clean_contract_text
+from utilities.contract_parser import parse_contract_index
+from utilities.chunker import create_hierarchical_chunks
+from utilities.embedder import load_model, resolve_device, EMBEDDING_MODEL
+from utilities.benchmarks.synthetic_corpus import generate_corpus
+
+def corpus_chunks(docs: int, seed: int = 0, long_pages: int = 30) -> List[Dict[str, Any]]:
+    """
+    Chunks (all levels, in pipeline order) of a synthetic corpus: the real
+    mix of short clause chunks and long section chunks the embedder sees.
+    """
+    chunks = []
+    for doc in generate_corpus(docs, seed=seed, long_pages=long_pages, long_every=10):
+        structure = parse_contract_index(clean_contract_text(doc["text"]))
+        chunks.extend(create_hierarchical_chunks(structure, os.path.basename(doc["path"])))
+    return chunks
+
+def bench_backend(backend: str, texts: List[str], args) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    model = load_model(args.model, backend=backend, device=args.device, threads=args.threads)
+    load_s = time.perf_counter() - t0
+
+    model.encode(texts[:8], batch_size=8, convert_to_numpy=True)  # warmup
+    best = float("inf")
+    vectors = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        vectors = model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+        best = min(best, time.perf_counter() - t0)
+    return {
+        "backend": backend,
+        "load_seconds": round(load_s, 2),
+        "encode_seconds": round(best, 3),
+        "chunks_per_sec": round(len(texts) / best, 1),
+    }, np.asarray(vectors, dtype=np.float32)
+
+def parity(reference: np.ndarray, vectors: np.ndarray) -> Dict[str, float]:
+    a = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    b = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    cosine = (a * b).sum(axis=1)
+    return {"cosine_min": round(float(cosine.min()), 5), "cosine_mean": round(float(cosine.mean()), 5)}
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Embedding backend throughput/parity benchmark.")
+    parser.add_argument("--docs", type=int, default=20, help="Synthetic contracts to chunk and embed.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8"], help="Backends to compare (first = reference).")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--device", default="auto", help="Device for the torch backend (auto | cuda | mps | cpu).")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default).")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per backend (best is reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    texts = [chunk["text"] for chunk in corpus_chunks(args.docs, seed=args.seed)]
+    results = {
+        "benchmark": "embedder",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "device": resolve_device(args.device),
+        "params": vars(args),
+        "chunks": len(texts),
+        "backends": [],
+    }
+
+    reference = None
+    for backend in args.backends:
+        result, vectors = bench_backend(backend, texts, args)
+        if reference is None:
+            reference = vectors
+        else:
+            result["parity_vs_" + args.backends[0]] = parity(reference, vectors)
+        results["backends"].append(result)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+End-to-end ingestion benchmark on a synthetic contract corpus.
+
+Runs the real clean -> parse -> chunk -> classify path, then the staged
+pipeline with stand-in embedding and vector-store backends, and prints the
+results as JSON so runs of different releases can be diffed.
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_ingestion --docs 200 --out bench.json
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import platform
+import tracemalloc
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Allow running as a plain script from inside utilities/ as well
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.text_cleaner import clean_contract_text
+from utilities.contract_parser import parse_contract_index
+from utilities.chunker import create_hierarchical_chunks
+from utilities.classifier import classify_contract_type
+from utilities.pipeline import ingest_documents
+from utilities.metrics import Metrics
+from utilities.benchmarks.synthetic_corpus import generate_corpus
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+class StandInEmbedder:
+    """
+    Deterministic fake of generate_embeddings: a pseudo-random unit vector per
+    chunk text, plus an optional fixed cost per chunk to mimic model latency.
+    """
+
+    def __init__(self, dim: int = 384, seconds_per_chunk: float = 0.0):
+        self.dim = dim
+        self.seconds_per_chunk = seconds_per_chunk
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for chunk in chunks:
+            rng = np.random.default_rng(zlib.crc32(chunk["text"].encode("utf-8")))
+            vector = rng.standard_normal(self.dim).astype(np.float32)
+            chunk["vector"] = (vector / np.linalg.norm(vector)).tolist()
+        if self.seconds_per_chunk:
+            time.sleep(self.seconds_per_chunk * len(chunks))
+        return chunks
+
+class StandInVectorStore:
+    """
+    Fake of batch_insert_chunks that only counts, with optional per-batch latency.
+    """
+
+    def __init__(self, seconds_per_batch: float = 0.0):
+        self.seconds_per_batch = seconds_per_batch
+        self.inserted = 0
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> bool:
+        if self.seconds_per_batch:
+            time.sleep(self.seconds_per_batch)
+        self.inserted += len(chunks)
+        return True
+
+def peak_rss_mb() -> float:
+    if resource is None:  # pragma: no cover
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def bench_stages(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Times each CPU stage separately over the whole corpus (single process).
+    """
+    totals = {"clean": 0.0, "parse": 0.0, "chunk": 0.0, "classify": 0.0}
+    chunk_count = 0
+    for doc in docs:
+        t0 = time.perf_counter()
+        cleaned = clean_contract_text(doc["text"])
+        t1 = time.perf_counter()
+        parsed = parse_contract_index(cleaned)
+        t2 = time.perf_counter()
+        chunks = create_hierarchical_chunks(parsed, os.path.basename(doc["path"]))
+        t3 = time.perf_counter()
+        classify_contract_type(cleaned[:5000])
+        t4 = time.perf_counter()
+
+        totals["clean"] += t1 - t0
+        totals["parse"] += t2 - t1
+        totals["chunk"] += t3 - t2
+        totals["classify"] += t4 - t3
+        chunk_count += len(chunks)
+
+    n = max(1, len(docs))
+    return {
+        "chunks": chunk_count,
+        "stages": {
+            name: {"seconds": round(sec, 4), "ms_per_doc": round(sec * 1000 / n, 3)}
+            for name, sec in totals.items()
+        },
+    }
+
+def bench_end_to_end(docs: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    embedder = StandInEmbedder(seconds_per_chunk=args.embed_latency)
+    store = StandInVectorStore(seconds_per_batch=args.insert_latency)
+
+    metrics = Metrics()
+    t0 = time.perf_counter()
+    stats = ingest_documents(
+        docs,
+        embed_fn=embedder,
+        insert_fn=store,
+        parse_workers=args.workers,
+        batch_size=args.batch_size,
+        metrics=metrics,
+    )
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "seconds": round(elapsed, 4),
+        "documents": stats["documents"],
+        "failed_documents": stats["failed_documents"],
+        "chunks": stats["chunks"],
+        "docs_per_sec": round(stats["documents"] / elapsed, 2) if elapsed else None,
+        "chunks_per_sec": round(stats["chunks"] / elapsed, 2) if elapsed else None,
+        "stages": metrics.summary()["stages"],
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Synthetic end-to-end ingestion benchmark.")
+    parser.add_argument("--docs", type=int, default=100, help="Number of synthetic contracts.")
+    parser.add_argument("--long-pages", type=int, default=300, help="Pages of each long contract.")
+    parser.add_argument("--long-every", type=int, default=25, help="Every Nth document is a long contract (0 = none).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="Parse worker processes for the end-to-end run.")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated embedding seconds per chunk.")
+    parser.add_argument("--insert-latency", type=float, default=0.0, help="Simulated insert seconds per batch.")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report the Python heap peak (slower).")
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    docs = list(generate_corpus(args.docs, seed=args.seed, long_pages=args.long_pages, long_every=args.long_every))
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    results = {
+        "benchmark": "ingestion",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "corpus": {
+            "documents": len(docs),
+            "characters": sum(len(d["text"]) for d in docs),
+            "pages": sum(len(d["pages"]) for d in docs),
+        },
+    }
+    results.update(bench_stages(docs))
+    results["end_to_end"] = bench_end_to_end(docs, args)
+    results["memory"] = {"peak_rss_mb": peak_rss_mb()}
+    if args.trace_memory:
+        results["memory"]["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Contract parser benchmark: the single-pass lexer (parse_contract_index) against the
+line-by-line reference parser (parse_contract_by_lines) on long synthetic
+contracts. Also checks that both return the same structure.
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_parser --pages 300 --out parser.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from typing import Any, Dict
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.text_cleaner import clean_contract_text
+from utilities.contract_parser import parse_contract_index, parse_contract_by_lines
+from utilities.benchmarks.synthetic_corpus import long_contract, numbered_contract, bullet_contract
+
+def _best(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def bench_document(name: str, text: str, repeat: int) -> Dict[str, Any]:
+    text = clean_contract_text(text)
+    lexer = parse_contract_index.__wrapped__
+    parsed = lexer(text).to_parsed_structure()
+    lines_s = _best(parse_contract_by_lines, text, repeat)
+    lexer_s = _best(lexer, text, repeat)
+    return {
+        "document": name,
+        "characters": len(text),
+        "lines": text.count("\n") + 1,
+        "sections": len(parsed),
+        "clauses": sum(len(s["clauses"]) for s in parsed),
+        "line_by_line_seconds": round(lines_s, 4),
+        "lexer_seconds": round(lexer_s, 4),
+        "speedup": round(lines_s / lexer_s, 2) if lexer_s else None,
+        "identical": parsed == parse_contract_by_lines(text),
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Contract parser benchmark.")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the long synthetic contract.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {
+        "benchmark": "parser",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "documents": [
+            bench_document("long_contract", "\n".join(long_contract(rng, pages=args.pages)), args.repeat),
+            bench_document("numbered_x50", "\n\n".join(numbered_contract(rng) for _ in range(50)), args.repeat),
+            bench_document("bullet_x50", "\n\n".join(bullet_contract(rng) for _ in range(50)), args.repeat),
+        ],
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
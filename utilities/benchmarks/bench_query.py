@@ -0,0 +1,110 @@
+"""
+/query latency with and without the Weaviate client pool: the same
+near_vector searches (random unit vectors, so no embedding model is needed)
+run with a new connection per query (the previous search_weaviate) and with
+a pooled long-lived connection, from `--concurrency` threads.
+
+Needs a running Weaviate (WEAVIATE_HOST / WEAVIATE_HTTP_PORT / WEAVIATE_GRPC_PORT)
+with the ContractChunk collection.
+
+Usage (from the project root):
+    python -m utilities.benchmarks.bench_query --queries 200 --concurrency 1 4 --out query.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utilities.weaviate_manager import get_client, WEAVIATE_HOST, WEAVIATE_HTTP_PORT, WEAVIATE_GRPC_PORT
+from utilities.weaviate_pool import ClientPool
+
+RETURN_PROPERTIES = ["text", "section", "clause_number", "document_id", "contract_type"]
+
+def query(client, vector: List[float], limit: int):
+    collection = client.collections.get("ContractChunk")
+    return collection.query.near_vector(near_vector=vector, limit=limit, return_properties=RETURN_PROPERTIES)
+
+def per_query_connection(vector: List[float], limit: int):
+    client = get_client()
+    try:
+        return query(client, vector, limit)
+    finally:
+        client.close()
+
+def latencies(search: Callable[[List[float], int], Any], vectors: List[List[float]], limit: int,
+              concurrency: int) -> Dict[str, Any]:
+    def timed_search(vector):
+        t0 = time.perf_counter()
+        search(vector, limit)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        times = np.array(list(executor.map(timed_search, vectors))) * 1000
+    wall = time.perf_counter() - t0
+    return {
+        "p50_ms": round(float(np.percentile(times, 50)), 2),
+        "p95_ms": round(float(np.percentile(times, 95)), 2),
+        "mean_ms": round(float(times.mean()), 2),
+        "queries_per_sec": round(len(vectors) / wall, 1),
+    }
+
+def main(argv=None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="/query latency with and without the Weaviate client pool.")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per run.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Client threads, one run per value.")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension of the collection.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON results to this file as well as stdout.")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+    results = {
+        "benchmark": "query",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "weaviate": f"{WEAVIATE_HOST}:{WEAVIATE_HTTP_PORT} (gRPC {WEAVIATE_GRPC_PORT})",
+        "params": vars(args),
+        "runs": [],
+    }
+    for concurrency in args.concurrency:
+        pool = ClientPool(get_client, size=concurrency)
+
+        def pooled(vector, limit):
+            with pool.connection() as client:
+                return query(client, vector, limit)
+
+        pooled(vectors[0], args.limit)  # open the first connection outside the measurement, as a running app would have
+        run = {
+            "concurrency": concurrency,
+            "new_connection_per_query": latencies(per_query_connection, vectors, args.limit, concurrency),
+            "pooled": latencies(pooled, vectors, args.limit, concurrency),
+        }
+        run["pool"] = pool.report()
+        pool.close()
+        results["runs"].append(run)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
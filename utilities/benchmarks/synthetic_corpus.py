@@ -0,0 +1,114 @@
+import random
+from typing import Any, Dict, Iterator, List
+
+# Vocabulary loosely modelled on commercial contracts, so the classifier and
+# tokenizer see realistic words rather than random strings.
+PARTY_TERMS = ["the Company", "the Tenant", "the Landlord", "the Supplier", "the Vendor",
+               "the Employee", "the Buyer", "the Seller", "the Service Provider", "the Recipient"]
+TOPIC_TERMS = ["confidentiality agreement", "proprietary information", "statement of work",
+               "premises", "rental", "purchase agreement", "employment agreement", "procurement",
+               "scope of work", "non-disclosure", "asset purchase", "offer letter"]
+FILLER = ("shall", "pursuant to", "notwithstanding", "in accordance with", "reasonable efforts",
+          "prior written consent", "hereunder", "applicable law", "material breach", "termination",
+          "indemnify", "liability", "obligations", "payment", "invoice", "notice", "effective date")
+SECTION_TITLES = ["Definitions", "Term and Termination", "Payment Terms", "Confidentiality",
+                  "Indemnification", "Limitation of Liability", "Governing Law", "Notices",
+                  "Severability", "Assignment", "Force Majeure", "Entire Agreement"]
+LIGATURES = ["ﬁ", "ﬂ", "ﬀ"]
+
+STYLES = ("numbered", "article", "bullets", "plain", "long")
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(PARTY_TERMS), rng.choice(FILLER)]
+    words += [rng.choice(FILLER) for _ in range(rng.randint(4, 14))]
+    if rng.random() < 0.3:
+        words.append(rng.choice(TOPIC_TERMS))
+    if rng.random() < 0.05:
+        words.append(rng.choice(LIGATURES) + "nal")
+    return " ".join(words).capitalize() + "."
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+def numbered_contract(rng: random.Random, sections: int = 12) -> str:
+    lines = [_paragraph(rng, 3), ""]
+    for s in range(1, sections + 1):
+        lines.append(f"{s}. {rng.choice(SECTION_TITLES)}")
+        for c in range(1, rng.randint(2, 6)):
+            lines.append(f"{s}.{c} {_paragraph(rng, rng.randint(1, 4))}")
+        lines.append("")
+    return "\n".join(lines)
+
+def article_contract(rng: random.Random, articles: int = 10) -> str:
+    lines = []
+    for a in range(1, articles + 1):
+        lines.append(f"ARTICLE {a} {rng.choice(SECTION_TITLES).upper()}")
+        for c in range(1, rng.randint(2, 5)):
+            lines.append(f"{a}.{c} {_paragraph(rng, rng.randint(1, 3))}")
+        lines.append("")
+    return "\n".join(lines)
+
+def bullet_contract(rng: random.Random, sections: int = 8) -> str:
+    lines = []
+    for s in range(1, sections + 1):
+        lines.append(f"SECTION {s}. {rng.choice(SECTION_TITLES)}")
+        lines.append(_paragraph(rng, 2))
+        for b in "abcdef"[:rng.randint(2, 6)]:
+            lines.append(f"({b}) {_paragraph(rng, 1)}")
+        lines.append("• " + _sentence(rng))
+        lines.append("")
+    return "\n".join(lines)
+
+def plain_contract(rng: random.Random, paragraphs: int = 15) -> str:
+    # No headers at all -> exercises the level-3 semantic fallback
+    return "\n\n".join(_paragraph(rng, rng.randint(3, 8)).lower() for _ in range(paragraphs))
+
+def long_contract(rng: random.Random, pages: int = 300) -> List[str]:
+    """
+    A multi-hundred-page document, returned page by page (with page footers).
+    """
+    page_texts = []
+    section = 1
+    for p in range(1, pages + 1):
+        lines = []
+        if p % 3 == 1:
+            lines.append(f"{section}. {rng.choice(SECTION_TITLES)}")
+            section += 1
+        for c in range(1, 5):
+            lines.append(f"{section - 1}.{c + (p % 3) * 4} {_paragraph(rng, rng.randint(2, 4))}")
+        lines.append(f"Page {p} of {pages}")
+        page_texts.append("\n".join(lines))
+    return page_texts
+
+def _as_document(path: str, page_texts: List[str]) -> Dict[str, Any]:
+    """
+    Builds a document dict shaped like pdf_loader.load_pdf's output.
+    """
+    parts = []
+    pages = []
+    offset = 0
+    for text in page_texts:
+        parts.append(text)
+        parts.append("\n")
+        pages.append((offset, offset + len(text)))
+        offset += len(text) + 1
+    return {"path": path, "text": "".join(parts), "pages": pages}
+
+def generate_corpus(num_docs: int, seed: int = 0, long_pages: int = 300, long_every: int = 25) -> Iterator[Dict[str, Any]]:
+    """
+    Yields `num_docs` synthetic contracts cycling through the numbered, ARTICLE,
+    bullet and no-header styles; every `long_every`-th document is a
+    `long_pages`-page contract. The same seed always yields the same corpus.
+    """
+    rng = random.Random(seed)
+    short_styles = [numbered_contract, article_contract, bullet_contract, plain_contract]
+    for i in range(num_docs):
+        if long_every and i % long_every == long_every - 1:
+            page_texts = long_contract(rng, pages=long_pages)
+        else:
+            text = short_styles[i % len(short_styles)](rng)
+            # Split short documents into ~2-4 "pages" at blank lines
+            blocks = text.split("\n\n")
+            per_page = max(1, len(blocks) // rng.randint(2, 4))
+            page_texts = ["\n\n".join(blocks[j:j + per_page]) for j in range(0, len(blocks), per_page)]
+        yield _as_document(f"synthetic/contract_{i:05d}.pdf", page_texts)
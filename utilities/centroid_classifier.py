@@ -0,0 +1,198 @@
+import os
+import time
+import argparse
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utilities.metrics import current
+
+# Per-type centroids of the chunk vectors already in the index. Documents whose
+# contract_type came from keyword counting are re-classified by the cosine
+# similarity of their chunk vectors to these centroids (see pipeline.ingest_documents).
+CENTROIDS_PATH = os.getenv(
+    "CONTRACT_CENTROIDS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "centroids.npz"),
+)
+CENTROID_MIN_SIMILARITY = float(os.getenv("CENTROID_MIN_SIMILARITY", "0.5"))  # below: keep the keyword label
+CENTROID_MIN_CHUNKS = int(os.getenv("CENTROID_MIN_CHUNKS", "20"))  # labeled chunks needed for a centroid
+# Labels the centroids are built from: not their own "centroid" labels, which would reinforce them
+CENTROID_TRAINING_SOURCES = ("given", "keyword")
+
+# Placeholder labels that say nothing about the contract type
+UNLABELED_TYPES = {"", "Other", "Unknown", "General"}
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class CentroidClassifier:
+    """
+    One unit-length centroid per contract type (the normalized mean of the
+    type's normalized chunk vectors). A document is classified by the cosine
+    similarity of the mean of its chunk vectors to every centroid, as a
+    single matrix product for a whole batch of documents.
+    """
+
+    def __init__(self, labels: List[str], centroids: np.ndarray, counts: Optional[List[int]] = None,
+                 min_similarity: float = CENTROID_MIN_SIMILARITY, built_at: Optional[float] = None):
+        self.labels = list(labels)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.counts = list(counts) if counts is not None else [0] * len(self.labels)
+        self.min_similarity = min_similarity
+        self.built_at = built_at if built_at is not None else time.time()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def fit(cls, labeled_vectors: Iterable[Tuple[str, Sequence[float]]], min_chunks: int = CENTROID_MIN_CHUNKS,
+            batch_size: int = 4096, **kwargs) -> "CentroidClassifier":
+        """
+        Builds centroids from (contract_type, vector) pairs, streamed in
+        batches so the whole index never has to be held in memory.
+        Placeholder types (UNLABELED_TYPES) and types with fewer than
+        `min_chunks` vectors are left out.
+        """
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+
+        def add(labels: List[str], vectors: List[Sequence[float]]):
+            matrix = _normalize_rows(np.asarray(vectors, dtype=np.float64))
+            names, inverse = np.unique(labels, return_inverse=True)
+            totals = np.zeros((len(names), matrix.shape[1]))
+            np.add.at(totals, inverse, matrix)
+            for label, total, count in zip(names.tolist(), totals, np.bincount(inverse)):
+                sums[label] = sums[label] + total if label in sums else total
+                counts[label] = counts.get(label, 0) + int(count)
+
+        labels, vectors = [], []
+        for label, vector in labeled_vectors:
+            if label in UNLABELED_TYPES or vector is None or len(vector) == 0:
+                continue
+            labels.append(label)
+            vectors.append(vector)
+            if len(vectors) >= batch_size:
+                add(labels, vectors)
+                labels, vectors = [], []
+        if vectors:
+            add(labels, vectors)
+
+        kept = sorted(label for label, count in counts.items() if count >= min_chunks)
+        if not kept:
+            return cls([], np.zeros((0, 0), dtype=np.float32), [], **kwargs)
+        centroids = _normalize_rows(np.stack([sums[label] for label in kept]))
+        return cls(kept, centroids, [counts[label] for label in kept], **kwargs)
+
+    def similarities(self, documents: List[Sequence[Sequence[float]]]) -> np.ndarray:
+        """
+        Cosine similarity of each document (a list of chunk vectors) to each
+        centroid: (documents x labels). Documents without vectors score 0.
+        """
+        if not len(self) or not documents:
+            return np.zeros((len(documents), len(self)), dtype=np.float32)
+        dim = self.centroids.shape[1]
+        means = np.zeros((len(documents), dim), dtype=np.float32)
+        for i, vectors in enumerate(documents):
+            if len(vectors):
+                means[i] = _normalize_rows(np.asarray(vectors, dtype=np.float32)).mean(axis=0)
+        return _normalize_rows(means) @ self.centroids.T
+
+    def classify_documents(self, documents: List[Sequence[Sequence[float]]]) -> List[Optional[Tuple[str, float]]]:
+        """
+        (label, similarity) of the closest centroid for each document, or None
+        when no centroid reaches min_similarity (the caller keeps its keyword
+        label then).
+        """
+        scores = self.similarities(documents)
+        results = []
+        for row in scores:
+            if not len(row):
+                results.append(None)
+                continue
+            best = int(np.argmax(row))
+            score = float(row[best])
+            results.append((self.labels[best], score) if score >= self.min_similarity else None)
+        return results
+
+    def classify_batch(self, batch: Dict[str, Any]) -> int:
+        """
+        Re-labels, in place, the chunks of every keyword-classified document of
+        a pipeline batch ({ "chunks", "documents" }, each document's chunks
+        contiguous and in order) using the vectors they were just given.
+        Returns the number of documents re-labeled.
+        """
+        chunks = batch["chunks"]
+        targets, documents = [], []
+        offset = 0
+        for doc in batch["documents"]:
+            start, offset = offset, offset + doc["chunk_count"]
+            if doc.get("contract_type_source") == "keyword":
+                targets.append((doc, start, offset))
+                documents.append([c["vector"] for c in chunks[start:offset] if c.get("vector") is not None])
+        if not documents:
+            return 0
+
+        relabeled = 0
+        with current().stage("classify_centroid", items=len(documents)):
+            for (doc, start, end), result in zip(targets, self.classify_documents(documents)):
+                if result is None:
+                    continue
+                label, _ = result
+                for chunk in chunks[start:end]:
+                    chunk["contract_type"] = label
+                    chunk["contract_type_source"] = "centroid"
+                doc["contract_type"] = label
+                doc["contract_type_source"] = "centroid"
+                relabeled += 1
+        return relabeled
+
+    def save(self, path: str = CENTROIDS_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, labels=np.array(self.labels, dtype=str), centroids=self.centroids,
+                 counts=np.array(self.counts, dtype=np.int64), built_at=np.float64(self.built_at))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = CENTROIDS_PATH, **kwargs) -> "CentroidClassifier":
+        with np.load(path) as data:
+            return cls([str(l) for l in data["labels"]], data["centroids"], data["counts"].tolist(),
+                       built_at=float(data["built_at"]), **kwargs)
+
+def load_centroids(path: str = CENTROIDS_PATH) -> Optional[CentroidClassifier]:
+    """
+    The stored centroids, or None if they were never built (or are unreadable),
+    in which case documents keep their keyword labels.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        classifier = CentroidClassifier.load(path)
+    except Exception as e:
+        print(f"Error loading contract type centroids from {path}: {e}")
+        return None
+    return classifier if len(classifier) else None
+
+def refresh_centroids(path: str = CENTROIDS_PATH, min_chunks: int = CENTROID_MIN_CHUNKS) -> CentroidClassifier:
+    """
+    Rebuilds the centroids from the chunks in Weaviate labeled by keywords or
+    given with their contract (CENTROID_TRAINING_SOURCES) and stores them.
+    Chunks stored before contract_type_source existed are left out.
+    """
+    from utilities.weaviate_manager import iter_labeled_vectors
+
+    classifier = CentroidClassifier.fit(iter_labeled_vectors(CENTROID_TRAINING_SOURCES), min_chunks=min_chunks)
+    classifier.save(path)
+    print(f"Stored {len(classifier)} contract type centroids in {path}: "
+          + ", ".join(f"{label} ({count})" for label, count in zip(classifier.labels, classifier.counts)))
+    return classifier
+
+if __name__ == "__main__":  # pragma: no cover
+    # python -m utilities.centroid_classifier (from the project root)
+    parser = argparse.ArgumentParser(description="Rebuild the contract type centroids from the chunks in Weaviate.")
+    parser.add_argument("--out", default=CENTROIDS_PATH, help="Where to store the centroids. Default: $CONTRACT_CENTROIDS_PATH.")
+    parser.add_argument("--min-chunks", type=int, default=CENTROID_MIN_CHUNKS,
+                        help="Labeled chunks a contract type needs to get a centroid.")
+    args = parser.parse_args()
+    refresh_centroids(args.out, min_chunks=args.min_chunks)
@@ -0,0 +1,291 @@
+import os
+import json
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Export layout (one directory):
+#   export.json            index: shards, row counts, vector dimension
+#   shard-00000.parquet    chunk metadata + text, one row group per flushed batch
+#   shard-00000.f32        vectors of the same rows, contiguous float32 (rows x dim)
+INDEX_FILE = "export.json"
+EXPORT_VERSION = 1
+
+SHARD_ROWS = int(os.getenv("EXPORT_SHARD_ROWS", "100000"))  # rows before rotating to a new shard
+BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "4096"))     # rows buffered per write
+
+SCHEMA = pa.schema([
+    ("document_id", pa.string()),
+    ("section", pa.string()),
+    ("clause_number", pa.string()),
+    ("chunk_level", pa.int8()),
+    ("contract_type", pa.string()),
+    ("token_count", pa.int32()),
+    ("pages", pa.list_(pa.int32())),
+    ("text", pa.string()),
+    ("has_vector", pa.bool_()),
+])
+
+def _shard_name(index: int) -> str:
+    return f"shard-{index:05d}"
+
+class ChunkExportWriter:
+    """
+    Writes chunks (with their vectors) to a sharded columnar export.
+
+    Rows are buffered and written in batches of `batch_rows`; a new shard is
+    started every `shard_rows` rows. Chunks without a vector get a zero row
+    and has_vector = False, so row i of the metadata always matches row i of
+    the vector file.
+    """
+
+    def __init__(self, export_dir: str, shard_rows: int = SHARD_ROWS, batch_rows: int = BATCH_ROWS):
+        self.export_dir = export_dir
+        self.shard_rows = shard_rows
+        self.batch_rows = batch_rows
+        self.dim: Optional[int] = None
+        self.shards: List[Dict[str, Any]] = []
+
+        if os.path.exists(export_dir):
+            shutil.rmtree(export_dir)
+        os.makedirs(export_dir)
+
+        self._columns: Dict[str, list] = {name: [] for name in SCHEMA.names}
+        self._vectors: list = []
+        self._parquet: Optional[pq.ParquetWriter] = None
+        self._vector_file = None
+        # Previous export being rewritten (see rewrite); removed once this one is complete
+        self._old_dir: Optional[str] = None
+
+    @classmethod
+    def rewrite(cls, export_dir: str, keep_document_ids: set, **kwargs) -> "ChunkExportWriter":
+        """
+        Opens a writer whose export starts with the rows of `keep_document_ids`
+        from the existing export at `export_dir` (if any). Used by incremental
+        runs to drop the chunks of changed and deleted documents.
+
+        The existing export is moved to `<export_dir>.old` and only removed by
+        close(), once the new index is written. If a rewrite was interrupted,
+        `.old` is still the last complete export and the next rewrite starts
+        from it again (the partial export is discarded).
+        """
+        old_dir = export_dir.rstrip(os.sep) + ".old"
+        if not os.path.exists(old_dir) and os.path.exists(os.path.join(export_dir, INDEX_FILE)):
+            os.replace(export_dir, old_dir)
+
+        writer = cls(export_dir, **kwargs)
+        if os.path.exists(old_dir):
+            reader = ChunkExportReader(old_dir)
+            writer.dim = reader.dim or None
+            for rows, vectors in reader.iter_batches():
+                keep = [i for i, row in enumerate(rows) if row["document_id"] in keep_document_ids]
+                if keep:
+                    writer._append_rows([rows[i] for i in keep], vectors[keep])
+            writer._old_dir = old_dir
+        return writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return sum(s["rows"] for s in self.shards) + len(self._vectors)
+
+    def write(self, chunks: Iterable[Dict[str, Any]]):
+        rows = []
+        vectors = []
+        for chunk in chunks:
+            vector = chunk.get("vector")
+            rows.append({
+                "document_id": chunk["document_id"],
+                "section": chunk.get("section") or "",
+                "clause_number": "" if chunk.get("clause_number") is None else str(chunk["clause_number"]),
+                "chunk_level": chunk["chunk_level"],
+                "contract_type": chunk.get("contract_type") or "",
+                "token_count": chunk.get("token_count") or 0,
+                "pages": list(chunk.get("pages") or []),
+                "text": chunk["text"],
+                "has_vector": vector is not None and len(vector) > 0,
+            })
+            vectors.append(vector)
+        if rows:
+            self._append_rows(rows, vectors)
+
+    def _append_rows(self, rows: List[Dict[str, Any]], vectors):
+        if self.dim is None and len(vectors):
+            first = next((v for v in vectors if v is not None and len(v)), None)
+            if first is not None:
+                self.dim = len(first)
+                self._write_missing_vectors()
+        for row, vector in zip(rows, vectors):
+            for name in SCHEMA.names:
+                self._columns[name].append(row[name])
+            self._vectors.append(vector if row["has_vector"] else None)
+            if len(self._vectors) >= self.batch_rows:
+                self.flush()
+
+    def _write_missing_vectors(self):
+        """
+        Rows flushed before the dimension was known (chunks without vectors)
+        have no vector rows yet: writes their zero rows, now that it is.
+        """
+        for shard in self.shards:
+            if not shard["rows"]:
+                continue
+            zeros = np.zeros((shard["rows"], self.dim), dtype=np.float32)
+            if shard is self.shards[-1] and self._vector_file is not None:
+                zeros.tofile(self._vector_file)
+            else:
+                with open(os.path.join(self.export_dir, shard["name"] + ".f32"), "ab") as f:
+                    zeros.tofile(f)
+
+    def _open_shard(self):
+        name = _shard_name(len(self.shards))
+        self._parquet = pq.ParquetWriter(os.path.join(self.export_dir, name + ".parquet"), SCHEMA)
+        self._vector_file = open(os.path.join(self.export_dir, name + ".f32"), "wb")
+        self.shards.append({"name": name, "rows": 0})
+
+    def _close_shard(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._vector_file.close()
+            self._parquet = None
+            self._vector_file = None
+            self._write_index()
+
+    def flush(self):
+        """
+        Writes buffered rows, splitting them across shards as needed.
+        """
+        start = 0
+        total = len(self._vectors)
+        while start < total:
+            if self._parquet is None:
+                self._open_shard()
+            shard = self.shards[-1]
+            end = min(total, start + self.shard_rows - shard["rows"])
+
+            table = pa.table({name: self._columns[name][start:end] for name in SCHEMA.names}, schema=SCHEMA)
+            self._parquet.write_table(table)
+
+            # Without a dimension yet the rows have no vectors: see _write_missing_vectors
+            dim = self.dim or 0
+            block = np.zeros((end - start, dim), dtype=np.float32)
+            for i, vector in enumerate(self._vectors[start:end]):
+                if vector is not None:
+                    block[i] = vector
+            block.tofile(self._vector_file)
+
+            shard["rows"] += end - start
+            start = end
+            if shard["rows"] >= self.shard_rows:
+                self._close_shard()
+
+        self._columns = {name: [] for name in SCHEMA.names}
+        self._vectors = []
+
+    def close(self):
+        self.flush()
+        self._close_shard()
+        self._write_index()
+        if self._old_dir is not None:
+            shutil.rmtree(self._old_dir)
+            self._old_dir = None
+
+    def _write_index(self):
+        tmp_path = os.path.join(self.export_dir, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": EXPORT_VERSION,
+                "dim": self.dim or 0,
+                "rows": sum(s["rows"] for s in self.shards),
+                "shards": self.shards,
+            }, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.export_dir, INDEX_FILE))
+
+class ChunkExportReader:
+    """
+    Reads an export written by ChunkExportWriter without loading it into memory.
+    Metadata is read per row group; vectors are memory-mapped.
+    """
+
+    def __init__(self, export_dir: str):
+        self.export_dir = export_dir
+        with open(os.path.join(export_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != EXPORT_VERSION:
+            raise ValueError(f"Unsupported export version: {index.get('version')}")
+        self.dim: int = index["dim"]
+        self.shards: List[Dict[str, Any]] = index["shards"]
+        self._offsets = np.cumsum([0] + [s["rows"] for s in self.shards])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def vectors(self, shard: int) -> np.ndarray:
+        """
+        The vectors of one shard as a read-only memory map (rows x dim).
+        """
+        rows = self.shards[shard]["rows"]
+        path = os.path.join(self.export_dir, self.shards[shard]["name"] + ".f32")
+        if rows == 0 or self.dim == 0:
+            return np.zeros((rows, self.dim), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def _parquet(self, shard: int) -> pq.ParquetFile:
+        return pq.ParquetFile(os.path.join(self.export_dir, self.shards[shard]["name"] + ".parquet"))
+
+    def iter_batches(self, columns: Optional[List[str]] = None, batch_size: int = BATCH_ROWS) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        Yields (rows, vectors) batches in export order. `columns` limits the
+        metadata that is read (e.g. ["document_id"] to skip the text).
+        """
+        for shard in range(len(self.shards)):
+            vectors = self.vectors(shard)
+            start = 0
+            for batch in self._parquet(shard).iter_batches(batch_size=batch_size, columns=columns):
+                end = start + batch.num_rows
+                yield batch.to_pylist(), vectors[start:end]
+                start = end
+
+    def slice(self, start: int, stop: int, columns: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Rows [start, stop) of the whole export. Only the row groups that overlap
+        the range are read.
+        """
+        start = max(0, start)
+        stop = min(len(self), stop)
+        rows: List[Dict[str, Any]] = []
+        vector_parts = []
+        if stop <= start:
+            return rows, np.zeros((0, self.dim), dtype=np.float32)
+
+        first = int(np.searchsorted(self._offsets, start, side="right")) - 1
+        for shard in range(first, len(self.shards)):
+            shard_start = int(self._offsets[shard])
+            if shard_start >= stop:
+                break
+            lo = max(start, shard_start) - shard_start
+            hi = min(stop, int(self._offsets[shard + 1])) - shard_start
+
+            pf = self._parquet(shard)
+            groups = []
+            group_start = 0
+            first_group_start = None
+            for g in range(pf.metadata.num_row_groups):
+                group_rows = pf.metadata.row_group(g).num_rows
+                if group_start < hi and group_start + group_rows > lo:
+                    if first_group_start is None:
+                        first_group_start = group_start
+                    groups.append(g)
+                group_start += group_rows
+            table = pf.read_row_groups(groups, columns=columns)
+            rows.extend(table.slice(lo - first_group_start, hi - lo).to_pylist())
+            vector_parts.append(np.asarray(self.vectors(shard)[lo:hi]))
+
+        return rows, np.concatenate(vector_parts)
@@ -1,40 +1,116 @@
+import os
+import uuid
 import tiktoken
-from typing import List, Dict, Any, Optional
+from itertools import accumulate
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from utilities.metrics import timed
+from utilities.doc_index import DocumentIndex, strip_span
 
 # Constants
 ENC = tiktoken.get_encoding("cl100k_base")
+ENCODE_THREADS = int(os.getenv("CHUNK_ENCODE_THREADS", "4"))  # tiktoken threads for batched encoding
+# Namespace of the chunk object ids (never change it: stored ids would no longer match)
+CHUNK_ID_NAMESPACE = uuid.UUID("39640634-2889-5cc2-91c9-403418325101")
 
 def get_token_count(text: str) -> int:
     return len(ENC.encode(text))
 
-def chunk_text_semantically(text: str, max_tokens: int = 512, overlap: int = 128) -> List[str]:
+def encode_batch(texts: List[str]) -> List[List[int]]:
     """
-    Fallback semantic chunking by token count.
+    Tokenizes many texts in one call (tiktoken spreads the work over
+    ENCODE_THREADS threads, outside the GIL).
     """
-    tokens = ENC.encode(text)
+    if not texts:
+        return []
+    return ENC.encode_batch(texts, num_threads=ENCODE_THREADS)
+
+def _token_offsets(tokens: List[int], text: str) -> List[int]:
+    """
+    Character offset in `text` where each token starts (`tokens` = ENC.encode(text)).
+    A token that starts inside a multi-byte character maps to that character.
+    """
+    if text.isascii():
+        # One byte per character: offsets are the running byte lengths
+        return list(accumulate((len(b) for b in ENC.decode_tokens_bytes(tokens[:-1])), initial=0))
+    return ENC.decode_with_offsets(tokens)[1]
+
+def chunk_spans_semantically(text: str, max_tokens: int = 512, overlap: int = 128,
+                             tokens: Optional[List[int]] = None) -> List[Tuple[int, int, int]]:
+    """
+    Sliding token windows over `text` as (start, end, token_count) character
+    spans, so windows are slices of the original string instead of decoded copies.
+
+    Args:
+        tokens: ENC.encode(text), if the caller already has it.
+    """
+    if tokens is None:
+        tokens = ENC.encode(text)
     total_tokens = len(tokens)
-    
-    chunks = []
+    if not total_tokens:
+        return []
+    offsets = _token_offsets(tokens, text)
+
+    spans = []
     start = 0
     while start < total_tokens:
         end = min(start + max_tokens, total_tokens)
-        chunk_tokens = tokens[start:end]
-        chunk_text = ENC.decode(chunk_tokens)
-        chunks.append(chunk_text)
-        
+        spans.append((offsets[start], offsets[end] if end < total_tokens else len(text), end - start))
+
         if end == total_tokens:
             break
         start += (max_tokens - overlap)
-        
-    return chunks
 
-def create_hierarchical_chunks(parsed_structure: List[Dict[str, Any]], filename: str) -> List[Dict[str, Any]]:
+    return spans
+
+def chunk_text_semantically(text: str, max_tokens: int = 512, overlap: int = 128) -> List[str]:
+    """
+    Fallback semantic chunking by token count.
+    """
+    return [text[start:end] for start, end, _ in chunk_spans_semantically(text, max_tokens, overlap)]
+
+def _read_structure(structure) -> Tuple[List[Tuple[str, str, List[Tuple[Optional[str], str]]]], Optional[list]]:
+    """
+    Sections of a parse result as (title, text, [(clause number, clause text)]),
+    plus, for a DocumentIndex, each section's (span, [clause spans]) in the
+    document text (None for the list-of-dicts form).
+    """
+    if isinstance(structure, DocumentIndex):
+        sections = [
+            (structure.section_title(i), structure.section_text(i),
+             [(structure.clause_number(j), structure.clause_text(j)) for j in structure.section_clauses(i)])
+            for i in range(len(structure))
+        ]
+        spans = [
+            (structure.section_span(i), [structure.clause_span(j) for j in structure.section_clauses(i)])
+            for i in range(len(structure))
+        ]
+        return sections, spans
+    sections = [
+        (sec["section_title"], sec["section_text"], [(clause["number"], clause["text"]) for clause in sec.get("clauses", [])])
+        for sec in structure
+    ]
+    return sections, None
+
+@timed("chunk", items=lambda result, *a, **k: len(result))
+def create_hierarchical_chunks(parsed_structure: Union[DocumentIndex, List[Dict[str, Any]]], filename: str) -> List[Dict[str, Any]]:
+    """
+    Level 1 (merged clauses), level 2 (sections) and, for documents without
+    structure, level 3 (token windows) chunks.
+
+    Args:
+        parsed_structure: a DocumentIndex (contract_parser.parse_contract_index,
+            clause_splitter.split_into_clauses_index) or the list-of-dicts
+            form of contract_parser.parse_contract. Chunks built from a
+            DocumentIndex also get "span": [start, end] in the document text.
+    """
     final_chunks = []
+    sections, spans = _read_structure(parsed_structure)
     
     # Check if structure is empty/poor (Level 3 trigger)
     # If only one section (Preamble) and no clauses detected?
-    total_sections = len(parsed_structure)
-    total_clauses = sum(len(s.get("clauses", [])) for s in parsed_structure)
+    total_sections = len(sections)
+    total_clauses = sum(len(clauses) for _, _, clauses in sections)
     
     use_fallback = False
     if total_sections <= 1 and total_clauses <= 1:
@@ -46,101 +122,150 @@ def create_hierarchical_chunks(parsed_structure: List[Dict[str, Any]], filename:
     # User says "Clause = smallest chunk unit". But also "Target 150-350".
     # I will merge small adjacent clauses to meet the target.
     
+    # Every clause and section is tokenized exactly once, in one batch per document.
+    # Buffer sizes below are running sums of these counts (+1 per "\n" joiner, which
+    # can only overestimate: BPE may merge the newline into a neighbouring token).
+    # Only when that sum passes the limit is the merged text encoded, so the flush
+    # decisions are those of encoding the growing buffer at every clause.
+    level1_chunks = []
     if not use_fallback:
-        for sec in parsed_structure:
-            section_title = sec["section_title"]
-            clauses = sec["clauses"]
+        clause_texts = [c_text for _, _, clauses in sections for _, c_text in clauses]
+        section_texts = [sec_text for _, sec_text, _ in sections]
+        encoded = encode_batch(clause_texts + section_texts)
+        del clause_texts, section_texts
+        clause_counts = iter([len(tokens) for tokens in encoded[:total_clauses]])
+        section_tokens = encoded[total_clauses:]
+
+        for k, (section_title, _, clauses) in enumerate(sections):
+            clause_spans = spans[k][1] if spans else None
             
             # Buffer for merging
             current_buffer_text = ""
             current_buffer_ids = []
+            current_buffer_tokens = 0
+            current_buffer_start = 0  # index of the buffer's first clause
             
-            for clause in clauses:
-                c_text = clause["text"]
-                c_num = clause["number"]
+            def flush(last: int):
+                chunk = {
+                    "document_id": filename,
+                    "section": section_title,
+                    "clause_number": ", ".join([str(x) for x in current_buffer_ids if x]),
+                    "chunk_level": 1,
+                    "text": current_buffer_text,
+                    "token_count": None  # exact counts below, one batch for the document
+                }
+                if clause_spans:
+                    chunk["span"] = list(strip_span(parsed_structure.text, clause_spans[current_buffer_start][0], clause_spans[last][1]))
+                final_chunks.append(chunk)
+                level1_chunks.append(chunk)
+            
+            for c, (c_num, c_text) in enumerate(clauses):
+                c_tokens = next(clause_counts)
                 
                 # If adding this clause exceeds max(350), flush current buffer first
                 # (Unless buffer is empty, then we must take it, or split it if huge)
-                combined_text = (current_buffer_text + "\n" + c_text).strip()
-                count = get_token_count(combined_text)
+                count = current_buffer_tokens + 1 + c_tokens if current_buffer_text else c_tokens
+                if count > 350 and current_buffer_text:
+                    count = get_token_count((current_buffer_text + "\n" + c_text).strip())
                 
                 if count > 350 and current_buffer_text:
                     # Flush existing buffer
-                    final_chunks.append({
-                        "document_id": filename,
-                        "section": section_title,
-                        "clause_number": ", ".join([str(x) for x in current_buffer_ids if x]),
-                        "chunk_level": 1,
-                        "text": current_buffer_text,
-                        "token_count": get_token_count(current_buffer_text)
-                    })
+                    flush(c - 1)
                     # Start new buffer with current clause
                     current_buffer_text = c_text
                     current_buffer_ids = [c_num]
+                    current_buffer_tokens = c_tokens
+                    current_buffer_start = c
                 else:
                     # Add to buffer
-                    current_buffer_text = combined_text
+                    if not current_buffer_text:
+                        current_buffer_start = c
+                    current_buffer_text = (current_buffer_text + "\n" + c_text).strip()
                     current_buffer_ids.append(c_num)
+                    current_buffer_tokens = count
                     
             # Flush final buffer for this section
             if current_buffer_text:
-                final_chunks.append({
-                    "document_id": filename,
-                    "section": section_title,
-                    "clause_number": ", ".join([str(x) for x in current_buffer_ids if x]),
-                    "chunk_level": 1,
-                    "text": current_buffer_text,
-                    "token_count": get_token_count(current_buffer_text)
-                })
+                flush(len(clauses) - 1)
+
+        for chunk, tokens in zip(level1_chunks, encode_batch([chunk["text"] for chunk in level1_chunks])):
+            chunk["token_count"] = len(tokens)
 
     # --- Level 2: Section-level Chunks ---
     # Target: 500-1200 tokens. Overlap 150.
     # We chunk the 'section_text'.
     
     if not use_fallback:
-        for sec in parsed_structure:
-            sec_text = sec["section_text"]
-            sec_title = sec["section_title"]
+        for k, ((sec_title, sec_text, _), tokens) in enumerate(zip(sections, section_tokens)):
+            sec_start = spans[k][0][0] if spans else None
             
             # If section itself is small, take it all
-            if get_token_count(sec_text) <= 1200:
-                final_chunks.append({
+            if len(tokens) <= 1200:
+                chunk = {
                     "document_id": filename,
                     "section": sec_title,
                     "clause_number": "SECTION_SUMMARY",
                     "chunk_level": 2,
                     "text": sec_text,
-                    "token_count": get_token_count(sec_text)
-                })
+                    "token_count": len(tokens)
+                }
+                if spans:
+                    chunk["span"] = list(spans[k][0])
+                final_chunks.append(chunk)
             else:
                 # Split section text mostly by token window
                 # We can reuse semantic splitter or sliding window
-                sub_chunks = chunk_text_semantically(sec_text, max_tokens=1000, overlap=150)
-                for sc in sub_chunks:
-                    final_chunks.append({
+                for start, end, sc_tokens in chunk_spans_semantically(sec_text, max_tokens=1000, overlap=150, tokens=tokens):
+                    chunk = {
                         "document_id": filename,
                         "section": sec_title,
                         "clause_number": "SECTION_PART",
                         "chunk_level": 2,
-                        "text": sc,
-                        "token_count": get_token_count(sc)
-                    })
+                        "text": sec_text[start:end],
+                        "token_count": sc_tokens
+                    }
+                    if spans:
+                        chunk["span"] = [sec_start + start, sec_start + end]
+                    final_chunks.append(chunk)
 
     # --- Level 3: Semantic Fallback ---
     # Trigger if structure broken.
     if use_fallback:
         # Reconstruct full text? Or just iterate sections (which is just preamble)
-        full_text = "\n".join([s["section_text"] for s in parsed_structure])
-        semantic_chunks = chunk_text_semantically(full_text, max_tokens=512, overlap=128)
+        full_text = "\n".join([sec_text for _, sec_text, _ in sections])
+        semantic_chunks = chunk_spans_semantically(full_text, max_tokens=512, overlap=128)
         
-        for ch in semantic_chunks:
-             final_chunks.append({
+        for start, end, ch_tokens in semantic_chunks:
+            chunk = {
                 "document_id": filename,
                 "section": "Fallback",
                 "clause_number": None,
                 "chunk_level": 3,
-                "text": ch,
-                "token_count": get_token_count(ch)
-            })
+                "text": full_text[start:end],
+                "token_count": ch_tokens
+            }
+            if spans:
+                # At most one section here, so full_text is that section's text
+                chunk["span"] = [spans[0][0][0] + start, spans[0][0][0] + end]
+            final_chunks.append(chunk)
             
     return final_chunks
+
+def chunk_uuid(document_id: str, chunk_level: int, position: int) -> str:
+    """
+    Deterministic object id of the `position`-th chunk of level `chunk_level`
+    of a document: re-ingesting the document yields the same ids.
+    """
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{document_id}\x00{chunk_level}\x00{position}"))
+
+def assign_chunk_ids(chunks: List[Dict[str, Any]], document_id: str) -> List[Dict[str, Any]]:
+    """
+    Sets chunk["uuid"] on the chunks of one document (in chunking order).
+    """
+    positions: Dict[int, int] = {}
+    for chunk in chunks:
+        level = chunk["chunk_level"]
+        position = positions.get(level, 0)
+        positions[level] = position + 1
+        chunk["uuid"] = chunk_uuid(document_id, level, position)
+    return chunks
@@ -1,10 +1,160 @@
-from typing import Optional
+import os
+import json
+from collections import deque
+from typing import Dict, List, Optional
 
+from utilities.metrics import timed
+
+# Keyword taxonomy: category -> terms (matched case-insensitively, as substrings).
+# Replace or extend it with a JSON file of the same shape via CLASSIFIER_TAXONOMY.
+DEFAULT_TAXONOMY: Dict[str, List[str]] = {
+    "NDA": ["non-disclosure", "confidentiality agreement", "nda", "proprietary information"],
+    "Employment Agreement": ["employment agreement", "employment contract", "employee", "offer letter"],
+    "Services Agreement": ["master services agreement", "msa", "scope of work", "statement of work", "consulting agreement", "service provider"],
+    "Lease": ["lease agreement", "tenant", "landlord", "premises", "rental"],
+    "Purchase Agreement": ["purchase agreement", "asset purchase", "sales contract", "buyer", "seller"],
+    "Vendor Agreement": ["vendor agreement", "supplier", "vendor", "procurement"]
+}
+TAXONOMY_PATH = os.getenv("CLASSIFIER_TAXONOMY")
+# Below this many terms one str.count per term beats the pure-Python automaton scan
+# (about 0.2 ms for a 5000-character text either way at 200 terms)
+AUTOMATON_MIN_TERMS = int(os.getenv("CLASSIFIER_AUTOMATON_MIN_TERMS", "200"))
+
+def load_taxonomy(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Reads a taxonomy JSON file ({ "Category": ["term", ...] }), or returns
+    DEFAULT_TAXONOMY when no path is given (nor set in CLASSIFIER_TAXONOMY).
+    """
+    path = path or TAXONOMY_PATH
+    if not path:
+        return DEFAULT_TAXONOMY
+    with open(path, "r", encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict) or not all(isinstance(terms, list) for terms in taxonomy.values()):
+        raise ValueError(f"Taxonomy {path} must map each category to a list of terms")
+    return taxonomy
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of terms, compiled to a DFA
+    (one dict lookup per character), so counting all terms takes a single
+    pass over the text however many terms there are.
+    """
+
+    def __init__(self, terms: List[str]):
+        self.terms = terms
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for term_id, term in enumerate(terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(term_id)
+
+        # Breadth-first: fill in failure transitions, so every state's dict
+        # holds all its transitions and the scan never follows a failure link
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            out[state] = out[state] + out[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                queue.append(nxt)
+
+        self._delta = delta
+        self._out = [tuple((term_id, len(terms[term_id])) for term_id in ids) or None for ids in out]
+
+    def count(self, text: str) -> List[int]:
+        """
+        Non-overlapping occurrences of each term in `text` (same as text.count(term)).
+        """
+        counts = [0] * len(self.terms)
+        next_start = [0] * len(self.terms)
+        delta, out = self._delta, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            hits = out[state]
+            if hits:
+                for term_id, length in hits:
+                    start = i + 1 - length
+                    if start >= next_start[term_id]:
+                        counts[term_id] += 1
+                        next_start[term_id] = i + 1
+        return counts
+
+class KeywordClassifier:
+    """
+    Scores each category of a taxonomy by the number of occurrences of its
+    terms, and picks the best one ("Other" if no term occurs). Taxonomies of
+    at least `automaton_min_terms` terms are counted in one pass by a
+    KeywordAutomaton, smaller ones with str.count.
+    """
+
+    def __init__(self, taxonomy: Optional[Dict[str, List[str]]] = None,
+                 automaton_min_terms: int = AUTOMATON_MIN_TERMS):
+        self.taxonomy = taxonomy if taxonomy is not None else load_taxonomy()
+        self.categories = list(self.taxonomy)
+        terms = []
+        self._term_category = []
+        for category_id, category in enumerate(self.categories):
+            for term in self.taxonomy[category]:
+                if not term:
+                    continue
+                terms.append(term.lower())
+                self._term_category.append(category_id)
+        self.terms = terms
+        self.automaton = KeywordAutomaton(terms) if len(terms) >= automaton_min_terms else None
+
+    def _count(self, text: str) -> List[int]:
+        if self.automaton is not None:
+            return self.automaton.count(text)
+        return [text.count(term) for term in self.terms]
+
+    def scores(self, text: str) -> Dict[str, int]:
+        totals = [0] * len(self.categories)
+        for term_id, count in enumerate(self._count(text.lower())):
+            totals[self._term_category[term_id]] += count
+        return dict(zip(self.categories, totals))
+
+    def classify(self, text: str) -> str:
+        scores = self.scores(text)
+        # Get the category with the highest score (ties: first in the taxonomy)
+        best_category = max(scores, key=scores.get) if scores else None
+        # If no keywords found at all, return "Other"
+        if best_category is None or scores[best_category] == 0:
+            return "Other"
+        return best_category
+
+    def classify_batch(self, texts: List[str]) -> List[str]:
+        return [self.classify(text) for text in texts]
+
+_default_classifier: Optional[KeywordClassifier] = None
+
+def get_classifier() -> KeywordClassifier:
+    """
+    The classifier for the configured taxonomy, built once per process.
+    """
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = KeywordClassifier()
+    return _default_classifier
+
+@timed("classify", nbytes=lambda result, text, *a, **k: len(text))
 def classify_contract_type(text: str) -> str:
     """
     Classifies the contract type based on keyword frequency.
-    
-    Categories:
+
+    Categories (DEFAULT_TAXONOMY, unless CLASSIFIER_TAXONOMY points to another):
     - NDA
     - Employment Agreement
     - Services Agreement
@@ -12,28 +162,11 @@ def classify_contract_type(text: str) -> str:
     - Purchase Agreement
     - Vendor Agreement
     """
-    text = text.lower()
-    
-    keywords = {
-        "NDA": ["non-disclosure", "confidentiality agreement", "nda", "proprietary information"],
-        "Employment Agreement": ["employment agreement", "employment contract", "employee", "offer letter"],
-        "Services Agreement": ["master services agreement", "msa", "scope of work", "statement of work", "consulting agreement", "service provider"],
-        "Lease": ["lease agreement", "tenant", "landlord", "premises", "rental"],
-        "Purchase Agreement": ["purchase agreement", "asset purchase", "sales contract", "buyer", "seller"],
-        "Vendor Agreement": ["vendor agreement", "supplier", "vendor", "procurement"]
-    }
-    
-    scores = {key: 0 for key in keywords}
-    
-    for category, terms in keywords.items():
-        for term in terms:
-            scores[category] += text.count(term)
-            
-    # Get the category with the highest score
-    best_category = max(scores, key=scores.get)
-    
-    # If no keywords found at all, return "Other"
-    if scores[best_category] == 0:
-        return "Other"
-        
-    return best_category
+    return get_classifier().classify(text)
+
+@timed("classify", items=lambda result, *a, **k: len(result), nbytes=lambda result, texts, *a, **k: sum(len(t) for t in texts))
+def classify_contract_types(texts: List[str]) -> List[str]:
+    """
+    Batch version of classify_contract_type.
+    """
+    return get_classifier().classify_batch(texts)
@@ -1,107 +1,105 @@
 import re
 from typing import List, Dict
 
-def split_into_clauses(text: str) -> List[Dict[str, str]]:
+from utilities.doc_index import DocumentIndex, strip_span
+
+# Regex patterns
+# 1. Numbered headers: "1. Definitions", "2.1. Scope", "3.4.2 Title"
+# Allow an optional trailing period after the number (e.g. "1. Definitions").
+header_regex = re.compile(r"^\d+(\.\d+)*\.?\s+[A-Z][A-Za-z].+")
+
+# 2. Numbered clauses start: "1.", "2.1" (without necessarily text following immediately on same line)
+# This captures the start of a numbered list item
+numbered_clause_start = re.compile(r"^\d+(\.\d+)*\.?$")
+
+# 3. All-caps titles: "ARTICLE 1", "DEFINITIONS", assuming reasonable length (3-50 chars)
+# Avoids matching short acronyms in text or very long lines
+all_caps_title = re.compile(r"^[A-Z\d\s\W]{3,50}$")
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+def _is_header(stripped_line: str) -> bool:
+    if header_regex.match(stripped_line):
+        return True
+    # Ensure at least some letters, not just "123"
+    return bool(all_caps_title.match(stripped_line)) and any(c.isupper() for c in stripped_line)
+
+def split_into_clauses_index(text: str) -> DocumentIndex:
     """
-    Splits contract text into clauses based on section headers or paragraphs.
-    
-    Args:
-        text: The raw input text string.
-        
-    Returns:
-        A list of dictionaries with 'title' and 'body'.
+    Same splitting as split_into_clauses, recorded as spans over `text`:
+    one DocumentIndex section per clause, whose span is the (stripped) body
+    and whose title is the header line. Each section holds a single
+    unnumbered clause covering its body, so the result can go straight to
+    chunker.create_hierarchical_chunks.
     """
+    index = DocumentIndex(text or "")
     if not text:
-        return []
+        return index
 
-    clauses = []
-    lines = text.split('\n')
-    
-    # Regex patterns
-    # 1. Numbered headers: "1. Definitions", "2.1. Scope", "3.4.2 Title"
-    # Allow an optional trailing period after the number (e.g. "1. Definitions").
-    header_regex = re.compile(r"^\d+(\.\d+)*\.?\s+[A-Z][A-Za-z].+")
-    
-    # 2. Numbered clauses start: "1.", "2.1" (without necessarily text following immediately on same line)
-    # This captures the start of a numbered list item
-    numbered_clause_start = re.compile(r"^\d+(\.\d+)*\.?$") 
-
-    # 3. All-caps titles: "ARTICLE 1", "DEFINITIONS", assuming reasonable length (3-50 chars)
-    # Avoids matching short acronyms in text or very long lines
-    all_caps_title = re.compile(r"^[A-Z\d\s\W]{3,50}$")
+    title_span = None  # None: the default "Preamble/Introduction" title
+    body_start = None  # Offset of the first content line of the current clause
 
-    current_clause_title = "Preamble/Introduction" # Default start
-    current_clause_lines = []
-    
     # Heuristic to detect if we are extracting structured headers at all
     headers_found = False
 
-    for line in lines:
-        stripped_line = line.strip()
-        if not stripped_line:
-            # Keep blank lines if we are inside a clause, or ignore?
-            # Usually we want to preserve paragraph structure within a clause.
-            if current_clause_lines:
-                current_clause_lines.append(line)
-            continue
-
-        is_header = False
-        match_title = ""
-
-        # Check for specific header patterns
-        if header_regex.match(stripped_line):
-            is_header = True
-            match_title = stripped_line
-        elif all_caps_title.match(stripped_line) and any(c.isupper() for c in stripped_line): 
-             # Ensure at least some letters, not just "123"
-            is_header = True
-            match_title = stripped_line
-        
-        if is_header:
-            headers_found = True
-            # Save previous clause if it has content
-            if current_clause_lines:
-                body_text = "\n".join(current_clause_lines).strip()
-                if body_text:  # pragma: no branch
-                     clauses.append({
-                        "title": current_clause_title,
-                        "body": body_text
-                    })
-            
-            # Start new clause
-            current_clause_title = match_title
-            current_clause_lines = [] # Reset lines, header is the title
+    def add_clause(end: int):
+        start, end = strip_span(text, body_start, end)
+        if title_span is None:
+            index.add_section(start, end, title="Preamble/Introduction")
         else:
-            current_clause_lines.append(line)
+            index.add_section(start, end, title_span=title_span)
+        index.add_clause(start, end)
+
+    pos = 0
+    while pos <= len(text):
+        line_end = text.find("\n", pos)
+        if line_end < 0:
+            line_end = len(text)
+        stripped_line = text[pos:line_end].strip()
+        # Blank lines only matter inside a clause, where the body span covers them
+        if stripped_line:
+            if _is_header(stripped_line):
+                headers_found = True
+                # Save previous clause if it has content
+                if body_start is not None:
+                    add_clause(pos - 1)
+                # Start new clause, header is the title
+                title_span = strip_span(text, pos, line_end)
+                body_start = None
+            elif body_start is None:
+                body_start = pos
+        pos = line_end + 1
 
     # Append the last clause
-    if current_clause_lines:
-        body_text = "\n".join(current_clause_lines).strip()
-        if body_text:  # pragma: no branch
-            clauses.append({
-                "title": current_clause_title,
-                "body": body_text
-            })
-
-    # Fallback: If essentially no headers were found (only Preamble), 
-    # and the text is long, maybe splitting by paragraphs is better?
-    # For now, per requirements: "If no header is detected, treat paragraphs as fallback clauses."
+    if body_start is not None:
+        add_clause(len(text))
+
+    # Fallback: If essentially no headers were found (only Preamble), split by blank lines
+    # Per requirements: "If no header is detected, treat paragraphs as fallback clauses."
+    if len(index) <= 1 and not headers_found:
+        index = DocumentIndex(text)
+        start = 0
+        breaks = [(m.start(), m.end()) for m in PARAGRAPH_BREAK.finditer(text)] + [(len(text), len(text))]
+        for i, (break_start, break_end) in enumerate(breaks):
+            para_start, para_end = strip_span(text, start, break_start)
+            if para_end > para_start:
+                index.add_section(para_start, para_end, title=f"Paragraph {i+1}")
+                index.add_clause(para_start, para_end)
+            start = break_end
+
+    return index
+
+def split_into_clauses(text: str) -> List[Dict[str, str]]:
+    """
+    Splits contract text into clauses based on section headers or paragraphs.
     
-    # Refined Logic: If we only have 1 clause (Preamble) and it's huge, split it.
-    if len(clauses) <= 1 and not headers_found:
-        # Fallback split by blank lines
-        raw_paragraphs = re.split(r'\n\s*\n', text)
-        fallback_clauses = []
-        for i, para in enumerate(raw_paragraphs):
-            para = para.strip()
-            if para:
-                fallback_clauses.append({
-                    "title": f"Paragraph {i+1}",
-                    "body": para
-                })
-        return fallback_clauses
-
-    return clauses
+    Args:
+        text: The raw input text string.
+        
+    Returns:
+        A list of dictionaries with 'title' and 'body'.
+    """
+    return [{"title": section.title, "body": section.text} for section in split_into_clauses_index(text).sections()]
 
 if __name__ == "__main__":  # pragma: no cover
     # Test cases
@@ -1,5 +1,8 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
+
+from utilities.metrics import timed
+from utilities.doc_index import DocumentIndex, strip_span
 
 # Section Regex Patterns
 SECTION_PATTERNS = [
@@ -138,10 +141,104 @@ def extract_clauses(text: str) -> List[Dict[str, Any]]:
         
     return clauses
 
+def _line_pattern(pattern: str) -> str:
+    """
+    Adapts a per-line pattern for matching inside the whole text: whitespace
+    must not run past the end of the line, and a trailing ".*" is dropped
+    (only the start of the line decides).
+    """
+    pattern = pattern.lstrip("^").replace(r"\s", r"[^\S\n]")
+    return pattern[:-2] if pattern.endswith(".*") else pattern
+
+# One pass over the document: every line start that opens a section and/or a
+# clause, classified by the lookahead groups that matched. The leading "\n"
+# lets the regex engine skip straight from line to line; the first line is
+# matched separately with _LINE_START_RE.
+_SECTION_ALT = "|".join(f"(?:{_line_pattern(p)})" for p in SECTION_PATTERNS)
+_CLAUSE_MAIN = _line_pattern(CLAUSE_PATTERN_MAIN).replace("(\\.\\d+)", "(?:\\.\\d+)")
+_CLAUSE_BULLET = _line_pattern(CLAUSE_BULLET_PATTERN)
+_LINE_START = (
+    rf"(?=(?:{_SECTION_ALT})|(?:{_CLAUSE_MAIN})|(?:{_CLAUSE_BULLET}))"
+    rf"(?=(?P<section>{_SECTION_ALT})?)"
+    rf"(?=(?P<main>{_CLAUSE_MAIN})?)"
+    rf"(?=(?P<bullet>{_CLAUSE_BULLET})?)"
+)
+LINE_RE = re.compile(r"\n" + _LINE_START, re.MULTILINE)
+_LINE_START_RE = re.compile(_LINE_START, re.MULTILINE)
+
+def _line_starts(text: str) -> Iterator[Tuple[int, Any]]:
+    """
+    (offset, match) of every line that starts a section and/or clause.
+    """
+    first = _LINE_START_RE.match(text)
+    if first:
+        yield 0, first
+    for m in LINE_RE.finditer(text):
+        yield m.start() + 1, m
+
+def _add_clauses(index: DocumentIndex, start: int, end: int, clause_starts: List[Tuple[int, Tuple[int, int]]]):
+    """
+    Adds the clauses of the section text[start:end] to `index`, given the
+    (offset, number span) of the clause lines inside it. Same rules as extract_clauses.
+    """
+    text = index.text
+    if not clause_starts:
+        if text[start:end].strip():
+            index.add_clause(start, end)
+        return
+
+    first = clause_starts[0][0]
+    if first > start and text[start:first - 1].strip():
+        index.add_clause(start, first - 1)
+    for k, (offset, number_span) in enumerate(clause_starts):
+        clause_end = clause_starts[k + 1][0] - 1 if k + 1 < len(clause_starts) else end
+        index.add_clause(offset, clause_end, number_span)
+
+@timed("parse", items=lambda result, *a, **k: len(result), nbytes=lambda result, text, *a, **k: len(text))
+def parse_contract_index(text: str) -> DocumentIndex:
+    """
+    Single-pass parser: finds section headers and clause starts with one
+    compiled regex and records them as spans over `text` (see DocumentIndex),
+    without copying any section or clause text.
+
+    Slicing the spans gives exactly the section_text / clause text of the
+    line-by-line parser (see parse_contract_by_lines).
+    """
+    # Section header (offset, title span), and the clause starts of each section
+    headers: List[Tuple[int, Tuple[int, int]]] = []
+    section_clauses: List[List[Tuple[int, Tuple[int, int]]]] = [[]]
+    for offset, m in _line_starts(text):
+        if m.group("section") is not None:
+            line_end = text.find("\n", offset)
+            headers.append((offset, strip_span(text, offset, line_end if line_end >= 0 else len(text))))
+            section_clauses.append([])
+        group = "main" if m.group("main") is not None else "bullet"
+        if m.group(group) is not None:
+            section_clauses[-1].append((offset, strip_span(text, *m.span(group))))
+
+    index = DocumentIndex(text)
+    # Preamble: the lines before the first header (kept only if not blank)
+    preamble_end = headers[0][0] - 1 if headers else len(text)
+    if preamble_end > 0 and text[:preamble_end].strip():
+        index.add_section(0, preamble_end, title="PREAMBLE/UNKNOWN")
+        _add_clauses(index, 0, preamble_end, section_clauses[0])
+    for k, (offset, title_span) in enumerate(headers):
+        end = headers[k + 1][0] - 1 if k + 1 < len(headers) else len(text)
+        index.add_section(offset, end, title_span=title_span)
+        _add_clauses(index, offset, end, section_clauses[k + 1])
+    return index
+
 def parse_contract(text: str) -> List[Dict[str, Any]]:
     """
     Master function to parse contract into Sections -> Clauses.
     """
+    return parse_contract_index(text).to_parsed_structure()
+
+def parse_contract_by_lines(text: str) -> List[Dict[str, Any]]:
+    """
+    Reference line-by-line parser (extract_sections + extract_clauses).
+    parse_contract returns the same structure.
+    """
     sections = extract_sections(text)
     
     parsed_structure = []
@@ -0,0 +1,178 @@
+import os
+import re
+import zlib
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+
+from utilities.metrics import current
+
+# Boilerplate (governing law, severability, notices...) repeats across contracts.
+# Chunks whose text matches an earlier chunk exactly (after normalization) or
+# nearly (MinHash estimate of word-shingle Jaccard >= DEDUP_THRESHOLD) reuse
+# that chunk's vector instead of being embedded again.
+DEDUP_ENABLED = os.getenv("INGEST_DEDUP", "1") != "0"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "200000"))  # chunk hashes kept in memory (per run)
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16               # LSH bands of NUM_PERM // BANDS rows each
+ROWS = NUM_PERM // BANDS
+
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+
+def normalize_words(text: str) -> List[str]:
+    """
+    Lower-cased words, ignoring punctuation and whitespace differences.
+    """
+    return _WORD_RE.findall(text.lower())
+
+def content_hash(words: List[str]) -> str:
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+def minhash_signature(words: List[str]) -> np.ndarray:
+    """
+    MinHash signature (NUM_PERM uint32 values) of the word shingles of a text.
+    """
+    if len(words) <= SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _PRIME
+    return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+class DedupIndex:
+    """
+    Canonical chunks seen so far, looked up by exact content hash and by
+    MinHash LSH buckets. Chunks only match chunks of the same chunk_level.
+    Thread-safe.
+
+    At most `max_entries` content hashes (canonical chunks and the near
+    duplicates aliased to them) are kept: when a new canonical chunk finds
+    the index full, everything is dropped and a new generation starts, so a
+    long-lived index stays bounded (vectors included).
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, max_entries: int = DEDUP_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Keys are (chunk_level, content hash)
+        self._exact: Dict[tuple, tuple] = {}
+        self._buckets: Dict[tuple, List[tuple]] = {}
+        self._signatures: Dict[tuple, np.ndarray] = {}
+        self._vectors: Dict[tuple, Any] = {}
+        self.generations = 1
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _reset(self):
+        self._exact.clear()
+        self._buckets.clear()
+        self._signatures.clear()
+        self._vectors.clear()
+        self.generations += 1
+
+    def match(self, chunk: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the content hash of the canonical chunk `chunk` duplicates, or
+        None after registering `chunk` as a new canonical chunk. Sets
+        chunk["content_hash"] either way.
+        """
+        words = normalize_words(chunk["text"])
+        digest = content_hash(words)
+        chunk["content_hash"] = digest
+        level = chunk.get("chunk_level")
+
+        with self._lock:
+            canonical = self._exact.get((level, digest))
+            if canonical is not None:
+                return canonical[1]
+
+        signature = minhash_signature(words)
+        bands = [(level, b, signature[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+
+        with self._lock:
+            for band in bands:
+                for candidate in self._buckets.get(band, ()):
+                    if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                        if len(self._exact) < self.max_entries:
+                            self._exact[(level, digest)] = candidate
+                        return candidate[1]
+
+            if len(self._exact) >= self.max_entries:
+                self._reset()
+            key = (level, digest)
+            self._exact[key] = key
+            self._signatures[key] = signature
+            for band in bands:
+                self._buckets.setdefault(band, []).append(key)
+        return None
+
+    def vector(self, chunk_level: int, canonical: str):
+        with self._lock:
+            return self._vectors.get((chunk_level, canonical))
+
+    def set_vector(self, chunk: Dict[str, Any]):
+        """
+        Stores the vector of `chunk` if it is a canonical chunk.
+        """
+        key = (chunk.get("chunk_level"), chunk["content_hash"])
+        with self._lock:
+            if key in self._signatures:
+                # A copy: a row view would keep its whole batch's array alive
+                self._vectors[key] = np.array(chunk["vector"], dtype=np.float32)
+
+class DedupEmbedder:
+    """
+    Wraps an embed function (e.g. generate_embeddings) so that only chunks
+    without an already embedded duplicate are sent to the model. Duplicates
+    get the canonical chunk's vector and chunk["duplicate_of"] = its content hash.
+
+    A duplicate whose canonical chunk is still being embedded by another
+    worker is simply embedded itself.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 index: Optional[DedupIndex] = None):
+        self.embed_fn = embed_fn
+        self.index = index if index is not None else DedupIndex()
+        self._lock = threading.Lock()
+        self.stats = {"chunks": 0, "embedded": 0, "duplicates": 0}
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        metrics = current()
+        with metrics.stage("dedup", items=len(chunks)):
+            to_embed = []
+            duplicates = 0
+            for chunk in chunks:
+                canonical = self.index.match(chunk)
+                vector = self.index.vector(chunk.get("chunk_level"), canonical) if canonical is not None else None
+                if vector is not None:
+                    chunk["vector"] = vector
+                    chunk["duplicate_of"] = canonical
+                    duplicates += 1
+                else:
+                    to_embed.append(chunk)
+
+        if to_embed:
+            self.embed_fn(to_embed)
+            for chunk in to_embed:
+                if chunk.get("vector") is not None:
+                    self.index.set_vector(chunk)
+
+        metrics.record("dedup_skipped", items=duplicates, calls=0)
+        with self._lock:
+            self.stats["chunks"] += len(chunks)
+            self.stats["embedded"] += len(to_embed)
+            self.stats["duplicates"] += duplicates
+        return chunks
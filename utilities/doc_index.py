@@ -0,0 +1,180 @@
+import re
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_NON_SPACE_RE = re.compile(r"\S")
+
+def strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """
+    The span of text[start:end].strip(), without copying the text.
+    """
+    m = _NON_SPACE_RE.search(text, start, end)
+    if not m:
+        return start, start
+    start = m.start()
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+class DocumentIndex:
+    """
+    Section/clause structure of one document as integer spans over a single
+    text buffer. Texts are only sliced out when asked for (see SectionView),
+    so a parsed document costs a few integers per section and clause on top
+    of its text.
+
+    Built by contract_parser.parse_contract_index and
+    clause_splitter.split_into_clauses_index; consumed by
+    chunker.create_hierarchical_chunks.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # Per section: text span, title span (or a literal title in _titles)
+        self._sec_start = array("q")
+        self._sec_end = array("q")
+        self._title_start = array("q")
+        self._title_end = array("q")
+        self._titles: Dict[int, str] = {}
+        # Per clause: owning section, text span, number span (-1 = no number)
+        self._clause_sec = array("q")
+        self._clause_start = array("q")
+        self._clause_end = array("q")
+        self._num_start = array("q")
+        self._num_end = array("q")
+        # First clause of each section (plus a sentinel at the end)
+        self._sec_clauses = array("q", [0])
+
+    # --- building ---
+
+    def add_section(self, start: int, end: int, title_span: Optional[Tuple[int, int]] = None,
+                    title: Optional[str] = None) -> int:
+        """
+        Appends a section covering text[start:end]. Its title is either a span
+        of the text or, for titles that aren't in the text, a literal string.
+        """
+        index = len(self._sec_start)
+        self._sec_start.append(start)
+        self._sec_end.append(end)
+        if title_span is None:
+            self._title_start.append(-1)
+            self._title_end.append(-1)
+            self._titles[index] = title or ""
+        else:
+            self._title_start.append(title_span[0])
+            self._title_end.append(title_span[1])
+        self._sec_clauses.append(self._sec_clauses[-1])
+        return index
+
+    def add_clause(self, start: int, end: int, number_span: Optional[Tuple[int, int]] = None):
+        """
+        Appends a clause covering text[start:end] to the last section.
+        """
+        self._clause_sec.append(len(self._sec_start) - 1)
+        self._clause_start.append(start)
+        self._clause_end.append(end)
+        self._num_start.append(number_span[0] if number_span else -1)
+        self._num_end.append(number_span[1] if number_span else -1)
+        self._sec_clauses[-1] += 1
+
+    # --- reading ---
+
+    def __len__(self) -> int:
+        return len(self._sec_start)
+
+    @property
+    def clause_count(self) -> int:
+        return len(self._clause_start)
+
+    def section_span(self, i: int) -> Tuple[int, int]:
+        return self._sec_start[i], self._sec_end[i]
+
+    def section_text(self, i: int) -> str:
+        return self.text[self._sec_start[i]:self._sec_end[i]]
+
+    def section_title(self, i: int) -> str:
+        if self._title_start[i] < 0:
+            return self._titles[i]
+        return self.text[self._title_start[i]:self._title_end[i]]
+
+    def section_clauses(self, i: int) -> range:
+        """
+        Indices of the clauses of section i (for the clause_* accessors).
+        """
+        return range(self._sec_clauses[i], self._sec_clauses[i + 1])
+
+    def clause_span(self, j: int) -> Tuple[int, int]:
+        return self._clause_start[j], self._clause_end[j]
+
+    def clause_text(self, j: int) -> str:
+        return self.text[self._clause_start[j]:self._clause_end[j]]
+
+    def clause_number(self, j: int) -> Optional[str]:
+        if self._num_start[j] < 0:
+            return None
+        return self.text[self._num_start[j]:self._num_end[j]]
+
+    def sections(self) -> Iterator["SectionView"]:
+        for i in range(len(self)):
+            yield SectionView(self, i)
+
+    def to_parsed_structure(self) -> List[Dict[str, Any]]:
+        """
+        The list-of-dicts form returned by contract_parser.parse_contract.
+        """
+        return [
+            {
+                "section_title": section.title,
+                "section_text": section.text,
+                "clauses": [{"number": clause.number, "text": clause.text} for clause in section.clauses],
+            }
+            for section in self.sections()
+        ]
+
+class ClauseView:
+    """
+    One clause of a DocumentIndex; text and number are sliced on access.
+    """
+    __slots__ = ("index", "i")
+
+    def __init__(self, index: DocumentIndex, i: int):
+        self.index = index
+        self.i = i
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        return self.index.clause_span(self.i)
+
+    @property
+    def text(self) -> str:
+        return self.index.clause_text(self.i)
+
+    @property
+    def number(self) -> Optional[str]:
+        return self.index.clause_number(self.i)
+
+class SectionView:
+    """
+    One section of a DocumentIndex; title and text are sliced on access.
+    """
+    __slots__ = ("index", "i")
+
+    def __init__(self, index: DocumentIndex, i: int):
+        self.index = index
+        self.i = i
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        return self.index.section_span(self.i)
+
+    @property
+    def text(self) -> str:
+        return self.index.section_text(self.i)
+
+    @property
+    def title(self) -> str:
+        return self.index.section_title(self.i)
+
+    @property
+    def clauses(self) -> List[ClauseView]:
+        return [ClauseView(self.index, j) for j in self.index.section_clauses(self.i)]
@@ -0,0 +1,131 @@
+import os
+import atexit
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from utilities.metrics import current
+from utilities.model_registry import registry
+from utilities.embedder import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_TOKEN_BUDGET,
+    cache_model_id, configure_threads, embed_chunks, encode_batches, estimate_tokens, load_model, token_batches,
+)
+
+# Bulk embedding on CPU nodes: one model per worker process, each with its own
+# torch threads, so a large corpus keeps every core busy (see EmbeddingPool)
+EMBED_POOL_WORKERS = int(os.getenv("EMBED_POOL_WORKERS", "0"))  # 0 = embed in-process (generate_embeddings)
+EMBED_POOL_THREADS = int(os.getenv("EMBED_POOL_THREADS", "0"))  # torch threads per worker (0 = cores / workers)
+# Start method of the workers (empty = the platform default: fork on Linux). Forked
+# workers share the parent's memory and never touch its CUDA context (they embed
+# on CPU); "spawn" starts them clean but re-imports the __main__ script in each.
+EMBED_POOL_START_METHOD = os.getenv("EMBED_POOL_START_METHOD", "")
+
+# The model of this worker process (set by _init_worker)
+_worker_model = None
+
+def _init_worker(model_name: str, backend: str, threads: int):
+    global _worker_model
+    # A CPU copy preloaded by the parent (model_registry.preload) is shared copy-on-write
+    preloaded = registry.loaded(cache_model_id(model_name, backend))
+    if preloaded is not None and str(getattr(preloaded, "device", "")) == "cpu":
+        configure_threads(threads)
+        _worker_model = preloaded
+    else:
+        _worker_model = load_model(model_name, backend=backend, device="cpu", threads=threads)
+
+def _encode_shard(texts: List[str], lengths: List[int], token_budget: int) -> np.ndarray:
+    return encode_batches(_worker_model, texts, lengths, token_budget)
+
+def _warmup(_=None) -> int:
+    return os.getpid()
+
+class EmbeddingPool:
+    """
+    Worker processes that each load the embedding model on CPU. A call embeds
+    a list of chunks like generate_embeddings (same embedding cache, same
+    vectors): the texts to encode are cut into token-budgeted batches
+    (embedder.token_batches), spread over the workers, and their vectors
+    written back in input order.
+
+    Usable as the pipeline's embed_fn; safe to call from several threads.
+    """
+
+    def __init__(self, workers: int = EMBED_POOL_WORKERS, threads: int = EMBED_POOL_THREADS,
+                 model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND,
+                 token_budget: int = EMBEDDING_TOKEN_BUDGET, start_method: str = EMBED_POOL_START_METHOD):
+        self.workers = max(1, workers)
+        self.threads = threads if threads > 0 else max(1, (os.cpu_count() or 1) // self.workers)
+        self.model_name = model_name
+        self.backend = backend
+        self.model_id = cache_model_id(model_name, backend)
+        self.token_budget = token_budget
+        print(f"Starting {self.workers} embedding worker processes ({model_name}, {backend}, "
+              f"{self.threads} threads each)...")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method or None),
+            initializer=_init_worker,
+            initargs=(model_name, backend, self.threads),
+        )
+
+    def warmup(self):
+        """
+        Starts every worker (and loads its model) now rather than on the first batch.
+        """
+        list(self._executor.map(_warmup, range(self.workers)))
+
+    def encode(self, texts: List[str], lengths: Optional[Sequence[Optional[int]]] = None) -> np.ndarray:
+        """
+        Vectors of `texts` (float32, one row per text, in input order).
+        `lengths` are token counts as for embedder.encode_batches.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if lengths is None:
+            lengths = [None] * len(texts)
+        lengths = [n if n is not None else estimate_tokens(text) for text, n in zip(texts, lengths)]
+
+        batches = token_batches(lengths, self.token_budget)
+        futures = [
+            self._executor.submit(_encode_shard, [texts[i] for i in batch], [lengths[i] for i in batch], self.token_budget)
+            for batch in batches
+        ]
+        vectors = None
+        for batch, future in zip(batches, futures):
+            encoded = future.result()
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+        return vectors
+
+    def __call__(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with current().stage("embed", items=len(chunks)):
+            return embed_chunks(chunks, self.encode, self.model_id)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_shared_pool: Optional[EmbeddingPool] = None
+_shared_lock = threading.Lock()
+
+def get_pool(workers: int = EMBED_POOL_WORKERS, **kwargs) -> Optional[EmbeddingPool]:
+    """
+    A process-wide EmbeddingPool (started on first use, shut down at exit),
+    or None when workers is 0.
+    """
+    global _shared_pool
+    if workers <= 0:
+        return None
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = EmbeddingPool(workers, **kwargs)
+            atexit.register(_shared_pool.close)
+        return _shared_pool
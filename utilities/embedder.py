@@ -1,38 +1,207 @@
-from typing import List, Dict, Any
+import os
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence
 from sentence_transformers import SentenceTransformer
 
-# Initialize the model once (global cache)
+from utilities.metrics import current, timed
+from utilities.embedding_cache import cached_encode, get_cache
+from utilities.model_registry import registry
+
+# Embedding backend (all overridable through the environment)
 # 'all-MiniLM-L6-v2' is a good balance of speed and quality for local use
-_model = None
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")      # auto | cuda | mps | cpu
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")   # torch (fp32) | int8 (dynamic quantization, CPU)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # torch intra-op threads (0 = torch default)
+# Batches are sized by padded tokens (texts x longest text), not by a fixed count
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "16384"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "512"))
 
-def get_model():
-    global _model
-    if _model is None:
-        print("Loading local embedding model (all-MiniLM-L6-v2) on CUDA...")
-        _model = SentenceTransformer('all-MiniLM-L6-v2', device='cuda')
-    return _model
+BACKENDS = ("torch", "int8")
 
-def generate_embeddings(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def resolve_device(device: str = EMBEDDING_DEVICE) -> str:
     """
-    Generates embeddings for a list of chunk objects using local SentenceTransformers.
-    Attaches them to the 'vector' key.
+    "auto" picks CUDA, then Apple MPS, then CPU, depending on what torch sees.
+    """
+    if device != "auto":
+        return device
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+def configure_threads(threads: int = EMBEDDING_THREADS):
+    """
+    Sets torch's intra-op thread count (matrix multiplications inside one
+    encode call). 0 keeps torch's default of one thread per core.
+    """
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+def quantize_model(model):
+    """
+    int8 dynamic quantization of every nn.Linear (weights stored as int8,
+    activations quantized on the fly). CPU only.
+    """
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_model(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND,
+               device: str = EMBEDDING_DEVICE, threads: int = EMBEDDING_THREADS):
+    """
+    Loads a SentenceTransformer for the given backend:
+    - "torch": fp32 on the resolved device
+    - "int8": dynamically quantized on CPU (the fastest CPU path; its
+      parity with the fp32 vectors is tested in test_embedder and
+      measured on a corpus by bench_embedder)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    device = resolve_device(device)
+    if backend == "int8" and device != "cpu":
+        print(f"int8 embedding backend runs on CPU only (requested device: {device}).")
+        device = "cpu"
+    configure_threads(threads)
+
+    print(f"Loading local embedding model ({model_name}, {backend}) on {device}...")
+    model = SentenceTransformer(model_name, device=device)
+    if backend == "int8":
+        model = quantize_model(model)
+    return model
+
+def cache_model_id(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Embedding cache namespace: vectors of different models/backends never mix.
+    """
+    return f"{model_name}/{backend}"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token) for texts that come
+    without a chunker token_count.
+    """
+    return len(text) // 4 + 1
+
+def token_batches(lengths: Sequence[int], token_budget: int = EMBEDDING_TOKEN_BUDGET,
+                  max_batch: int = EMBEDDING_MAX_BATCH) -> List[List[int]]:
+    """
+    Splits text indices into batches of similar length: longest first, each
+    batch growing while (texts x its longest text) stays within token_budget,
+    so short clauses are encoded many at a time and long sections are not
+    padded against them. A text longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, batch = [], []
+    for i in order:
+        # Sorted longest first: the batch's first text sets its padded length
+        if batch and ((len(batch) + 1) * lengths[batch[0]] > token_budget or len(batch) >= max_batch):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def encode_batches(model, texts: List[str], lengths: Optional[Sequence[Optional[int]]] = None,
+                   token_budget: int = EMBEDDING_TOKEN_BUDGET) -> np.ndarray:
+    """
+    model.encode over token_batches of `texts`, with the vectors put back in
+    the order of `texts`.
+
+    Args:
+        lengths: Token count of each text (chunk "token_count"); missing
+            ones are estimated. Counts are capped at the model's
+            max_seq_length, since longer texts are truncated anyway.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if lengths is None:
+        lengths = [None] * len(texts)
+    lengths = [n if n is not None else estimate_tokens(text) for text, n in zip(texts, lengths)]
+    cap = getattr(model, "max_seq_length", None)
+    if isinstance(cap, int) and cap > 0:
+        lengths = [min(n, cap) for n in lengths]
+
+    vectors = None
+    for batch in token_batches(lengths, token_budget):
+        encoded = np.asarray(model.encode([texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True),
+                             dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        vectors[batch] = encoded
+    return vectors
+
+def register_model(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Registers the model with the model registry (without loading it) and
+    returns its registry name, which is also its embedding cache namespace.
+    """
+    name = cache_model_id(model_name, backend)
+    registry.register(name, lambda: load_model(model_name, backend=backend),
+                      warmup=lambda model: model.encode(["warmup"], convert_to_numpy=True))
+    return name
+
+def get_model(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND):
+    """
+    The process-wide model (one copy, shared with app.py through the model registry).
+    """
+    return registry.get(register_model(model_name, backend))
+
+def embed_chunks(chunks: List[Dict[str, Any]], encode: Callable[[List[str], List[Optional[int]]], np.ndarray],
+                 model_id: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Sets chunk["vector"] for every chunk, as rows of one float32 array.
+    encode(texts, token_counts) embeds the texts missing from the embedding
+    cache (`model_id` namespace; None bypasses the cache).
     """
     if not chunks:
         return []
 
-    model = get_model()
-    
     texts = [chunk["text"] for chunk in chunks]
-    
+    token_counts = {chunk["text"]: chunk.get("token_count") for chunk in chunks}
+
     try:
-        # Encode all texts at once (the library handles batching efficiently)
-        embeddings = model.encode(texts, batch_size=512, convert_to_numpy=True)
-        
+        embeddings = cached_encode(
+            texts,
+            lambda missing: encode(missing, [token_counts.get(t) for t in missing]),
+            model_id,
+            get_cache() if model_id else None,
+        )
+
+        # Each chunk refers to its row of the batch's float32 matrix (a view,
+        # not a copy); it is converted only when sent to Weaviate
         for i, chunk in enumerate(chunks):
-            # Convert numpy array to list for JSON serialization/Weaviate
-            chunk["vector"] = embeddings[i].tolist()
-                
+            chunk["vector"] = embeddings[i]
+
     except Exception as e:
         print(f"Error generating embeddings: {e}")
-        
+        current().record("embed", errors=len(chunks), calls=0)
+
     return chunks
+
+@timed("embed", items=lambda result, chunks, *a, **k: len(chunks))
+def generate_embeddings(chunks: List[Dict[str, Any]], model: Optional[Any] = None,
+                        model_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Generates embeddings for a list of chunk objects using local SentenceTransformers.
+    Attaches them to the 'vector' key, as rows of one float32 array. Texts
+    already in the embedding cache (see embedding_cache.py) are not sent to
+    the model; the others are encoded in length-sorted, token-budgeted batches.
+
+    Args:
+        model: Model to use instead of the process-wide one (see load_model).
+        model_id: Cache namespace of `model` (see cache_model_id); without
+            it, a custom model bypasses the cache.
+    """
+    if not chunks:
+        return []
+
+    if model is None:
+        model = get_model()
+        model_id = cache_model_id()
+
+    return embed_chunks(chunks, lambda texts, lengths: encode_batches(model, texts, lengths), model_id)
@@ -0,0 +1,191 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+
+from utilities.metrics import current
+
+# Persistent cache of embeddings, keyed by model + hash of the normalized text,
+# so unchanged chunks (re-sent contracts, re-runs of process_data.py) and
+# repeated queries are never sent to the model twice.
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") != "0"
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "embedding_cache.sqlite3"),
+)
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "2048"))  # least recently used entries evicted above this
+
+def normalize_text(text: str) -> str:
+    """
+    NFC and collapsed whitespace: differences the model's tokenizer ignores anyway.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """
+    Embedding vectors (float32) in an SQLite file, shared by every thread and
+    process that opens the same path. Entries are evicted least recently
+    used first once the stored vectors exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_bytes: int = int(EMBED_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._size: Optional[int] = None
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per process (a connection must not cross a fork)
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._conn, self._pid, self._size = conn, os.getpid(), None
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._current_size(self._connect())
+
+    def _current_size(self, conn: sqlite3.Connection) -> int:
+        if self._size is None:
+            self._size = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        return self._size
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Cached vector of each text, or None.
+        """
+        keys = [cache_key(model, text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            conn = self._connect()
+            unique = list(set(keys))
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                marks = ",".join("?" * len(part))
+                for key, blob in conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part):
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if found:
+                    conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})", [time.time()] + part)
+            vectors = [found.get(key) for key in keys]
+            hits = sum(v is not None for v in vectors)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+        return vectors
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [(cache_key(model, text), model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self._lock:
+            conn = self._connect()
+            # Replaced entries are counted twice here; _evict recounts exactly
+            size = self._current_size(conn) + sum(len(row[2]) for row in rows)
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._size = size
+            if size > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """
+        Drops least recently used entries down to 90% of max_bytes.
+        """
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        target = int(self.max_bytes * 0.9)
+        if total <= target or not count:
+            self._size = total
+            return
+        excess_rows = -(-(total - target) * count // total)  # vectors of one model are all the same size
+        conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                     (excess_rows,))
+        self.stats["evicted"] += excess_rows
+        self._size = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+def cached_encode(texts: List[str], encode: Callable[[List[str]], Sequence[Sequence[float]]], model: str,
+                  cache: Optional[EmbeddingCache]) -> np.ndarray:
+    """
+    Vectors of `texts` as one float32 matrix (a row per text), taking what it
+    can from `cache` and calling encode(missing texts) for the rest (each
+    distinct text encoded once). Cache errors are reported and otherwise
+    ignored: the model is the fallback.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if cache is None:
+        return np.asarray(encode(texts), dtype=np.float32)
+
+    try:
+        vectors = cache.get_many(model, texts)
+    except Exception as e:
+        print(f"Embedding cache read error: {e}")
+        vectors = [None] * len(texts)
+
+    missing: Dict[str, List[int]] = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(texts[i], []).append(i)
+    current().record("embed_cache_hits", items=len(texts) - sum(len(v) for v in missing.values()), calls=0)
+
+    new_vectors = None
+    if missing:
+        new_texts = list(missing)
+        new_vectors = np.asarray(encode(new_texts), dtype=np.float32)
+        try:
+            cache.put_many(model, new_texts, new_vectors)
+        except Exception as e:
+            print(f"Embedding cache write error: {e}")
+
+    dim = new_vectors.shape[1] if new_vectors is not None else next(len(v) for v in vectors)
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[i] = vector
+    if new_vectors is not None:
+        for row, rows in enumerate(missing.values()):
+            matrix[rows] = new_vectors[row]
+    return matrix
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """
+    The process-wide cache at EMBED_CACHE_PATH, or None when EMBED_CACHE=0.
+    """
+    global _default_cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# Last successful stage recorded for a document.
+STAGE_PARSED = "parsed"      # chunks written to the JSONL export
+STAGE_INSERTED = "inserted"  # chunks embedded and inserted into Weaviate
+STAGE_FAILED = "failed"
+
+MANIFEST_VERSION = 1
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Content hash of a file, read in blocks so large PDFs aren't loaded at once.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestManifest:
+    """
+    Persistent record of what process_data.py has ingested, keyed by file path.
+
+    Each entry stores the content hash of the file, the document_id its chunks
+    were written under and the last stage that completed for it:
+    { "hash": str, "document_id": str, "stage": str, "chunk_count": int, "updated_at": float }
+
+    Safe to update from several pipeline threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.documents = data.get("documents", {})
+            else:
+                print(f"Ignoring manifest {path} with unknown version {data.get('version')}")
+
+    def save(self):
+        """
+        Writes the manifest atomically (temp file + rename), so a crash while
+        saving never leaves a truncated manifest behind.
+        """
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "documents": self.documents}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        return self.documents.get(file_path)
+
+    def is_current(self, file_path: str, content_hash: str) -> bool:
+        """
+        True if the file was fully ingested and hasn't changed since.
+        """
+        entry = self.documents.get(file_path)
+        return bool(entry) and entry["hash"] == content_hash and entry["stage"] == STAGE_INSERTED
+
+    def mark(self, file_path: str, content_hash: str, stage: str, document_id: str, **extra):
+        entry = {
+            "hash": content_hash,
+            "document_id": document_id,
+            "stage": stage,
+            "updated_at": time.time(),
+        }
+        entry.update(extra)
+        with self._lock:
+            self.documents[file_path] = entry
+
+    def remove(self, file_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.documents.pop(file_path, None)
+
+    def missing_paths(self, seen_paths: Iterable[str]) -> List[str]:
+        """
+        Paths recorded in the manifest that no longer exist in the scanned folder.
+        """
+        seen = set(seen_paths)
+        return sorted(p for p in self.documents if p not in seen)
@@ -0,0 +1,189 @@
+import time
+import json
+import threading
+import importlib
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# A sink receives one event per recorded measurement:
+# { "stage": str, "seconds": float, "items": int, "bytes": int, "errors": int, "document_id": Optional[str] }
+Sink = Callable[[Dict[str, Any]], None]
+
+_FIELDS = ("calls", "seconds", "items", "bytes", "errors")
+
+class Metrics:
+    """
+    Per-stage counters for the ingestion pipeline: wall time, calls, items,
+    bytes and errors, overall and per document. Thread-safe.
+
+    Measurements are recorded into the *current* Metrics (see current()), so
+    the utility modules can be timed with @timed without passing an object around.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.documents: Dict[str, Dict[str, float]] = {}
+        self.sinks: List[Sink] = []
+
+    def add_sink(self, sink: Sink):
+        """
+        Registers an external sink (StatsD, Prometheus, a log shipper...).
+        Sink errors are printed and otherwise ignored.
+        """
+        self.sinks.append(sink)
+
+    def record(self, stage: str, seconds: float = 0.0, items: int = 0, nbytes: int = 0,
+               errors: int = 0, document_id: Optional[str] = None, calls: int = 1):
+        with self._lock:
+            totals = self.stages.setdefault(stage, dict.fromkeys(_FIELDS, 0))
+            totals["calls"] += calls
+            totals["seconds"] += seconds
+            totals["items"] += items
+            totals["bytes"] += nbytes
+            totals["errors"] += errors
+            if document_id is not None:
+                doc = self.documents.setdefault(document_id, {})
+                doc[stage] = doc.get(stage, 0.0) + seconds
+                if errors:
+                    doc["errors"] = doc.get("errors", 0) + errors
+
+        event = {"stage": stage, "seconds": seconds, "items": items, "bytes": nbytes,
+                 "errors": errors, "document_id": document_id}
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"Metrics sink error: {e}")
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, nbytes: int = 0, document_id: Optional[str] = None):
+        """
+        Times a block. Exceptions are counted as errors and re-raised.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(name, time.perf_counter() - start, items, nbytes, errors=1, document_id=document_id)
+            raise
+        self.record(name, time.perf_counter() - start, items, nbytes, document_id=document_id)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Stage totals as plain dicts (picklable, e.g. to send back from a worker process).
+        """
+        with self._lock:
+            return {name: dict(values) for name, values in self.stages.items()}
+
+    def merge(self, stages: Dict[str, Dict[str, float]], document_id: Optional[str] = None):
+        """
+        Adds the stage totals of another Metrics (e.g. from a worker process).
+        """
+        for name, values in stages.items():
+            self.record(name, values["seconds"], int(values["items"]), int(values["bytes"]),
+                        int(values["errors"]), document_id=document_id, calls=int(values["calls"]))
+
+    def summary(self, include_documents: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for name, values in sorted(self.stages.items()):
+                stages[name] = {
+                    "calls": int(values["calls"]),
+                    "seconds": round(values["seconds"], 4),
+                    "avg_ms": round(values["seconds"] * 1000 / values["calls"], 3) if values["calls"] else 0.0,
+                    "items": int(values["items"]),
+                    "bytes": int(values["bytes"]),
+                    "errors": int(values["errors"]),
+                }
+            result = {"elapsed_seconds": round(time.time() - self.started_at, 3), "stages": stages}
+            if include_documents:
+                result["documents"] = {
+                    doc_id: {k: round(v, 4) for k, v in values.items()}
+                    for doc_id, values in self.documents.items()
+                }
+        return result
+
+    def write_summary(self, path: str, include_documents: bool = True):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(include_documents=include_documents), f, indent=2)
+
+    def format_table(self) -> str:
+        lines = [f"{'stage':<12}{'calls':>8}{'seconds':>10}{'avg ms':>10}{'items':>10}{'MB':>9}{'errors':>8}"]
+        for name, v in self.summary()["stages"].items():
+            lines.append(f"{name:<12}{v['calls']:>8}{v['seconds']:>10.2f}{v['avg_ms']:>10.2f}"
+                         f"{v['items']:>10}{v['bytes'] / 1e6:>9.1f}{v['errors']:>8}")
+        return "\n".join(lines)
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes this the current Metrics for the calling thread.
+        """
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        try:
+            yield self
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def install(self):
+        """
+        Makes this the current Metrics for every thread that hasn't activated its own.
+        """
+        global _installed
+        previous, _installed = _installed, self
+        try:
+            yield self
+        finally:
+            _installed = previous
+
+# Process-wide default, used when nothing was activated or installed
+REGISTRY = Metrics()
+_installed: Optional[Metrics] = None
+_local = threading.local()
+
+def current() -> Metrics:
+    stack = getattr(_local, "stack", None)
+    if stack:
+        return stack[-1]
+    return _installed or REGISTRY
+
+def timed(stage: str, items: Optional[Callable[..., int]] = None, nbytes: Optional[Callable[..., int]] = None):
+    """
+    Decorator recording each call of a function as `stage` in the current Metrics.
+    `items` and `nbytes` are called as f(result, *args, **kwargs) to size the call.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                current().record(stage, time.perf_counter() - start, errors=1)
+                raise
+            elapsed = time.perf_counter() - start
+            current().record(
+                stage,
+                elapsed,
+                items(result, *args, **kwargs) if items else 1,
+                nbytes(result, *args, **kwargs) if nbytes else 0,
+            )
+            return result
+        return wrapper
+    return decorator
+
+def load_sink(spec: str) -> Sink:
+    """
+    Resolves "package.module:callable" to a sink function (see INGEST_METRICS_SINK).
+    """
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Metrics sink must look like 'module:callable', got '{spec}'")
+    return getattr(importlib.import_module(module_name), attr)
@@ -0,0 +1,162 @@
+import os
+import gc
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Models to load up front by preload() (comma-separated registered names, or "all").
+# With a pre-fork server (e.g. gunicorn --preload), loading in the parent lets every
+# worker share the weights copy-on-write instead of loading its own copy.
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "")
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") != "0"  # one inference right after loading
+
+def _rss_bytes() -> Optional[int]:
+    """
+    Resident set size of this process (Linux), or None.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def tensor_bytes(model: Any) -> Optional[int]:
+    """
+    Bytes of the parameters and buffers of a torch module (quantized modules
+    included through their state_dict), or None for other objects.
+    """
+    state_dict = getattr(model, "state_dict", None)
+    if state_dict is None:
+        return None
+    total = 0
+    for value in state_dict().values():
+        if hasattr(value, "element_size") and hasattr(value, "nelement"):
+            total += value.element_size() * value.nelement()
+    return total
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]]):
+        self.loader = loader
+        self.warmup = warmup
+        self.lock = threading.Lock()
+        self.model = None
+        self.info: Dict[str, Any] = {}
+
+class ModelRegistry:
+    """
+    Owns each model once per process. Models are registered by name with a
+    loader (and an optional warmup inference), loaded on first get(), and
+    report their load time and memory (see report()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        """
+        Registers `name` unless it already is (the first registration wins, so
+        every module asking for the same model shares one copy).
+        """
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader, warmup)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def _entry(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model '{name}' (registered: {', '.join(self.names()) or 'none'})")
+        return entry
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry is not None and entry.model is not None
+
+    def loaded(self, name: str) -> Optional[Any]:
+        """
+        The model if it is already loaded, without loading it.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry.model if entry is not None else None
+
+    def get(self, name: str) -> Any:
+        """
+        The model, loaded (and warmed up) by the first caller; concurrent
+        callers wait for that load instead of starting their own.
+        """
+        entry = self._entry(name)
+        if entry.model is not None:
+            return entry.model
+        with entry.lock:
+            if entry.model is None:
+                rss_before = _rss_bytes()
+                t0 = time.perf_counter()
+                model = entry.loader()
+                info = {"load_seconds": round(time.perf_counter() - t0, 3), "pid": os.getpid()}
+                if entry.warmup is not None and MODEL_WARMUP:
+                    t0 = time.perf_counter()
+                    try:
+                        entry.warmup(model)
+                        info["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+                    except Exception as e:
+                        print(f"Warmup of model '{name}' failed: {e}")
+                rss_after = _rss_bytes()
+                info["tensor_bytes"] = tensor_bytes(model)
+                info["rss_delta_bytes"] = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+                entry.info = info
+                entry.model = model
+                print(f"Model '{name}' loaded in {info['load_seconds']}s"
+                      + (f" ({info['tensor_bytes'] / 2**20:.1f} MiB of weights)" if info["tensor_bytes"] else ""))
+        return entry.model
+
+    def unload(self, name: str):
+        entry = self._entry(name)
+        with entry.lock:
+            entry.model = None
+            entry.info = {}
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per registered model: loaded or not, and for loaded models the load and
+        warmup time, the bytes of its weights and the growth of the process RSS
+        while loading it.
+        """
+        with self._lock:
+            entries = dict(self._entries)
+        return {name: {"loaded": entry.model is not None, **entry.info} for name, entry in entries.items()}
+
+    def preload(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Loads `names` (default: every registered model), then moves every
+        object allocated so far out of the garbage collector's reach
+        (gc.freeze), so forked workers do not dirty the shared pages of the
+        weights by collecting them. Call before forking.
+        """
+        names = self.names() if names is None else list(names)
+        for name in names:
+            self.get(name)
+        gc.collect()
+        gc.freeze()
+        return names
+
+registry = ModelRegistry()
+
+def preload_from_env(spec: str = MODEL_PRELOAD) -> List[str]:
+    """
+    preload() the models listed in MODEL_PRELOAD ("all" = every registered
+    model); nothing when it is empty.
+    """
+    spec = spec.strip()
+    if not spec:
+        return []
+    names = None if spec == "all" else [name.strip() for name in spec.split(",") if name.strip()]
+    loaded = registry.preload(names)
+    print(f"Preloaded models: {', '.join(loaded)}")
+    return loaded
@@ -1,8 +1,186 @@
 import os
+import bisect
+import multiprocessing
 import pypdfium2 as pdfium
-from typing import List, Dict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-def load_pdfs_from_folder(root_folder: str) -> List[Dict[str, str]]:
+from utilities.metrics import current, timed
+from utilities.text_cleaner import clean_pages
+
+# PDFs with at least this many pages are extracted in parallel page ranges
+# when a worker pool is available.
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "200"))
+PAGES_PER_RANGE = int(os.getenv("PDF_PAGES_PER_RANGE", "50"))
+# Start method of the extraction and parse process pools. Ingestion runs threads (pipeline
+# stages, the background inserter, torch) and forking a multithreaded process can deadlock
+# on a lock held at fork time, so workers are started clean ("forkserver" or "spawn")
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "forkserver")
+
+def _started(_=None) -> int:
+    return os.getpid()
+
+def process_pool(workers: int, start_method: str = INGEST_START_METHOD) -> Optional[ProcessPoolExecutor]:
+    """
+    A pool of `workers` processes with the given start method (empty = the
+    platform default), already started; None when workers <= 1. Create it
+    before starting threads, and pass it to iter_pdfs / ingest_documents.
+    """
+    if workers <= 1:
+        return None
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method or None))
+    list(executor.map(_started, range(workers)))
+    return executor
+
+def find_pdf_files(root_folder: str) -> Iterator[str]:
+    """
+    Recursively walks the folder and yields every PDF path, in a stable (sorted) order.
+    """
+    for root, dirs, files in os.walk(root_folder):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(".pdf"):
+                yield os.path.join(root, file)
+
+def extract_page_range(file_path: str, first: int, last: int) -> List[str]:
+    """
+    Extracts the text of pages [first, last) of a PDF. Opens its own document
+    handle, so it can run in a worker process (pdfium is not thread-safe).
+    """
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        texts = []
+        for i in range(first, last):
+            page = pdf[i]
+            text_page = page.get_textpage()
+            # text_page.close() # automatic in newer versions, but good practice if needed
+            texts.append(text_page.get_text_range() or "")
+        return texts
+    finally:
+        pdf.close()
+
+def _assemble_pages(page_texts: List[str]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Joins page texts (one '\n' after each non-empty page) and returns the
+    text along with each page's character span.
+    """
+    parts = []
+    pages = []
+    offset = 0
+    for extracted_text in page_texts:
+        if extracted_text:
+            parts.append(extracted_text)
+            parts.append("\n")
+            pages.append((offset, offset + len(extracted_text)))
+            offset += len(extracted_text) + 1
+        else:
+            pages.append((offset, offset))
+    return "".join(parts), pages
+
+def _iter_page_texts(file_path: str, executor: Optional[Executor] = None) -> Iterator[str]:
+    """
+    Yields the text of each page in order. With an executor, large PDFs are
+    extracted in page ranges; each range is yielded as soon as it is done.
+    """
+    pdf = pdfium.PdfDocument(file_path)
+    page_count = len(pdf)
+
+    if executor is None or page_count < PARALLEL_PAGE_THRESHOLD:
+        # Cheap single-pass path for normal-sized files
+        try:
+            for i in range(page_count):
+                page = pdf[i]
+                text_page = page.get_textpage()
+                yield text_page.get_text_range() or ""
+            return
+        finally:
+            pdf.close()
+
+    pdf.close()
+    futures = [
+        executor.submit(extract_page_range, file_path, first, min(first + PAGES_PER_RANGE, page_count))
+        for first in range(0, page_count, PAGES_PER_RANGE)
+    ]
+    for future in futures:  # page order
+        yield from future.result()
+
+@timed("extract", items=lambda doc, *a, **k: len(doc["pages"]) if doc else 0,
+       nbytes=lambda doc, *a, **k: len(doc["text"]) if doc else 0)
+def load_pdf(file_path: str, executor: Optional[Executor] = None, clean: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Extracts the text of a single PDF using pypdfium2.
+
+    Args:
+        file_path: Path of the PDF.
+        executor: Optional process pool. PDFs with at least PARALLEL_PAGE_THRESHOLD
+            pages are split into ranges of PAGES_PER_RANGE pages that are extracted
+            in parallel and joined back in page order.
+        clean: Clean the text page by page while extracting (see
+            text_cleaner.clean_pages), so the raw text of the whole document is
+            never assembled. The result is marked "cleaned": True and its page
+            spans refer to the cleaned text. Cleaning time counts as extraction.
+
+    Returns:
+        { "path": str, "text": str, "pages": [(start, end), ...] } where pages[i]
+        is the character span of page i+1 inside 'text', or None if the file
+        has no extractable text or could not be opened.
+    """
+    try:
+        if clean:
+            text, pages = clean_pages(_iter_page_texts(file_path, executor))
+        else:
+            text, pages = _assemble_pages(list(_iter_page_texts(file_path, executor)))
+
+        if text.strip():
+            print(f"Successfully loaded: {file_path}")
+            doc = {
+                "path": file_path,
+                "text": text,
+                "pages": pages
+            }
+            if clean:
+                doc["cleaned"] = True
+            return doc
+        print(f"Warning: No text extracted from {file_path}")
+
+    except Exception as e:
+        print(f"Error loading {file_path}: {e}")
+        current().record("extract", errors=1, calls=0)
+
+    return None
+
+def iter_pdfs(file_paths: Iterable[str], extract_workers: int = 1, clean: bool = False,
+              executor: Optional[Executor] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Loads the given PDFs one at a time, skipping files without text.
+
+    Large PDFs are extracted page-range by page-range in `executor` (see
+    load_pdf), or without one, with extract_workers > 1, in a pool of that
+    many processes started on the first document (see process_pool: when the
+    generator is consumed in another thread, create the pool up front and
+    pass it). With clean=True the documents are cleaned page by page as they
+    are extracted.
+    """
+    own_executor = None
+    if executor is None:
+        executor = own_executor = process_pool(extract_workers)
+    try:
+        for file_path in file_paths:
+            doc = load_pdf(file_path, executor, clean=clean)
+            if doc:
+                yield doc
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+def iter_pdfs_from_folder(root_folder: str, extract_workers: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of load_pdfs_from_folder: yields one document at a time,
+    so only the PDF currently being processed is held in memory.
+    """
+    return iter_pdfs(find_pdf_files(root_folder), extract_workers=extract_workers)
+
+def load_pdfs_from_folder(root_folder: str) -> List[Dict[str, Any]]:
     """
     Recursively walks the folder and extracts text from every PDF found using pypdfium2.
     
@@ -10,41 +188,20 @@ def load_pdfs_from_folder(root_folder: str) -> List[Dict[str, str]]:
         root_folder: The path to the root folder containing PDFs.
         
     Returns:
-        A list of dictionaries, each containing 'path' and 'text' of a PDF.
+        A list of dictionaries, each containing 'path', 'text' and 'pages' of a PDF.
     """
-    pdf_docs = []
-    
-    for root, dirs, files in os.walk(root_folder):
-        for file in files:
-            if file.lower().endswith(".pdf"):
-                file_path = os.path.join(root, file)
-                try:
-                    pdf = pdfium.PdfDocument(file_path)
-                    text = ""
-                    for i in range(len(pdf)):
-                        page = pdf[i]
-                        text_page = page.get_textpage()
-                        extracted_text = text_page.get_text_range()
-                        # text_page.close() # automatic in newer versions, but good practice if needed
-                        if extracted_text:
-                            text += extracted_text + "\n"
-                            
-                    pdf.close()
-                    
-                    if text.strip(): 
-                        pdf_docs.append({
-                            "path": file_path,
-                            "text": text
-                        })
-                        print(f"Successfully loaded: {file_path}")
-                    else:
-                        print(f"Warning: No text extracted from {file_path}")
-
-                except Exception as e:
-                    print(f"Error loading {file_path}: {e}")
-                    continue
-
-    return pdf_docs
+    return list(iter_pdfs_from_folder(root_folder))
+
+def pages_for_span(pages: List[Tuple[int, int]], start: int, end: int) -> List[int]:
+    """
+    Maps a character span of the document text to the (1-based) page numbers it covers.
+    """
+    if not pages or end <= start:
+        return []
+    starts = [s for s, _ in pages]
+    first = max(bisect.bisect_right(starts, start) - 1, 0)
+    last = max(bisect.bisect_left(starts, end) - 1, first)
+    return [i + 1 for i in range(first, last + 1) if pages[i][1] > pages[i][0]]
 
 if __name__ == "__main__":  # pragma: no cover
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -53,9 +210,11 @@ if __name__ == "__main__":  # pragma: no cover
     
     if os.path.exists(rag_data_path):
         print(f"Scanning {rag_data_path}...")
-        docs = load_pdfs_from_folder(rag_data_path)
-        print(f"Total documents loaded: {len(docs)}")
-        for doc in docs[:5]:
-            print(f"- {doc['path']}")
+        total = 0
+        for doc in iter_pdfs_from_folder(rag_data_path):
+            if total < 5:
+                print(f"- {doc['path']} ({len(doc['pages'])} pages)")
+            total += 1
+        print(f"Total documents loaded: {total}")
     else:
         print(f"Error: RAG_DATA folder not found at {rag_data_path}")
@@ -0,0 +1,455 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utilities.pdf_loader import pages_for_span, process_pool
+from utilities.text_cleaner import clean_contract_text
+from utilities.contract_parser import parse_contract_index
+from utilities.chunker import assign_chunk_ids, create_hierarchical_chunks
+from utilities.classifier import classify_contract_type
+from utilities.metrics import Metrics, current
+from utilities.dedup import DedupEmbedder, DedupIndex, DEDUP_ENABLED
+from utilities.centroid_classifier import CentroidClassifier
+
+# Defaults for the staged ingestion engine (overridable per call)
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))        # chunks per embed/insert batch
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "2"))          # batches buffered between stages
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "1"))    # threads calling the embedder
+INSERT_WORKERS = int(os.getenv("INGEST_INSERT_WORKERS", "1"))  # threads inserting into Weaviate
+
+def cleaned_page_spans(raw_text: str, pages: List[Tuple[int, int]], cleaned_text: str) -> List[Tuple[int, int]]:
+    """
+    Re-locates the loader's page spans (over the raw text) in the cleaned text.
+    Each page is anchored by the cleaned form of its first characters.
+    """
+    starts = []
+    cursor = 0
+    for start, end in pages:
+        # Untimed call: anchoring pages is not part of the "clean" stage
+        anchor = clean_contract_text.__wrapped__(raw_text[start:min(end, start + 256)])[:32]
+        idx = cleaned_text.find(anchor, cursor) if anchor else -1
+        if idx >= 0:
+            cursor = idx
+        starts.append((cursor, bool(anchor)))
+
+    spans = []
+    for i, (start, has_text) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(cleaned_text)
+        spans.append((start, end) if has_text else (start, start))
+    return spans
+
+def attach_page_numbers(chunks: List[Dict[str, Any]], cleaned_text: str, page_spans: List[Tuple[int, int]]):
+    """
+    Records on each chunk the page numbers its text comes from ("pages": [int]).
+    Chunks with a "span" (built from a DocumentIndex) are looked up directly;
+    others are searched for. Chunks of one level come out in document order,
+    so each search starts where the previous chunk of that level was found.
+    """
+    cursors = {}
+    for chunk in chunks:
+        if "span" in chunk:
+            chunk["pages"] = pages_for_span(page_spans, *chunk["span"])
+            continue
+        text = chunk["text"].strip()
+        level = chunk["chunk_level"]
+        idx = cleaned_text.find(text[:64], cursors.get(level, 0))
+        if idx < 0:
+            idx = cleaned_text.find(text[:64])
+        if idx < 0:
+            chunk["pages"] = []
+            continue
+        cursors[level] = idx
+        chunk["pages"] = pages_for_span(page_spans, idx, idx + len(text))
+
+def pdf_document_id(path: str, root: str) -> str:
+    """
+    document_id of a PDF under `root`: its relative path with "/" separators,
+    so files with the same name in different folders get their own chunk ids.
+    For a PDF directly in `root` this is its file name.
+    """
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+def contract_documents(contracts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The documents of a /process_contracts payload ({ "text", "document_id",
+    "contract_type" }); contracts without text are skipped. Chunk ids are
+    derived from the document_id, so a contract without one would overwrite
+    (and then delete as stale) the chunks of every other id-less contract:
+    raises ValueError if any contract with text has no document_id.
+    """
+    missing = [i for i, doc in enumerate(contracts) if doc.get("text") and not doc.get("document_id")]
+    if missing:
+        raise ValueError(f"Contracts without a document_id (indexes {', '.join(map(str, missing))})")
+    return [
+        {
+            "text": doc["text"],
+            "document_id": doc["document_id"],
+            # Missing types are classified (keywords, then centroids)
+            "contract_type": doc.get("contract_type"),
+        }
+        for doc in contracts
+        if doc.get("text")
+    ]
+
+def process_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the CPU-bound part of the pipeline for one document:
+    clean -> parse -> chunk -> classify.
+
+    `doc` is either a loaded PDF ({ "path", "text", "pages" }, and "document_id",
+    see pdf_document_id; the file name if missing) or a contract sent to /process_contracts ({ "document_id", "text", "contract_type" }).
+    Documents marked "cleaned" (pdf_loader.load_pdf(clean=True)) skip the clean step.
+    A given contract_type is trusted; otherwise it is classified from the text
+    by keywords (and may be refined from the chunk vectors after embedding,
+    see ingest_documents).
+
+    Kept at module level so it can be pickled into worker processes.
+    Errors are caught here and returned, so one bad file doesn't break the pool.
+
+    Returns:
+        { "path": Optional[str], "document_id": str, "chunks": list, "error": Optional[str],
+          "contract_type": str, "contract_type_source": "given" | "keyword",
+          "metrics": per-stage totals of this document (see Metrics.snapshot) }
+    """
+    path = doc.get("path")
+    document_id = doc.get("document_id") or os.path.basename(path or "unknown")
+    # Stage timings are collected locally and shipped back with the result,
+    # since worker processes can't record into the parent's Metrics.
+    metrics = Metrics()
+    with metrics.activate():
+        result = _process_document(doc, path, document_id, metrics)
+    result["metrics"] = metrics.snapshot()
+    return result
+
+def _process_document(doc: Dict[str, Any], path: Optional[str], document_id: str, metrics: Metrics) -> Dict[str, Any]:
+    try:
+        if doc.get("cleaned"):
+            # Cleaned page by page by the loader; its page spans already refer to the cleaned text
+            cleaned_text = doc["text"]
+        else:
+            cleaned_text = clean_contract_text(doc["text"])
+        # Spans over cleaned_text: no per-section/clause copies, and chunks carry their "span"
+        structure = parse_contract_index(cleaned_text)
+        doc_chunks = create_hierarchical_chunks(structure, document_id)
+        del structure
+        # Same ids on every re-ingest: inserting the document overwrites its chunks position by
+        # position; positions it no longer has are removed by weaviate_manager.replace_batch_documents
+        assign_chunk_ids(doc_chunks, document_id)
+
+        given_type = doc.get("contract_type")
+        contract_type = given_type or classify_contract_type(cleaned_text[:5000])
+        contract_type_source = "given" if given_type else "keyword"
+        for chunk in doc_chunks:
+            chunk["contract_type"] = contract_type
+            chunk["contract_type_source"] = contract_type_source
+
+        if doc.get("pages"):
+            with metrics.stage("pages", items=len(doc["pages"])):
+                if doc.get("cleaned"):
+                    page_spans = doc["pages"]
+                else:
+                    page_spans = cleaned_page_spans(doc["text"], doc["pages"], cleaned_text)
+                attach_page_numbers(doc_chunks, cleaned_text, page_spans)
+
+        return {"path": path, "document_id": document_id, "chunks": doc_chunks, "error": None,
+                "contract_type": contract_type, "contract_type_source": contract_type_source}
+    except Exception as e:
+        return {"path": path, "document_id": document_id, "chunks": [], "error": str(e),
+                "contract_type": None, "contract_type_source": None}
+
+def process_documents(docs: Iterable[Dict[str, Any]], workers: int = 1,
+                      executor: Optional[Executor] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields process_document() results in the same order as `docs`.
+
+    `docs` may be a generator (see pdf_loader.iter_pdfs_from_folder): it is
+    consumed lazily, so the first document is processed as soon as it is loaded.
+    With workers > 1 the documents are spread over `executor`, a pool of that
+    many processes (pdf_loader.process_pool; started here if not given). At most
+    2 * workers documents are in flight, and results are yielded in input order,
+    so the chunk output is identical to a single-process run.
+    """
+    if workers <= 1:
+        for doc in docs:
+            yield process_document(doc)
+        return
+
+    own_executor = None
+    if executor is None:
+        executor = own_executor = process_pool(workers)
+    try:
+        pending = deque()
+        for doc in docs:
+            pending.append(executor.submit(process_document, doc))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+# --- Staged engine ---
+
+_END = object()
+
+class Stage:
+    """
+    One step of a pipeline: `fn` is applied to every item by `workers` threads.
+    Returning None drops the item.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+class PipelineError(RuntimeError):
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+def run_pipeline(source: Iterable[Any], stages: List[Stage], queue_size: int = QUEUE_SIZE) -> Iterator[Any]:
+    """
+    Runs `stages` concurrently, connected by bounded queues, and yields the
+    output of the last stage (in completion order).
+
+    The source is consumed in its own thread, so producing item N+1 overlaps
+    with stage 1 working on item N and stage 2 on item N-1. A full queue blocks
+    the stage in front of it, so a slow stage throttles everything upstream
+    instead of letting work pile up in memory.
+
+    The first exception raised by the source or a stage stops the pipeline and
+    is re-raised here as a PipelineError.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    stop = threading.Event()
+    errors = []
+    lock = threading.Lock()
+    remaining = [stage.workers for stage in stages]
+
+    def put(q, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def fail(stage_name, e):
+        with lock:
+            errors.append(PipelineError(stage_name, e))
+        stop.set()
+
+    def feed():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except BaseException as e:
+            fail("source", e)
+        finally:
+            # Release the source's resources (e.g. a process pool) even when stopping early
+            close = getattr(source, "close", None)
+            if close:
+                close()
+            put(queues[0], _END)
+
+    def work(index: int):
+        stage = stages[index]
+        q_in, q_out = queues[index], queues[index + 1]
+        try:
+            while True:
+                item = get(q_in)
+                if item is _END:
+                    put(q_in, _END)  # let sibling workers of this stage see it too
+                    break
+                out = stage.fn(item)
+                if out is not None and not put(q_out, out):
+                    break
+        except BaseException as e:
+            fail(stage.name, e)
+        finally:
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                put(q_out, _END)
+
+    threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        for n in range(stage.workers):
+            threads.append(threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _END:
+                break
+            yield item
+    finally:
+        # Normal end: every thread is already done. Early exit: unblock and stop them.
+        stop.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+
+# --- Ingestion pipeline (shared by process_data.py and /process_contracts) ---
+
+def _batch_documents(results: Iterable[Dict[str, Any]], batch_size: int, stats: Dict[str, int],
+                     on_document: Optional[Callable[[Dict[str, Any]], None]],
+                     metrics: Optional[Metrics] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Groups processed documents into batches of about `batch_size` chunks.
+    A document's chunks always stay in one batch.
+    """
+    chunks = []
+    documents = []
+    for result in results:
+        stats["documents"] += 1
+        if metrics is not None:
+            metrics.merge(result.get("metrics", {}), document_id=result["document_id"])
+            metrics.record("document", items=len(result["chunks"]), errors=1 if result["error"] else 0,
+                           document_id=result["document_id"])
+        if on_document:
+            on_document(result)
+        if result["error"]:
+            stats["failed_documents"] += 1
+            continue
+
+        chunks.extend(result["chunks"])
+        documents.append({
+            "path": result["path"],
+            "document_id": result["document_id"],
+            "chunk_count": len(result["chunks"]),
+            "contract_type": result.get("contract_type"),
+            "contract_type_source": result.get("contract_type_source"),
+        })
+        if len(chunks) >= batch_size:
+            yield {"chunks": chunks, "documents": documents}
+            chunks = []
+            documents = []
+
+    if documents:
+        yield {"chunks": chunks, "documents": documents}
+
+def ingest_documents(
+    docs: Iterable[Dict[str, Any]],
+    embed_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+    insert_fn: Callable[[List[Dict[str, Any]]], Any],
+    parse_workers: int = 1,
+    embed_workers: int = EMBED_WORKERS,
+    insert_workers: int = INSERT_WORKERS,
+    batch_size: int = BATCH_SIZE,
+    queue_size: int = QUEUE_SIZE,
+    on_document: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+    metrics: Optional[Metrics] = None,
+    dedup: bool = DEDUP_ENABLED,
+    dedup_index: Optional[DedupIndex] = None,
+    centroids: Optional[CentroidClassifier] = None,
+    parse_executor: Optional[Executor] = None,
+) -> Dict[str, int]:
+    """
+    Runs documents through parse -> embed -> insert as overlapping stages.
+
+    Args:
+        docs: Documents accepted by process_document (may be a generator).
+        embed_fn: Takes a list of chunks and returns them with a 'vector' (e.g. generate_embeddings).
+        insert_fn: Stores a list of chunks; a falsy return value marks the batch as not inserted.
+            It may instead return a Future of that value (background insertion,
+            e.g. weaviate_manager.submit_chunks), which is awaited before on_batch.
+        parse_workers: Processes for clean/parse/chunk/classify.
+        parse_executor: Pool of parse_workers processes to use (pdf_loader.process_pool).
+            Without one, a pool is started here, before the stage threads, and shut
+            down at the end of the run.
+        embed_workers / insert_workers: Threads for the embed and insert stages.
+        batch_size: Chunks per embed/insert batch.
+        queue_size: Batches buffered between two stages.
+        on_document: Called (from the parse thread) with every process_document result.
+        on_batch: Called (from the calling thread) with every batch once inserted:
+            { "chunks": [...], "documents": [{ "path", "document_id", "chunk_count", "contract_type",
+              "contract_type_source" }], "inserted": bool }
+        metrics: Receives every stage measurement of the run, including the ones
+            made in parse worker processes and by @timed embed/insert functions.
+            Defaults to the current Metrics.
+        dedup: Reuse the vector of an earlier exact/near-duplicate chunk instead
+            of embedding it again (see dedup.py).
+        dedup_index: Canonical chunks to match against; defaults to a new index
+            for this run. Pass a long-lived one to dedup across runs.
+        centroids: Contract type centroids (centroid_classifier.load_centroids()).
+            Documents classified by keywords are re-classified from their chunk
+            vectors right after embedding, before insert; the keyword label is
+            kept when no centroid is close enough.
+
+    Returns:
+        Counters: documents, failed_documents, batches, chunks, inserted_chunks, duplicate_chunks,
+        centroid_classified.
+    """
+    stats = {"documents": 0, "failed_documents": 0, "batches": 0, "chunks": 0, "inserted_chunks": 0,
+             "duplicate_chunks": 0, "centroid_classified": 0}
+    if dedup:
+        embed_fn = DedupEmbedder(embed_fn, dedup_index)
+
+    # Stage threads record into the run's metrics (thread-local, so concurrent runs don't mix)
+    run_metrics = metrics if metrics is not None else current()
+
+    def embed(batch):
+        with run_metrics.activate():
+            if batch["chunks"]:
+                batch["chunks"] = embed_fn(batch["chunks"])
+                if centroids is not None:
+                    batch["centroid_classified"] = centroids.classify_batch(batch)
+        return batch
+
+    def insert(batch):
+        with run_metrics.activate():
+            batch["inserted"] = insert_fn(batch["chunks"]) if batch["chunks"] else True
+        return batch
+
+    # The parse pool is started here, before the stage threads (see pdf_loader.INGEST_START_METHOD)
+    own_executor = None
+    if parse_executor is None:
+        parse_executor = own_executor = process_pool(parse_workers)
+    try:
+        batches = _batch_documents(process_documents(docs, workers=parse_workers, executor=parse_executor),
+                                   batch_size, stats, on_document, metrics)
+        stages = [Stage("embed", embed, embed_workers), Stage("insert", insert, insert_workers)]
+
+        for batch in run_pipeline(batches, stages, queue_size=queue_size):
+            if isinstance(batch["inserted"], Future):
+                # Background insert (e.g. weaviate_manager.submit_chunks): wait for it here,
+                # so on_batch still sees the outcome
+                batch["inserted"] = batch["inserted"].result()
+            batch["inserted"] = bool(batch["inserted"])
+            stats["batches"] += 1
+            stats["chunks"] += len(batch["chunks"])
+            stats["centroid_classified"] += batch.get("centroid_classified", 0)
+            if batch["inserted"]:
+                stats["inserted_chunks"] += len(batch["chunks"])
+            if on_batch:
+                on_batch(batch)
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+    if dedup:
+        stats["duplicate_chunks"] = embed_fn.stats["duplicates"]
+    return stats
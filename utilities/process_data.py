@@ -1,120 +1,351 @@
 import os
 import sys
 import json
+import argparse
+from typing import Any, Dict
 from dotenv import load_dotenv
 
-from utilities.pdf_loader import load_pdfs_from_folder
-from utilities.text_cleaner import clean_contract_text
-from utilities.contract_parser import parse_contract
-from utilities.chunker import create_hierarchical_chunks
-from utilities.classifier import classify_contract_type
+from utilities.pdf_loader import find_pdf_files, iter_pdfs, process_pool, INGEST_START_METHOD
+from utilities.pipeline import ingest_documents, pdf_document_id, BATCH_SIZE, EMBED_WORKERS, INSERT_WORKERS, QUEUE_SIZE
+from utilities.dedup import DEDUP_ENABLED
+from utilities.centroid_classifier import load_centroids, CENTROIDS_PATH
 from utilities.embedder import generate_embeddings
-from utilities.weaviate_manager import batch_insert_chunks, initialize_schema
+from utilities.embed_pool import EmbeddingPool, EMBED_POOL_WORKERS, EMBED_POOL_THREADS
+from utilities.weaviate_manager import (
+    submit_chunks, get_inserter, initialize_schema, delete_document_chunks, replace_batch_documents,
+)
+from utilities.batch_inserter import INSERT_BATCH_SIZE, INSERT_CONCURRENCY
+from utilities.chunk_export import ChunkExportWriter
+from utilities.manifest import IngestManifest, file_sha256, STAGE_PARSED, STAGE_INSERTED, STAGE_FAILED
+from utilities.metrics import Metrics, load_sink
 
-def main():
+def resolve_workers(workers: int) -> int:
+    """0 (or less) means 'use every core'."""
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def prune_jsonl(jsonl_path: str, keep_document_ids: set):
+    """
+    Rewrites the JSONL export keeping only the chunks of `keep_document_ids`,
+    i.e. the documents that are not re-processed in this run.
+    """
+    if not os.path.exists(jsonl_path):
+        open(jsonl_path, 'w', encoding='utf-8').close()
+        return
+
+    tmp_path = jsonl_path + ".tmp"
+    with open(jsonl_path, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            try:
+                document_id = json.loads(line)["document_id"]
+            except (ValueError, KeyError):
+                continue
+            if document_id in keep_document_ids:
+                dst.write(line)
+    os.replace(tmp_path, jsonl_path)
+
+def main(workers: int = 1, extract_workers: int = 1, full: bool = False,
+         embed_workers: int = EMBED_WORKERS, insert_workers: int = INSERT_WORKERS,
+         batch_size: int = BATCH_SIZE, queue_size: int = QUEUE_SIZE, export: str = "both",
+         metrics_json: str = None, dedup: bool = DEDUP_ENABLED, centroids: bool = True,
+         embed_processes: int = EMBED_POOL_WORKERS, embed_threads: int = EMBED_POOL_THREADS,
+         insert_batch_size: int = INSERT_BATCH_SIZE, insert_concurrency: int = INSERT_CONCURRENCY):
     load_dotenv(dotenv_path="backend/.env")
     
     script_dir = os.path.dirname(os.path.abspath(__file__))
     rag_data_path = os.path.join(script_dir, "RAG_DATA")
     output_dir = os.path.join(script_dir, "output")
     jsonl_path = os.path.join(output_dir, "chunks.jsonl")
+    export_dir = os.path.join(output_dir, "chunks_export")
+    manifest_path = os.path.join(output_dir, "manifest.json")
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    metrics = Metrics()
+    sink_spec = os.getenv("INGEST_METRICS_SINK")
+    if sink_spec:
+        metrics.add_sink(load_sink(sink_spec))
+
     # 1. Initialize Weaviate Schema
     # Note: We assume reset_weaviate was run, but initialize checks for existence anyway.
     print("\n--- Initializing Weaviate Schema ---")
     initialize_schema()
 
-    # 2. Load PDFs
-    print(f"\n--- Loading PDFs from {rag_data_path} ---")
-    raw_docs = load_pdfs_from_folder(rag_data_path)
-    print(f"Loaded {len(raw_docs)} PDFs.")
+    # 2. Compare RAG_DATA against the manifest of previous runs
+    print(f"\n--- Scanning PDFs in {rag_data_path} ---")
+    manifest = IngestManifest(manifest_path)
+    if full:
+        print("Full run requested: re-processing every PDF.")
 
-    if not raw_docs:
-        print("No documents to process. Exiting.")
-        return
+    hashes = {}
+    document_ids = {}
+    todo_paths = []
+    unchanged_paths = []
+    for file_path in find_pdf_files(rag_data_path):
+        with metrics.stage("hash", nbytes=os.path.getsize(file_path)):
+            hashes[file_path] = file_sha256(file_path)
+        document_ids[file_path] = pdf_document_id(file_path, rag_data_path)
+        entry = manifest.get(file_path)
+        if (not full and manifest.is_current(file_path, hashes[file_path])
+                and entry["document_id"] == document_ids[file_path]):
+            unchanged_paths.append(file_path)
+        else:
+            todo_paths.append(file_path)
 
-    # Process documents
-    chunk_buffer = []
-    
-    # We will write to JSONL stream and also accumulate for Weaviate
-    # If dataset is huge, we shouldn't hold all in memory, but here we buffer for batching.
-    
-    BATCH_SIZE_THRESHOLD = 512 # Match embedder batch size for efficiency
-    
-    # Clear JSONL file first
-    with open(jsonl_path, 'w', encoding='utf-8') as f:
-        pass
-        
-    total_processed_chunks = 0
-    failed_docs = 0
+    # Drop chunks of deleted files, and of files ingested under another document_id
+    # (ids used to be file names). Changed/interrupted files are replaced as they are
+    # re-inserted (same chunk ids, then their stale chunks are deleted: see on_batch)
+    stale_ids = {manifest.get(p)["document_id"] for p in manifest.missing_paths(hashes)}
+    stale_ids.update(manifest.get(p)["document_id"] for p in todo_paths
+                     if manifest.get(p) and manifest.get(p)["document_id"] != document_ids[p])
+    if stale_ids:
+        # An unchanged file whose id is deleted (same file name elsewhere) is re-ingested
+        todo_paths.extend(p for p in unchanged_paths if document_ids[p] in stale_ids)
+        unchanged_paths = [p for p in unchanged_paths if document_ids[p] not in stale_ids]
+        print(f"Removing chunks of {len(stale_ids)} deleted/renamed documents...")
+        delete_document_chunks(sorted(stale_ids))
+    unchanged_ids = {document_ids[p] for p in unchanged_paths}
+    for file_path in manifest.missing_paths(hashes):
+        manifest.remove(file_path)
+    manifest.save()
+
+    print(f"{len(hashes)} PDFs found: {len(unchanged_ids)} unchanged, {len(todo_paths)} to process.")
+    write_jsonl = export in ("jsonl", "both")
+    write_columnar = export in ("columnar", "both")
+    jsonl_file = None
+    export_writer = None
+    if write_jsonl:
+        prune_jsonl(jsonl_path, unchanged_ids)
+        jsonl_file = open(jsonl_path, 'a', encoding='utf-8')
+    if write_columnar:
+        export_writer = ChunkExportWriter.rewrite(export_dir, unchanged_ids)
+
+    # 3. Stream PDFs (one document in memory at a time)
+    # (cleaned page by page while extracting, so no raw copy of a whole document is kept)
+    def with_document_ids(docs):
+        for doc in docs:
+            doc["document_id"] = document_ids[doc["path"]]
+            yield doc
+
+    seen_docs = 0
 
-    print(f"Processing and writing to {jsonl_path}...")
+    # Runs in the pipeline's parse thread, one document at a time
+    def on_document(result: Dict[str, Any]):
+        nonlocal seen_docs
+        seen_docs += 1
+        if seen_docs % 50 == 0:
+            print(f"  Processed {seen_docs} documents...")
+
+        path, document_id = result["path"], result["document_id"]
+        if result["error"]:
+            print(f"Error processing {document_id}: {result['error']}")
+            manifest.mark(path, hashes[path], STAGE_FAILED, document_id, error=result["error"])
+            return
 
-    for i, doc in enumerate(raw_docs):
         try:
-            file_path = doc["path"]
-            raw_text = doc["text"]
-            filename = os.path.basename(file_path)
-            
-            # 3. Clean Text
-            cleaned_text = clean_contract_text(raw_text)
-            
-            # 4. Parse (Sections & Clauses)
-            parsed_structure = parse_contract(cleaned_text)
-            
-            # 5. Create Hierarchical Chunks
-            doc_chunks = create_hierarchical_chunks(parsed_structure, filename)
-            
-            # 6. Classify
-            contract_type = classify_contract_type(cleaned_text[:5000])
-            for chunk in doc_chunks:
-                chunk["contract_type"] = contract_type
-                
             # Write key metadata to JSONL
-            with open(jsonl_path, 'a', encoding='utf-8') as f:
-                for chunk in doc_chunks:
-                    # Clean up for JSON
-                    line_obj = {
-                        "document_id": chunk["document_id"],
-                        "section": chunk["section"],
-                        "clause_number": str(chunk["clause_number"]),
-                        "chunk_level": chunk["chunk_level"],
-                        "text": chunk["text"]
-                    }
-                    f.write(json.dumps(line_obj) + "\n")
-
-            chunk_buffer.extend(doc_chunks)
-
-            # Flush to Weaviate if buffer hits threshold
-            if len(chunk_buffer) >= BATCH_SIZE_THRESHOLD:
-                print(f"  >>> Flushing {len(chunk_buffer)} chunks to Weaviate...")
-                chunks_with_vectors = generate_embeddings(chunk_buffer)
-                batch_insert_chunks(chunks_with_vectors)
-                total_processed_chunks += len(chunks_with_vectors)
-                chunk_buffer = [] 
-
-            if (i+1) % 50 == 0:
-                print(f"  Processed {i+1} documents...")
-
+            if jsonl_file:
+                with metrics.stage("export_jsonl", items=len(result["chunks"])):
+                    jsonl_file.writelines(
+                        json.dumps({
+                            "document_id": chunk["document_id"],
+                            "section": chunk["section"],
+                            "clause_number": str(chunk["clause_number"]),
+                            "chunk_level": chunk["chunk_level"],
+                            "pages": chunk.get("pages", []),
+                            "text": chunk["text"]
+                        }) + "\n"
+                        for chunk in result["chunks"]
+                    )
+            manifest.mark(path, hashes[path], STAGE_PARSED, document_id, chunk_count=len(result["chunks"]))
         except Exception as e:
-            print(f"Error processing {filename}: {e}")
-            failed_docs += 1
+            print(f"Error exporting {document_id}: {e}")
+
+    def on_batch(batch: Dict[str, Any]):
+        print(f"  >>> Flushed {len(batch['chunks'])} chunks of {len(batch['documents'])} documents to Weaviate.")
+        if export_writer is not None:
+            # Columnar export keeps the vectors and contract_type as well
+            with metrics.stage("export_columnar", items=len(batch["chunks"])):
+                export_writer.write(batch["chunks"])
+        if batch["inserted"]:
+            replace_batch_documents(batch)
+            for doc in batch["documents"]:
+                manifest.mark(doc["path"], hashes[doc["path"]], STAGE_INSERTED, doc["document_id"], chunk_count=doc["chunk_count"])
+            manifest.save()
+
+    # Contract types: keyword counts, refined by the stored centroids when there are any
+    # (rebuild them with: python -m utilities.centroid_classifier)
+    type_centroids = load_centroids() if centroids else None
+    if type_centroids is not None:
+        print(f"Classifying contract types by centroids ({', '.join(type_centroids.labels)}), keywords as fallback.")
+    elif centroids:
+        print(f"No contract type centroids at {CENTROIDS_PATH}: classifying by keywords only.")
+
+    print(f"Processing and exporting ({export}) to {output_dir}...")
+
+    workers = resolve_workers(workers)
+    if workers > 1:
+        print(f"Using {workers} worker processes for parsing/chunking.")
 
-    # Flush final buffer
-    if chunk_buffer:
-        print(f"  >>> Flushing final {len(chunk_buffer)} chunks to Weaviate...")
-        chunks_with_vectors = generate_embeddings(chunk_buffer)
-        batch_insert_chunks(chunks_with_vectors)
-        total_processed_chunks += len(chunks_with_vectors)
+    # Extraction and parse pools, started before the embedding workers, the inserter and
+    # the pipeline's threads, with a clean start method ($INGEST_START_METHOD)
+    extract_pool = parse_pool = None
+    if todo_paths:
+        extract_pool = process_pool(resolve_workers(extract_workers))
+        parse_pool = process_pool(workers)
+        if extract_pool or parse_pool:
+            print(f"Worker processes started with the '{INGEST_START_METHOD or 'default'}' start method.")
+    raw_docs = with_document_ids(iter_pdfs(todo_paths, clean=True, executor=extract_pool))
+
+    # Bulk embedding in model worker processes (started before the pipeline's threads)
+    embed_pool = None
+    if embed_processes > 0 and todo_paths:
+        embed_pool = EmbeddingPool(embed_processes, embed_threads)
+        embed_pool.warmup()
+
+    # Background inserts (retried, then dead-lettered); a backed-up inserter throttles the pipeline
+    inserter = get_inserter(batch_size=insert_batch_size, concurrency=insert_concurrency)
+
+    # The loader runs in the pipeline's feed thread; install() makes it record into this run too
+    try:
+        with metrics.install():
+            stats = ingest_documents(
+                raw_docs,
+                embed_fn=embed_pool if embed_pool is not None else generate_embeddings,
+                insert_fn=submit_chunks,
+                parse_workers=workers,
+                embed_workers=embed_workers,
+                insert_workers=insert_workers,
+                batch_size=batch_size,
+                queue_size=queue_size,
+                on_document=on_document,
+                on_batch=on_batch,
+                metrics=metrics,
+                dedup=dedup,
+                centroids=type_centroids,
+                parse_executor=parse_pool,
+            )
+    finally:
+        for pool in (extract_pool, parse_pool):
+            if pool is not None:
+                pool.shutdown()
+        if embed_pool is not None:
+            embed_pool.close()
+        if jsonl_file:
+            jsonl_file.close()
+        if export_writer is not None:
+            export_writer.close()
+        manifest.save()
+
+    if stats["documents"] == 0:
+        print("No new or changed documents to process.")
 
     print(f"\n\n--- Processing Complete ---")
-    print(f"Total documents: {len(raw_docs)}")
-    print(f"Failed docs: {failed_docs}")
-    print(f"Total chunks in Weaviate: {total_processed_chunks}")
-    print(f"JSONL exported to: {jsonl_path}")
+    print(f"Documents processed this run: {stats['documents']} (unchanged, skipped: {len(unchanged_ids)})")
+    print(f"Failed docs: {stats['failed_documents']}")
+    print(f"Chunks inserted into Weaviate this run: {stats['inserted_chunks']} of {stats['chunks']}")
+    insert_report = inserter.report()
+    print(f"Insert rate: {insert_report['objects_per_sec']} objects/s "
+          f"({insert_report['requests']} requests, {insert_report['retried']} retried objects)")
+    if insert_report["dead_lettered"]:
+        print(f"Objects that failed every retry: {insert_report['dead_lettered']}, in {inserter.dead_letter_path} "
+              f"(replay: python -m utilities.batch_inserter --replay)")
+    if dedup:
+        print(f"Duplicate chunks (vector reused, not embedded): {stats['duplicate_chunks']}")
+    if type_centroids is not None:
+        print(f"Documents classified by centroids: {stats['centroid_classified']}")
+    if write_jsonl:
+        print(f"JSONL exported to: {jsonl_path}")
+    if write_columnar:
+        print(f"Columnar export ({len(export_writer)} chunks): {export_dir}")
+    print(f"Manifest: {manifest_path}")
+
+    print(f"\n--- Stage Metrics ---")
+    print(metrics.format_table())
+    if metrics_json:
+        metrics.write_summary(metrics_json)
+        print(f"Metrics summary: {metrics_json}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ingest RAG_DATA PDFs into Weaviate.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("INGEST_WORKERS", "1")),
+        help="Worker processes for clean/parse/chunk/classify (0 = all cores). Default: $INGEST_WORKERS or 1."
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=int(os.getenv("PDF_EXTRACT_WORKERS", "1")),
+        help="Worker processes for page-range text extraction of large PDFs (0 = all cores). Default: $PDF_EXTRACT_WORKERS or 1."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the ingestion manifest and re-process every PDF."
+    )
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS, help="Threads for the embedding stage.")
+    parser.add_argument(
+        "--embed-processes",
+        type=int,
+        default=EMBED_POOL_WORKERS,
+        help="Embedding worker processes, each with its own CPU model (0 = embed in-process). Default: $EMBED_POOL_WORKERS or 0."
+    )
+    parser.add_argument(
+        "--embed-threads",
+        type=int,
+        default=EMBED_POOL_THREADS,
+        help="torch threads per embedding worker process (0 = cores / processes). Default: $EMBED_POOL_THREADS or 0."
+    )
+    parser.add_argument("--insert-workers", type=int, default=INSERT_WORKERS, help="Threads for the Weaviate insert stage.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks per embed/insert batch.")
+    parser.add_argument("--insert-batch-size", type=int, default=INSERT_BATCH_SIZE,
+                        help="Objects per Weaviate insert request. Default: $INSERT_BATCH_SIZE or 200.")
+    parser.add_argument("--insert-concurrency", type=int, default=INSERT_CONCURRENCY,
+                        help="Weaviate insert requests in flight. Default: $INSERT_CONCURRENCY or 2.")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Batches buffered between pipeline stages.")
+    parser.add_argument(
+        "--export",
+        choices=["jsonl", "columnar", "both"],
+        default="both",
+        help="Chunk export: chunks.jsonl (metadata/text), chunks_export/ (Parquet shards + float32 vectors), or both."
+    )
+    parser.add_argument(
+        "--metrics-json",
+        default=os.getenv("INGEST_METRICS_JSON"),
+        help="Write per-stage and per-document timings/counters to this JSON file."
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="dedup",
+        action="store_false",
+        default=DEDUP_ENABLED,
+        help="Embed every chunk, even exact/near duplicates of earlier chunks. Default: $INGEST_DEDUP."
+    )
+    parser.add_argument(
+        "--no-centroids",
+        dest="centroids",
+        action="store_false",
+        help="Classify contract types by keywords only, ignoring the stored centroids."
+    )
+    args = parser.parse_args()
+    main(
+        workers=args.workers,
+        extract_workers=args.extract_workers,
+        full=args.full,
+        embed_workers=args.embed_workers,
+        insert_workers=args.insert_workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        export=args.export,
+        metrics_json=args.metrics_json,
+        dedup=args.dedup,
+        centroids=args.centroids,
+        embed_processes=args.embed_processes,
+        embed_threads=args.embed_threads,
+        insert_batch_size=args.insert_batch_size,
+        insert_concurrency=args.insert_concurrency,
+    )
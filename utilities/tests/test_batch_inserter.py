@@ -0,0 +1,155 @@
+import json
+import threading
+
+import numpy as np
+
+from batch_inserter import BatchInserter, replay_dead_letters
+
+
+def _objects(n, start=0):
+    return [{"properties": {"text": f"t{i}"}, "vector": np.full(2, i, dtype=np.float32)} for i in range(start, start + n)]
+
+
+def test_objects_are_split_into_requests_and_the_future_reports_success(tmp_path):
+    sent = []
+    lock = threading.Lock()
+
+    def insert(objects):
+        with lock:
+            sent.append([o["properties"]["text"] for o in objects])
+        return {}
+
+    inserter = BatchInserter(insert, batch_size=3, concurrency=2, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    assert inserter.submit(_objects(7)).result() is True
+    assert inserter.submit([]).result() is True
+    inserter.close()
+
+    assert sorted(sent) == [["t0", "t1", "t2"], ["t3", "t4", "t5"], ["t6"]]
+    report = inserter.report()
+    assert report["inserted"] == 7 and report["requests"] == 3 and report["objects_per_sec"] > 0
+
+
+def test_skipped_items_fail_the_job():
+    inserter = BatchInserter(lambda objects: {}, to_object=lambda item: item if item.get("vector") is not None else None)
+    assert inserter.submit([{"properties": {}, "vector": [1.0]}, {"properties": {}}]).result() is False
+    assert inserter.report()["skipped"] == 1
+    inserter.close()
+
+
+def test_failures_are_retried_with_bounded_exponential_backoff(tmp_path):
+    calls = []
+    delays = []
+
+    def insert(objects):
+        calls.append(len(objects))
+        if len(calls) <= 2:
+            raise ConnectionError("weaviate is busy")  # whole request failed
+        if len(calls) == 3:
+            return {1: "temporary error"}
+        return {}
+
+    inserter = BatchInserter(insert, batch_size=10, concurrency=1, max_retries=5, backoff_base=1.0, backoff_max=1.5,
+                             dead_letter_path=str(tmp_path / "dead.jsonl"), sleep=delays.append)
+    assert inserter(_objects(3)) is True
+    inserter.close()
+
+    assert calls == [3, 3, 3, 1]  # only the object that failed is sent again
+    assert len(delays) == 3
+    # Doubling from backoff_base, capped at backoff_max, with up to 50% jitter
+    for delay, full in zip(delays, [1.0, 1.5, 1.5]):
+        assert full / 2 <= delay <= full
+    assert inserter.report()["retried"] == 7
+    assert not (tmp_path / "dead.jsonl").exists()
+
+
+def test_objects_that_keep_failing_are_dead_lettered_and_can_be_replayed(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    healthy = threading.Event()
+
+    def insert(objects):
+        if healthy.is_set():
+            return {}
+        return {i: "server unavailable" for i, o in enumerate(objects) if o["properties"]["text"] != "t0"}
+
+    inserter = BatchInserter(insert, max_retries=1, dead_letter_path=str(dead_letter), sleep=lambda s: None)
+    assert inserter.submit(_objects(3)).result() is False
+    records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert [(r["properties"]["text"], r["vector"], r["error"], r["attempts"]) for r in records] == [
+        ("t1", [1.0, 1.0], "server unavailable", 2),
+        ("t2", [2.0, 2.0], "server unavailable", 2),
+    ]
+
+    healthy.set()
+    assert replay_dead_letters(inserter) == {"replayed": 2, "failed": 0}
+    assert not dead_letter.exists()
+    assert replay_dead_letters(inserter) == {"replayed": 0, "failed": 0}
+    inserter.close()
+
+
+def test_submit_blocks_while_the_queue_is_full():
+    release = threading.Event()
+    inserter = BatchInserter(lambda objects: release.wait(5) and {}, batch_size=1, concurrency=1, queue_size=1)
+
+    inserter.submit(_objects(1))          # taken by the worker, which is now stuck
+    submitted = threading.Event()
+
+    def producer():
+        inserter.submit(_objects(2, start=1))  # 2 requests: the second one does not fit the queue
+        submitted.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    assert not submitted.wait(0.3)  # backpressure: the producer is held back
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    inserter.close()
+    assert inserter.report()["inserted"] == 3
+
+
+def test_close_twice_returns_even_when_threads_outnumber_the_queue():
+    inserter = BatchInserter(lambda objects: {}, concurrency=4, queue_size=1)
+    inserter.close()
+    closer = threading.Thread(target=inserter.close, daemon=True)
+    closer.start()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+
+
+def test_submit_after_close_raises():
+    inserter = BatchInserter(lambda objects: {})
+    inserter.close()
+    try:
+        inserter.submit(_objects(1))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("submit() after close() should raise")
+
+
+def test_replay_counts_only_its_own_failures(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    replaying, other_done = threading.Event(), threading.Event()
+
+    def insert(objects):
+        text = objects[0]["properties"]["text"]
+        if text == "other":
+            replaying.wait(5)  # dead-lettered while the replay is in flight
+        elif text == "t1" and dead_letter.with_suffix(".jsonl.replaying").exists():
+            replaying.set()
+            other_done.wait(5)
+        return {i: "server unavailable" for i, o in enumerate(objects) if o["properties"]["text"] != "t0"}
+
+    # Chunks are converted by to_object; dead-lettered objects are replayed as they are
+    to_object = lambda chunk: {"properties": {"text": chunk["text"]}, "vector": [0.0, 0.0]}
+    inserter = BatchInserter(insert, to_object=to_object, concurrency=2, max_retries=0,
+                             dead_letter_path=str(dead_letter), sleep=lambda s: None)
+    assert inserter.submit([{"text": "t0"}, {"text": "t1"}]).result() is False
+
+    other = inserter.submit([{"text": "other"}])
+    waiter = threading.Thread(target=lambda: other.result() is False and other_done.set())
+    waiter.start()
+    assert replay_dead_letters(inserter) == {"replayed": 1, "failed": 1}
+    waiter.join()
+    assert inserter.report()["dead_lettered"] == 3
+    inserter.close()
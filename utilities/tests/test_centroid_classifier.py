@@ -0,0 +1,58 @@
+import numpy as np
+
+from centroid_classifier import CentroidClassifier, load_centroids
+
+
+def _labeled(label, axis, n, dim=4):
+    vector = [0.0] * dim
+    vector[axis] = 1.0
+    vector[(axis + 1) % dim] = 0.1
+    return [(label, vector)] * n
+
+
+def test_fit_skips_placeholder_and_rare_types():
+    data = _labeled("Lease", 0, 5) + _labeled("NDA", 1, 5) + _labeled("General", 2, 10) + _labeled("Loan", 3, 2)
+    classifier = CentroidClassifier.fit(data, min_chunks=3, batch_size=4)
+    assert classifier.labels == ["Lease", "NDA"]
+    assert classifier.counts == [5, 5]
+    assert np.allclose(np.linalg.norm(classifier.centroids, axis=1), 1.0)
+
+
+def test_classify_documents_by_mean_chunk_vector_with_threshold():
+    classifier = CentroidClassifier.fit(_labeled("Lease", 0, 3) + _labeled("NDA", 1, 3), min_chunks=1,
+                                        min_similarity=0.5)
+    results = classifier.classify_documents([
+        [[1.0, 0.0, 0.0, 0.0], [0.9, 0.2, 0.0, 0.0]],
+        [[0.0, 0.0, 1.0, 0.0]],  # unlike every centroid
+        [],                      # no vectors
+    ])
+    assert results[0][0] == "Lease" and results[0][1] > 0.9
+    assert results[1] is None
+    assert results[2] is None
+
+
+def test_classify_batch_relabels_only_keyword_documents():
+    classifier = CentroidClassifier.fit(_labeled("NDA", 1, 3), min_chunks=1)
+    nda = [0.0, 1.0, 0.0, 0.0]
+    batch = {
+        "chunks": [{"vector": nda, "contract_type": "Lease"}, {"vector": nda, "contract_type": "Lease"},
+                   {"vector": nda, "contract_type": "Vendor Agreement"}],
+        "documents": [{"chunk_count": 2, "contract_type_source": "keyword"},
+                      {"chunk_count": 1, "contract_type_source": "given"}],
+    }
+    assert classifier.classify_batch(batch) == 1
+    assert [c["contract_type"] for c in batch["chunks"]] == ["NDA", "NDA", "Vendor Agreement"]
+    assert batch["documents"][0]["contract_type_source"] == "centroid"
+    assert [c.get("contract_type_source") for c in batch["chunks"]] == ["centroid", "centroid", None]
+
+
+def test_save_and_load_centroids(tmp_path):
+    path = str(tmp_path / "centroids.npz")
+    assert load_centroids(path) is None
+
+    classifier = CentroidClassifier.fit(_labeled("Lease", 0, 2) + _labeled("NDA", 1, 2), min_chunks=1)
+    classifier.save(path)
+    loaded = load_centroids(path)
+    assert loaded.labels == ["Lease", "NDA"]
+    assert loaded.counts == [2, 2]
+    assert np.array_equal(loaded.centroids, classifier.centroids)
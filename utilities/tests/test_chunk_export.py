@@ -0,0 +1,126 @@
+import numpy as np
+
+from chunk_export import ChunkExportWriter, ChunkExportReader
+
+
+def _chunks(doc, n, dim=4, start=0):
+    return [
+        {
+            "document_id": doc,
+            "section": f"S{i}",
+            "clause_number": None if i % 2 else str(i),
+            "chunk_level": 1 + i % 3,
+            "contract_type": "Lease",
+            "token_count": 10 + i,
+            "pages": [1, 2],
+            "text": f"{doc} chunk {i}",
+            "vector": [float(start + i)] * dim,
+        }
+        for i in range(n)
+    ]
+
+
+def test_writer_shards_and_reader_round_trip(tmp_path):
+    export_dir = str(tmp_path / "export")
+    with ChunkExportWriter(export_dir, shard_rows=5, batch_rows=3) as writer:
+        writer.write(_chunks("a.pdf", 7))
+        writer.write(_chunks("b.pdf", 5, start=7))
+
+    reader = ChunkExportReader(export_dir)
+    assert len(reader) == 12
+    assert reader.dim == 4
+    assert [s["rows"] for s in reader.shards] == [5, 5, 2]
+
+    rows = []
+    vectors = []
+    for batch_rows, batch_vectors in reader.iter_batches(batch_size=4):
+        rows.extend(batch_rows)
+        vectors.append(batch_vectors)
+    vectors = np.concatenate(vectors)
+    assert [r["text"] for r in rows][:2] == ["a.pdf chunk 0", "a.pdf chunk 1"]
+    assert rows[1]["clause_number"] == ""
+    assert rows[0]["contract_type"] == "Lease"
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [float(i) for i in range(12)]
+
+
+def test_reader_slice_crosses_shards_and_columns(tmp_path):
+    export_dir = str(tmp_path / "export")
+    with ChunkExportWriter(export_dir, shard_rows=4, batch_rows=2) as writer:
+        writer.write(_chunks("a.pdf", 10))
+
+    reader = ChunkExportReader(export_dir)
+    rows, vectors = reader.slice(3, 9, columns=["section"])
+    assert [r["section"] for r in rows] == ["S3", "S4", "S5", "S6", "S7", "S8"]
+    assert vectors[:, 0].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+
+    rows, vectors = reader.slice(20, 30)
+    assert rows == [] and vectors.shape == (0, 4)
+
+
+def test_missing_vectors_keep_rows_aligned(tmp_path):
+    export_dir = str(tmp_path / "export")
+    chunks = _chunks("a.pdf", 3)
+    del chunks[1]["vector"]
+    with ChunkExportWriter(export_dir) as writer:
+        writer.write(chunks)
+
+    rows, vectors = ChunkExportReader(export_dir).slice(0, 3)
+    assert [r["has_vector"] for r in rows] == [True, False, True]
+    assert vectors[:, 0].tolist() == [0.0, 0.0, 2.0]
+
+
+def test_rows_without_vectors_are_flushed_before_the_dimension_is_known(tmp_path):
+    export_dir = str(tmp_path / "export")
+    chunks = _chunks("a.pdf", 7)
+    for chunk in chunks[:5]:
+        del chunk["vector"]
+    with ChunkExportWriter(export_dir, shard_rows=2, batch_rows=2) as writer:
+        writer.write(chunks[:5])
+        assert len(writer._vectors) < 2  # not held in memory until a vector shows up
+        writer.write(chunks[5:])
+
+    reader = ChunkExportReader(export_dir)
+    assert reader.dim == 4
+    assert [s["rows"] for s in reader.shards] == [2, 2, 2, 1]
+    rows, vectors = reader.slice(0, 7)
+    assert [r["has_vector"] for r in rows] == [False] * 5 + [True] * 2
+    assert vectors[:, 0].tolist() == [0.0] * 5 + [5.0, 6.0]
+
+
+def test_rewrite_keeps_only_requested_documents(tmp_path):
+    export_dir = str(tmp_path / "export")
+    with ChunkExportWriter(export_dir, shard_rows=3) as writer:
+        writer.write(_chunks("a.pdf", 2))
+        writer.write(_chunks("b.pdf", 2, start=2))
+        writer.write(_chunks("c.pdf", 2, start=4))
+
+    with ChunkExportWriter.rewrite(export_dir, {"a.pdf", "c.pdf"}) as writer:
+        writer.write(_chunks("d.pdf", 1, start=9))
+
+    reader = ChunkExportReader(export_dir)
+    rows, vectors = reader.slice(0, len(reader), columns=["document_id"])
+    assert [r["document_id"] for r in rows] == ["a.pdf", "a.pdf", "c.pdf", "c.pdf", "d.pdf"]
+    assert vectors[:, 0].tolist() == [0.0, 1.0, 4.0, 5.0, 9.0]
+    assert not (tmp_path / "export.old").exists()
+
+
+def test_interrupted_rewrite_keeps_the_previous_export(tmp_path):
+    export_dir = str(tmp_path / "export")
+    with ChunkExportWriter(export_dir, shard_rows=2) as writer:
+        writer.write(_chunks("a.pdf", 3))
+        writer.write(_chunks("b.pdf", 2, start=3))
+
+    # Crash: a shard of the new export was closed (index written), then no close()
+    writer = ChunkExportWriter.rewrite(export_dir, {"a.pdf"}, shard_rows=2, batch_rows=1)
+    writer.write(_chunks("c.pdf", 1, start=7))
+    assert (tmp_path / "export.old").exists()
+
+    with ChunkExportWriter.rewrite(export_dir, {"a.pdf"}) as writer:
+        writer.write(_chunks("c.pdf", 1, start=7))
+
+    reader = ChunkExportReader(export_dir)
+    rows, vectors = reader.slice(0, len(reader), columns=["document_id"])
+    assert [r["document_id"] for r in rows] == ["a.pdf", "a.pdf", "a.pdf", "c.pdf"]
+    assert vectors[:, 0].tolist() == [0.0, 1.0, 2.0, 7.0]
+    assert not (tmp_path / "export.old").exists()
@@ -1,4 +1,6 @@
-from chunker import get_token_count, chunk_text_semantically, create_hierarchical_chunks
+import pytest
+
+from chunker import get_token_count, chunk_text_semantically, create_hierarchical_chunks, assign_chunk_ids, chunk_uuid
 
 
 def test_get_token_count_nonzero_for_text():
@@ -80,3 +82,180 @@ def test_create_hierarchical_chunks_fallback_level3():
     assert all(c["section"] == "Fallback" for c in chunks)
 
 
+def _reference_chunk_text_semantically(text, max_tokens, overlap):
+    # Baseline chunker.chunk_text_semantically: decoded token windows
+    from chunker import ENC
+
+    tokens = ENC.encode(text)
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        chunks.append(ENC.decode(tokens[start:end]))
+        if end == len(tokens):
+            break
+        start += (max_tokens - overlap)
+    return chunks
+
+
+def _reference_hierarchical_chunks(parsed_structure, filename):
+    # Baseline create_hierarchical_chunks: re-encodes the growing clause buffer at every clause
+    final_chunks = []
+    for sec in parsed_structure:
+        buffer_text, buffer_ids = "", []
+        for clause in sec["clauses"]:
+            combined = (buffer_text + "\n" + clause["text"]).strip()
+            if get_token_count(combined) > 350 and buffer_text:
+                final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                     "clause_number": ", ".join(str(x) for x in buffer_ids if x), "chunk_level": 1,
+                                     "text": buffer_text, "token_count": get_token_count(buffer_text)})
+                buffer_text, buffer_ids = clause["text"], [clause["number"]]
+            else:
+                buffer_text = combined
+                buffer_ids.append(clause["number"])
+        if buffer_text:
+            final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                 "clause_number": ", ".join(str(x) for x in buffer_ids if x), "chunk_level": 1,
+                                 "text": buffer_text, "token_count": get_token_count(buffer_text)})
+    for sec in parsed_structure:
+        if get_token_count(sec["section_text"]) <= 1200:
+            final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                 "clause_number": "SECTION_SUMMARY", "chunk_level": 2,
+                                 "text": sec["section_text"], "token_count": get_token_count(sec["section_text"])})
+        else:
+            for sc in _reference_chunk_text_semantically(sec["section_text"], 1000, 150):
+                final_chunks.append({"document_id": filename, "section": sec["section_title"],
+                                     "clause_number": "SECTION_PART", "chunk_level": 2,
+                                     "text": sc, "token_count": get_token_count(sc)})
+    return final_chunks
+
+
+def _parsed_fixture():
+    import random
+
+    rng = random.Random(7)
+    words = ["tenant", "landlord", "shall", "pay", "rent", "premises", "notice", "term", "agreement",
+             "the", "of", "and", "within", "days", "written", "party", "obligations", "hereunder"]
+
+    def sentences(n):
+        return " ".join(" ".join(rng.choices(words, k=rng.randint(5, 15))).capitalize() + "." for _ in range(n))
+
+    return [
+        {
+            "section_title": f"Section {s}",
+            # Section 2 is long enough to be split into level-2 windows
+            "section_text": sentences(400 if s == 2 else rng.randint(5, 60)),
+            "clauses": [{"number": f"{s}.{c}", "text": sentences(rng.randint(1, 25))} for c in range(1, 30)],
+        }
+        for s in range(1, 4)
+    ]
+
+
+def test_create_hierarchical_chunks_matches_the_baseline_algorithm():
+    parsed = _parsed_fixture()
+    chunks = create_hierarchical_chunks(parsed, filename="doc")
+    assert chunks == _reference_hierarchical_chunks(parsed, filename="doc")
+    assert any(c["clause_number"] == "SECTION_PART" for c in chunks)
+    assert len([c for c in chunks if c["chunk_level"] == 1]) > 3
+
+
+def test_chunk_token_counts_are_exact():
+    chunks = create_hierarchical_chunks(_parsed_fixture(), filename="doc")
+    assert [c["token_count"] for c in chunks] == [get_token_count(c["text"]) for c in chunks]
+
+
+def test_create_hierarchical_chunks_does_not_reencode_the_clause_buffer(monkeypatch):
+    import chunker
+
+    calls = {"encode": 0, "batch": []}
+    real = chunker.ENC
+
+    class CountingEncoding:
+        def encode(self, text, **kwargs):
+            calls["encode"] += 1
+            return real.encode(text, **kwargs)
+
+        def encode_batch(self, texts, **kwargs):
+            calls["batch"].append(len(texts))
+            return real.encode_batch(texts, **kwargs)
+
+        def decode(self, tokens):
+            return real.decode(tokens)
+
+        def decode_tokens_bytes(self, tokens):
+            return real.decode_tokens_bytes(tokens)
+
+        def decode_with_offsets(self, tokens):
+            return real.decode_with_offsets(tokens)
+
+    parsed = _parsed_fixture()
+    expected = create_hierarchical_chunks(parsed, filename="doc")
+
+    monkeypatch.setattr(chunker, "ENC", CountingEncoding())
+    chunks = chunker.create_hierarchical_chunks(parsed, filename="doc")
+    assert chunks == expected
+    level1 = [c for c in chunks if c["chunk_level"] == 1]
+    # One batch for clauses + sections, one for the merged level-1 texts; a merged
+    # text is only encoded when the summed counts pass the limit (once per flush)
+    assert calls["batch"] == [3 * 29 + 3, len(level1)]
+    assert calls["encode"] <= len(level1)
+
+
+@pytest.mark.parametrize("text", [
+    "The tenant shall pay rent monthly. " * 200,
+    "Le locataire paie le loyer — à échéance, 10 000 € «net». 契約期間は二年とする。 " * 80,
+])
+def test_chunk_spans_semantically_slices_match_decoded_windows(text):
+    from chunker import ENC, chunk_spans_semantically
+
+    tokens = ENC.encode(text)
+    spans = chunk_spans_semantically(text, max_tokens=50, overlap=10)
+
+    starts = list(range(0, len(tokens), 40))
+    starts = starts[:next(i for i, s in enumerate(starts) if s + 50 >= len(tokens)) + 1]
+    assert [count for _, _, count in spans] == [min(50, len(tokens) - s) for s in starts]
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end, count), s in zip(spans, starts):
+        decoded = ENC.decode(tokens[s:s + count])
+        if text.isascii():
+            assert text[start:end] == decoded
+        else:
+            # Windows may cut a multi-byte character; the slice keeps it whole
+            assert decoded.strip("�") in text[start:end]
+    assert chunk_text_semantically(text, max_tokens=50, overlap=10) == [text[s:e] for s, e, _ in spans]
+
+
+def test_chunk_spans_semantically_reuses_given_tokens():
+    from chunker import ENC, chunk_spans_semantically
+
+    text = "Clause text. " * 100
+    assert chunk_spans_semantically(text, 64, 16, tokens=ENC.encode(text)) == chunk_spans_semantically(text, 64, 16)
+    assert chunk_spans_semantically("", 64, 16) == []
+
+
+def test_create_hierarchical_chunks_from_document_index_matches_parsed_structure():
+    from contract_parser import parse_contract, parse_contract_index
+
+    clauses = "\n".join(f"({c}) The lessee shall maintain item {c} in good repair." for c in range(1, 60))
+    text = f"Intro recital.\n1. Definitions\n{clauses}\n2. Rent\n" + "Rent is due monthly. " * 700
+    expected = create_hierarchical_chunks(parse_contract(text), filename="doc")
+    chunks = create_hierarchical_chunks(parse_contract_index(text), filename="doc")
+
+    spans = [c.pop("span") for c in chunks]
+    assert chunks == expected
+    assert {c["clause_number"] for c in chunks} >= {"SECTION_SUMMARY", "SECTION_PART"}
+    for chunk, (start, end) in zip(chunks, spans):
+        # Level-1 texts are merged clauses; their span runs from the first clause to the last
+        assert text[start:end].startswith(chunk["text"][:30])
+        assert text[start:end].strip().endswith(chunk["text"].strip()[-30:])
+
+
+def test_assign_chunk_ids_are_deterministic_per_document_level_and_position():
+    def chunks():
+        return [{"chunk_level": 1}, {"chunk_level": 2}, {"chunk_level": 2}]
+
+    first = [c["uuid"] for c in assign_chunk_ids(chunks(), "a.pdf")]
+    assert first == [c["uuid"] for c in assign_chunk_ids(chunks(), "a.pdf")]
+    assert first == [chunk_uuid("a.pdf", 1, 0), chunk_uuid("a.pdf", 2, 0), chunk_uuid("a.pdf", 2, 1)]
+    assert len(set(first)) == 3
+    assert not set(first) & {c["uuid"] for c in assign_chunk_ids(chunks(), "b.pdf")}
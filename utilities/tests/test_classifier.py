@@ -9,3 +9,44 @@ def test_classifier_detects_nda():
     assert classify_contract_type("This is a Non-Disclosure agreement and confidentiality agreement.") == "NDA"
 
 
+def test_keyword_automaton_counts_like_str_count():
+    from classifier import KeywordAutomaton
+
+    terms = ["vendor", "vendor agreement", "nda", "aa", "a"]
+    text = "standard vendor agreement; aaa vendor"
+    assert KeywordAutomaton(terms).count(text) == [text.count(t) for t in terms]
+
+
+def test_keyword_classifier_uses_taxonomy_and_batches():
+    from classifier import KeywordClassifier
+
+    taxonomy = {"Loan": ["borrower", "lender"], "Lease": ["tenant"]}
+    classifier = KeywordClassifier(taxonomy)
+    assert classifier.automaton is None  # small taxonomy: str.count
+    assert classifier.scores("The Borrower and the lender; the tenant.") == {"Loan": 2, "Lease": 1}
+    assert classifier.classify_batch(["tenant", "no terms", "lender"]) == ["Lease", "Other", "Loan"]
+
+    large = KeywordClassifier(taxonomy, automaton_min_terms=3)
+    assert large.automaton is not None
+    assert large.scores("The Borrower and the lender; the tenant.") == {"Loan": 2, "Lease": 1}
+
+
+def test_load_taxonomy_from_json(tmp_path):
+    import json
+    import pytest
+    from classifier import load_taxonomy, DEFAULT_TAXONOMY
+
+    path = tmp_path / "taxonomy.json"
+    path.write_text(json.dumps({"Loan": ["borrower"]}), encoding="utf-8")
+    assert load_taxonomy(str(path)) == {"Loan": ["borrower"]}
+    assert load_taxonomy() == DEFAULT_TAXONOMY
+
+    path.write_text(json.dumps({"Loan": "borrower"}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_taxonomy(str(path))
+
+
+def test_classify_contract_types_batch():
+    from classifier import classify_contract_types
+
+    assert classify_contract_types(["The tenant and landlord.", "hello"]) == ["Lease", "Other"]
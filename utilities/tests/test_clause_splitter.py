@@ -1,4 +1,4 @@
-from clause_splitter import split_into_clauses
+from clause_splitter import split_into_clauses, split_into_clauses_index
 
 
 def test_split_into_clauses_empty():
@@ -42,3 +42,11 @@ def test_split_into_clauses_header_with_no_body_results_in_no_clauses_appended()
     assert clauses == []
 
 
+def test_split_into_clauses_index_spans_the_bodies():
+    text = "Intro text\n1. Definitions\n\nThese terms.\n\nARTICLE 2\nThe term.\n"
+    index = split_into_clauses_index(text)
+    assert [s.title for s in index.sections()] == ["Preamble/Introduction", "1. Definitions", "ARTICLE 2"]
+    start, end = index.section_span(1)
+    assert text[start:end] == "These terms."
+    # One unnumbered clause per section, covering the body
+    assert [(index.clause_number(j), index.clause_span(j)) for j in index.section_clauses(1)] == [(None, (start, end))]
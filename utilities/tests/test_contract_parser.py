@@ -1,4 +1,8 @@
-from contract_parser import extract_sections, extract_clauses, parse_contract
+import random
+
+import pytest
+
+from contract_parser import extract_sections, extract_clauses, parse_contract, parse_contract_by_lines, parse_contract_index
 
 
 def test_extract_sections_detects_titles():
@@ -34,3 +38,33 @@ def test_extract_sections_handles_final_section_append():
     assert sections[0]["end"] > sections[0]["start"]
 
 
+LINE_KINDS = [
+    "", "   ", "\t", " \r",
+    "SECTION 1. DEFINITIONS", "ARTICLE 12: Term and Termination", "  Section 3 Scope",
+    "1. Definitions", "12. Payment terms", "1.1 Tenant means the lessee.", " 2.3.4 Notices apply.",
+    "1.1 lowercase is not a clause start", "IV. Remedies", "GOVERNING LAW", "GOVERNING LAW ", "ABC",
+    "(a) first item", "  (iv) nested item", "3) numbered bullet", "(a)", "(A) capital bullet",
+    "This is body text.", "Page 2 of 3", "1.Definitions", "2.\tNotices", "\u00a01. Non-breaking start",
+]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_parse_contract_matches_line_by_line_parser(seed):
+    rng = random.Random(seed)
+    text = "\n".join(rng.choice(LINE_KINDS) for _ in range(rng.randint(0, 60)))
+    if rng.random() < 0.3:
+        text += "\n"
+    assert parse_contract(text) == parse_contract_by_lines(text)
+
+
+def test_parse_contract_index_returns_spans_into_the_text():
+    text = "Intro line\n1. Definitions\nBody\n(a) the lessee\n(b) and assigns\n2. Rent\nPay monthly."
+    index = parse_contract_index(text)
+    assert [s.title for s in index.sections()] == ["PREAMBLE/UNKNOWN", "1. Definitions", "2. Rent"]
+    start, end = index.section_span(1)
+    assert text[start:end] == "1. Definitions\nBody\n(a) the lessee\n(b) and assigns"
+    assert [(index.clause_number(j), text[slice(*index.clause_span(j))]) for j in index.section_clauses(1)] == [
+        (None, "1. Definitions\nBody"),
+        ("(a)", "(a) the lessee"),
+        ("(b)", "(b) and assigns"),
+    ]
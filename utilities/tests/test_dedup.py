@@ -0,0 +1,99 @@
+import numpy as np
+
+from dedup import DedupEmbedder, DedupIndex, minhash_signature, normalize_words
+
+
+GOVERNING_LAW = ("This Agreement shall be governed by and construed in accordance with the laws of "
+                 "the State of New York, without regard to its conflict of laws principles. Each party "
+                 "submits to the exclusive jurisdiction of the courts located in New York County.")
+
+
+def _chunk(text, level=1):
+    return {"document_id": "doc", "chunk_level": level, "text": text}
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.embedded = []
+
+    def __call__(self, chunks):
+        for chunk in chunks:
+            self.embedded.append(chunk["text"])
+            chunk["vector"] = [float(len(self.embedded))]
+        return chunks
+
+
+def test_minhash_similarity_tracks_text_overlap():
+    base = minhash_signature(normalize_words(GOVERNING_LAW))
+    near = minhash_signature(normalize_words(GOVERNING_LAW.replace("New York County", "Kings County")))
+    other = minhash_signature(normalize_words("The tenant shall pay rent on the first day of every month."))
+    assert base.dtype == np.uint32 and base.shape == (64,)
+    assert np.mean(base == near) > 0.7
+    assert np.mean(base == other) < 0.2
+
+
+def test_index_matches_exact_and_near_duplicates_at_the_same_level():
+    index = DedupIndex(threshold=0.7)
+    first = _chunk(GOVERNING_LAW)
+    assert index.match(first) is None
+    # Whitespace/case/punctuation only -> exact match
+    assert index.match(_chunk("  " + GOVERNING_LAW.upper().replace(",", ""))) == first["content_hash"]
+    assert index.match(_chunk(GOVERNING_LAW.replace("New York County", "Kings County"))) == first["content_hash"]
+    assert index.match(_chunk(GOVERNING_LAW, level=2)) is None
+    assert index.match(_chunk("Rent is payable monthly in advance by wire transfer.")) is None
+    assert len(index) == 3
+
+
+def test_dedup_embedder_reuses_vectors_across_batches():
+    inner = CountingEmbedder()
+    embedder = DedupEmbedder(inner, DedupIndex(threshold=0.7))
+
+    batch1 = [_chunk(GOVERNING_LAW), _chunk("Rent is payable monthly in advance.")]
+    batch2 = [_chunk(GOVERNING_LAW + " "), _chunk(GOVERNING_LAW.replace("New York County", "Kings County")),
+              _chunk("Notices must be given in writing to the addresses above.")]
+    embedder(batch1)
+    embedder(batch2)
+
+    assert len(inner.embedded) == 3
+    assert batch2[0]["vector"] == batch2[1]["vector"] == batch1[0]["vector"]
+    assert batch2[0]["duplicate_of"] == batch1[0]["content_hash"]
+    assert "duplicate_of" not in batch2[2]
+    assert embedder.stats == {"chunks": 5, "embedded": 3, "duplicates": 2}
+
+
+def test_duplicates_within_one_batch_are_embedded_once_the_canonical_has_a_vector():
+    inner = CountingEmbedder()
+    embedder = DedupEmbedder(inner, DedupIndex())
+    embedder([_chunk(GOVERNING_LAW), _chunk(GOVERNING_LAW)])
+    # The canonical had no vector yet when its duplicate was seen
+    assert len(inner.embedded) == 2
+    embedder([_chunk(GOVERNING_LAW)])
+    assert len(inner.embedded) == 2
+
+
+def test_max_entries_bounds_the_index():
+    index = DedupIndex(max_entries=1)
+    assert index.match(_chunk("first unique clause text")) is None
+    assert index.match(_chunk("second unique clause text about rent")) is None
+    assert len(index) == 1
+
+
+def test_near_duplicate_aliases_count_towards_max_entries():
+    index = DedupIndex(max_entries=2)
+    first = _chunk(GOVERNING_LAW)
+    assert index.match(first) is None
+    first["vector"] = [1.0]
+    index.set_vector(first)
+    # A near duplicate is aliased to the canonical chunk: the index is now full
+    near = GOVERNING_LAW.replace("New York County", "New York County, New York")
+    assert index.match(_chunk(near)) == first["content_hash"]
+    assert len(index._exact) == 2
+    # Another near duplicate still matches, but is not remembered
+    assert index.match(_chunk(GOVERNING_LAW + " Venue.")) == first["content_hash"]
+    assert len(index._exact) == 2
+
+    # A new canonical chunk starts a new generation: every map is emptied
+    assert index.match(_chunk("an unrelated clause about the payment of rent")) is None
+    assert index.generations == 2
+    assert len(index._exact) == 1 and len(index) == 1
+    assert index.vector(1, first["content_hash"]) is None
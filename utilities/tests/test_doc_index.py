@@ -0,0 +1,42 @@
+from doc_index import DocumentIndex, strip_span
+
+
+def _index():
+    text = "Intro\n1. Terms\n(a) first\n(b) second"
+    index = DocumentIndex(text)
+    index.add_section(0, 5, title="PREAMBLE/UNKNOWN")
+    index.add_clause(0, 5)
+    index.add_section(6, len(text), title_span=(6, 14))
+    index.add_clause(15, 24, number_span=(15, 18))
+    index.add_clause(25, len(text), number_span=(25, 28))
+    return index
+
+
+def test_strip_span_matches_str_strip():
+    text = "  \n body text \t\n"
+    start, end = strip_span(text, 0, len(text))
+    assert text[start:end] == text.strip()
+    assert strip_span(text, 0, 3) == (0, 0)
+
+
+def test_document_index_slices_titles_texts_and_numbers():
+    index = _index()
+    assert len(index) == 2 and index.clause_count == 3
+    assert index.section_title(0) == "PREAMBLE/UNKNOWN"
+    assert index.section_title(1) == "1. Terms"
+    assert index.section_text(1) == "1. Terms\n(a) first\n(b) second"
+    assert list(index.section_clauses(1)) == [1, 2]
+    assert [index.clause_number(j) for j in range(3)] == [None, "(a)", "(b)"]
+    assert index.clause_text(2) == "(b) second"
+
+
+def test_document_index_views_and_parsed_structure():
+    index = _index()
+    sections = list(index.sections())
+    assert [c.text for c in sections[1].clauses] == ["(a) first", "(b) second"]
+    assert sections[1].span == (6, len(index.text))
+    assert index.to_parsed_structure()[1] == {
+        "section_title": "1. Terms",
+        "section_text": "1. Terms\n(a) first\n(b) second",
+        "clauses": [{"number": "(a)", "text": "(a) first"}, {"number": "(b)", "text": "(b) second"}],
+    }
@@ -0,0 +1,48 @@
+import os
+import sys
+import types
+import importlib
+
+import numpy as np
+import pytest
+
+
+class FakeModel:
+    max_seq_length = 256
+
+    def __init__(self, name, device=None):
+        assert device == "cpu"
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        return np.array([[float(len(t)), float(os.getpid())] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def embed_pool(monkeypatch, tmp_path):
+    from utilities import embedding_cache
+    monkeypatch.setattr(embedding_cache, "_default_cache", embedding_cache.EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(embedding_cache, "EMBED_CACHE_ENABLED", True)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=FakeModel))
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(set_num_threads=lambda n: None))
+    importlib.reload(importlib.import_module("utilities.embedder"))
+    return importlib.reload(importlib.import_module("embed_pool"))
+
+
+def test_pool_embeds_chunks_in_worker_processes_in_input_order(embed_pool):
+    texts = [("x" * (i % 37 + 1)) * (1 + 20 * (i % 5 == 0)) for i in range(200)]
+    chunks = [{"text": text, "token_count": len(text) // 4 + 1} for text in texts]
+
+    # Fork: the workers inherit the fake model modules
+    with embed_pool.EmbeddingPool(workers=2, threads=1, token_budget=256, start_method="fork") as pool:
+        pool.warmup()
+        out = pool(chunks)
+
+    vectors = np.stack([c["vector"] for c in out])
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [float(len(t)) for t in texts]
+    assert os.getpid() not in set(vectors[:, 1].tolist())  # encoded by the workers, not here
+    assert out[0]["vector"].base is out[-1]["vector"].base  # rows of one array
+
+
+def test_get_pool_is_disabled_by_zero_workers(embed_pool):
+    assert embed_pool.get_pool(0) is None
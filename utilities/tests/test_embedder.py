@@ -1,22 +1,50 @@
 import sys
 import types
 
+import numpy as np
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _tmp_embedding_cache(monkeypatch, tmp_path):
+    # Keep the default embedding cache out of utilities/output
+    from utilities import embedding_cache
+    monkeypatch.setattr(embedding_cache, "_default_cache", embedding_cache.EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(embedding_cache, "EMBED_CACHE_ENABLED", True)
+    # Fresh model registry: each test's (reloaded) embedder loads its own fake model
+    from utilities import model_registry
+    monkeypatch.setattr(model_registry, "registry", model_registry.ModelRegistry())
+    return embedding_cache._default_cache
+
+
+def _fake_torch(monkeypatch, cuda=False, mps=False):
+    calls = {"threads": None, "quantized": []}
+
+    def quantize_dynamic(model, layers, dtype=None):
+        calls["quantized"].append(model)
+        return model
+
+    fake = types.SimpleNamespace(
+        cuda=types.SimpleNamespace(is_available=lambda: cuda),
+        backends=types.SimpleNamespace(mps=types.SimpleNamespace(is_available=lambda: mps)),
+        set_num_threads=lambda n: calls.update(threads=n),
+        ao=types.SimpleNamespace(quantization=types.SimpleNamespace(quantize_dynamic=quantize_dynamic)),
+        nn=types.SimpleNamespace(Linear=object),
+        qint8="qint8",
+    )
+    monkeypatch.setitem(sys.modules, "torch", fake)
+    return calls
+
 
 def test_generate_embeddings_with_mocked_sentence_transformers(monkeypatch):
     # Mock sentence_transformers before importing embedder
     class FakeModel:
         def encode(self, texts, batch_size=512, convert_to_numpy=True):
-            class FakeArr:
-                def __init__(self, n):
-                    self._n = n
-
-                def tolist(self):
-                    return [0.1, 0.2, 0.3]
-
-            return [FakeArr(i) for i in range(len(texts))]
+            return np.array([[0.1, 0.2, 0.3]] * len(texts), dtype=np.float32)
 
     fake_st = types.SimpleNamespace(SentenceTransformer=lambda *a, **k: FakeModel())
     monkeypatch.setitem(sys.modules, "sentence_transformers", fake_st)
+    _fake_torch(monkeypatch)
 
     import importlib
 
@@ -25,7 +53,7 @@ def test_generate_embeddings_with_mocked_sentence_transformers(monkeypatch):
 
     chunks = [{"text": "a"}, {"text": "b"}]
     out = embedder.generate_embeddings(chunks)
-    assert out[0]["vector"] == [0.1, 0.2, 0.3]
+    assert out[0]["vector"] == pytest.approx([0.1, 0.2, 0.3])
 
 
 def test_generate_embeddings_empty_chunks(monkeypatch):
@@ -45,6 +73,7 @@ def test_generate_embeddings_handles_encode_error(monkeypatch):
 
     fake_st = types.SimpleNamespace(SentenceTransformer=lambda *a, **k: FakeModel())
     monkeypatch.setitem(sys.modules, "sentence_transformers", fake_st)
+    _fake_torch(monkeypatch)
 
     embedder = importlib.import_module("embedder")
     importlib.reload(embedder)
@@ -55,3 +84,129 @@ def test_generate_embeddings_handles_encode_error(monkeypatch):
     assert "vector" not in out[0]
 
 
+@pytest.mark.parametrize("cuda, mps, expected", [(True, True, "cuda"), (False, True, "mps"), (False, False, "cpu")])
+def test_resolve_device_autodetects(monkeypatch, cuda, mps, expected):
+    import importlib
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=None))
+    _fake_torch(monkeypatch, cuda=cuda, mps=mps)
+    embedder = importlib.reload(importlib.import_module("embedder"))
+    assert embedder.resolve_device("auto") == expected
+    assert embedder.resolve_device("cpu") == "cpu"
+
+
+def test_load_model_int8_quantizes_on_cpu_with_thread_setting(monkeypatch):
+    import importlib
+
+    loaded = []
+    fake_st = types.SimpleNamespace(SentenceTransformer=lambda name, device=None: loaded.append((name, device)) or "model")
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_st)
+    calls = _fake_torch(monkeypatch, cuda=True)
+    embedder = importlib.reload(importlib.import_module("embedder"))
+
+    model = embedder.load_model("mini", backend="int8", device="auto", threads=3)
+    assert model == "model"
+    assert loaded == [("mini", "cpu")]  # int8 forces CPU even with CUDA available
+    assert calls == {"threads": 3, "quantized": ["model"]}
+
+    embedder.load_model("mini", backend="torch", device="auto", threads=0)
+    assert loaded[-1] == ("mini", "cuda")
+    with pytest.raises(ValueError):
+        embedder.load_model("mini", backend="onnx-fp64")
+
+
+PARITY_SENTENCES = [
+    "This Agreement shall be governed by the laws of the State of New York.",
+    "The Tenant shall pay the monthly rent on the first day of each month.",
+    "Each party shall keep the Confidential Information of the other party secret.",
+    "The Employee is entitled to twenty days of paid vacation per calendar year.",
+    "The Supplier warrants that the goods are free from defects in material and workmanship.",
+    "Either party may terminate this Agreement upon thirty days written notice.",
+    "The Buyer shall pay the Purchase Price at Closing by wire transfer.",
+    "Notices",
+]
+
+
+def test_int8_backend_vectors_stay_close_to_fp32(monkeypatch):
+    # Parity of the int8 embedding backend with fp32 on the real MiniLM model
+    # (only from the local Hugging Face cache: the test never downloads it)
+    pytest.importorskip("torch")
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    pytest.importorskip("sentence_transformers")
+    import importlib
+    embedder = importlib.reload(importlib.import_module("embedder"))
+
+    try:
+        fp32 = embedder.load_model("all-MiniLM-L6-v2", backend="torch", device="cpu", threads=0)
+        int8 = embedder.load_model("all-MiniLM-L6-v2", backend="int8", device="cpu", threads=0)
+    except Exception as e:
+        pytest.skip(f"all-MiniLM-L6-v2 is not in the local model cache: {e}")
+
+    reference = fp32.encode(PARITY_SENTENCES, normalize_embeddings=True)
+    quantized = int8.encode(PARITY_SENTENCES, normalize_embeddings=True)
+    cosine = (np.asarray(reference) * np.asarray(quantized)).sum(axis=1)
+    assert cosine.min() > 0.95, cosine.tolist()
+
+
+def test_generate_embeddings_only_encodes_texts_missing_from_the_cache(monkeypatch, _tmp_embedding_cache):
+    import importlib
+
+    encoded = []
+
+    class FakeModel:
+        def encode(self, texts, batch_size=512, convert_to_numpy=True):
+            encoded.append(list(texts))
+            return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=lambda *a, **k: FakeModel()))
+    _fake_torch(monkeypatch)
+    embedder = importlib.reload(importlib.import_module("embedder"))
+
+    embedder.generate_embeddings([{"text": "first clause"}, {"text": "second"}])
+    out = embedder.generate_embeddings([{"text": "second"}, {"text": "first   clause "}, {"text": "new"}])
+    # Whitespace differences normalize to the same cache entry
+    assert encoded == [["warmup"], ["first clause", "second"], ["new"]]  # warmup inference at load
+    assert [c["vector"].tolist() for c in out] == [[6.0, 1.0], [12.0, 1.0], [3.0, 1.0]]
+    # Rows of one float32 array, not per-chunk lists
+    assert out[0]["vector"].dtype == np.float32
+    assert out[0]["vector"].base is not None and out[0]["vector"].base is out[2]["vector"].base
+    assert _tmp_embedding_cache.stats["hits"] == 2
+
+
+def test_token_batches_group_similar_lengths_within_the_budget():
+    import embedder
+
+    lengths = [10, 300, 12, 250, 11, 9, 1000]
+    batches = embedder.token_batches(lengths, token_budget=600, max_batch=3)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert batches[0] == [6]  # over the budget on its own
+    for batch in batches:
+        longest = max(lengths[i] for i in batch)
+        assert len(batch) == 1 or len(batch) * longest <= 600
+        assert len(batch) <= 3
+    assert [1, 3] in batches
+    assert [2, 4, 0] in batches
+
+
+def test_encode_batches_restores_input_order(monkeypatch):
+    import importlib
+
+    calls = []
+
+    class FakeModel:
+        max_seq_length = 50
+
+        def encode(self, texts, batch_size=32, convert_to_numpy=True):
+            calls.append(list(texts))
+            return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=object))
+    _fake_torch(monkeypatch)
+    embedder = importlib.reload(importlib.import_module("embedder"))
+
+    texts = ["a" * 400, "bb", "c" * 100, "dddd"]
+    vectors = embedder.encode_batches(FakeModel(), texts, [None, 1, None, 2], token_budget=100)
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [400.0, 2.0, 100.0, 4.0]
+    # 400 and 100 characters both cap at max_seq_length (50 tokens): 2 x 50 fits the budget
+    assert calls == [["a" * 400, "c" * 100], ["dddd", "bb"]]
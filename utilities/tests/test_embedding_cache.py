@@ -0,0 +1,55 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache, cache_key, cached_encode
+
+
+def test_cache_key_depends_on_model_and_normalized_text():
+    assert cache_key("m", "a  b\n") == cache_key("m", "a b")
+    assert cache_key("m", "a b") != cache_key("other", "a b")
+    assert cache_key("m", "a b") != cache_key("m", "A b")
+
+
+def test_put_and_get_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    cache.put_many("m", ["x", "y"], [[1.0, 2.0], [3.0, 4.0]])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    x, missing, y = reopened.get_many("m", ["x", "z", "y"])
+    assert missing is None
+    assert x.dtype == np.float32 and x.tolist() == [1.0, 2.0]
+    assert y.tolist() == [3.0, 4.0]
+    assert reopened.get_many("other-model", ["x"]) == [None]
+    assert reopened.stats == {"hits": 2, "misses": 2, "evicted": 0}
+
+
+def test_evicts_least_recently_used_entries_above_max_bytes(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_bytes=10 * 16)  # 10 vectors of 4 float32
+    cache.put_many("m", [f"t{i}" for i in range(8)], [[float(i)] * 4 for i in range(8)])
+    cache.get_many("m", ["t0"])  # t0 becomes the most recently used
+    cache.put_many("m", ["t8", "t9", "t10"], [[8.0] * 4, [9.0] * 4, [10.0] * 4])
+
+    assert cache.size_bytes() <= 10 * 16
+    remaining = cache.get_many("m", [f"t{i}" for i in range(11)])
+    assert remaining[0] is not None and remaining[10] is not None
+    assert remaining[1] is None  # least recently used went first
+    assert cache.stats["evicted"] == 11 - len(cache)
+
+
+def test_cached_encode_encodes_each_missing_text_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t))] for t in texts])
+
+    first = cached_encode(["aa", "b", "aa"], encode, "m", cache)
+    second = cached_encode(["b", "ccc"], encode, "m", cache)
+    assert calls == [["aa", "b"], ["ccc"]]
+    assert first.dtype == np.float32 and first.tolist() == [[2.0], [1.0], [2.0]]
+    assert second.tolist() == [[1.0], [3.0]]
+    assert cached_encode(["b", "aa"], encode, "m", cache).tolist() == [[1.0], [2.0]]  # all hits
+    assert cached_encode(["d"], encode, "m", None).tolist() == [[1.0]]
+    assert cached_encode([], encode, "m", cache).shape == (0, 0)
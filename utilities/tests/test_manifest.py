@@ -0,0 +1,42 @@
+import json
+
+from manifest import IngestManifest, file_sha256, STAGE_PARSED, STAGE_INSERTED
+
+
+def test_file_sha256_changes_with_content(tmp_path):
+    f = tmp_path / "a.pdf"
+    f.write_bytes(b"one")
+    first = file_sha256(str(f))
+    f.write_bytes(b"two")
+    assert file_sha256(str(f)) != first
+
+
+def test_manifest_round_trip_and_is_current(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IngestManifest(path)
+    manifest.mark("/data/a.pdf", "h1", STAGE_INSERTED, "a.pdf", chunk_count=3)
+    manifest.mark("/data/b.pdf", "h2", STAGE_PARSED, "b.pdf")
+    manifest.save()
+
+    reloaded = IngestManifest(path)
+    assert reloaded.get("/data/a.pdf")["chunk_count"] == 3
+    assert reloaded.is_current("/data/a.pdf", "h1")
+    assert not reloaded.is_current("/data/a.pdf", "changed")
+    # Interrupted before insertion -> must be resumed
+    assert not reloaded.is_current("/data/b.pdf", "h2")
+    assert not reloaded.is_current("/data/new.pdf", "h3")
+
+
+def test_manifest_missing_paths_and_remove(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.mark("/data/a.pdf", "h1", STAGE_INSERTED, "a.pdf")
+    manifest.mark("/data/b.pdf", "h2", STAGE_INSERTED, "b.pdf")
+    assert manifest.missing_paths(["/data/a.pdf"]) == ["/data/b.pdf"]
+    assert manifest.remove("/data/b.pdf")["document_id"] == "b.pdf"
+    assert manifest.missing_paths(["/data/a.pdf"]) == []
+
+
+def test_manifest_ignores_unknown_version(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"version": 999, "documents": {"x": {}}}))
+    assert IngestManifest(str(path)).documents == {}
@@ -0,0 +1,94 @@
+import json
+import threading
+
+import pytest
+
+from utilities import metrics as metrics_module
+from utilities.metrics import Metrics, current, timed, load_sink
+
+
+def test_record_and_summary_accumulate_per_stage_and_document():
+    m = Metrics()
+    m.record("parse", 0.5, items=10, nbytes=100, document_id="a")
+    m.record("parse", 0.25, items=5, document_id="b")
+    m.record("embed", 1.0, items=3, errors=1, document_id="a")
+
+    summary = m.summary(include_documents=True)
+    assert summary["stages"]["parse"] == {"calls": 2, "seconds": 0.75, "avg_ms": 375.0, "items": 15, "bytes": 100, "errors": 0}
+    assert summary["stages"]["embed"]["errors"] == 1
+    assert summary["documents"]["a"] == {"parse": 0.5, "embed": 1.0, "errors": 1}
+    assert "documents" not in m.summary()
+
+
+def test_stage_counts_exceptions_as_errors():
+    m = Metrics()
+    with pytest.raises(ValueError):
+        with m.stage("insert", items=2):
+            raise ValueError("boom")
+    assert m.snapshot()["insert"]["errors"] == 1
+
+
+def test_merge_adds_worker_snapshots():
+    worker = Metrics()
+    worker.record("chunk", 0.1, items=4)
+    worker.record("chunk", 0.1, items=4)
+
+    run = Metrics()
+    run.merge(worker.snapshot(), document_id="doc")
+    run.merge(worker.snapshot(), document_id="doc")
+    assert run.snapshot()["chunk"]["calls"] == 4
+    assert run.snapshot()["chunk"]["items"] == 16
+    assert run.documents["doc"]["chunk"] == pytest.approx(0.4)
+
+
+def test_timed_records_into_current_metrics():
+    @timed("clean", items=lambda result, text: len(result), nbytes=lambda result, text: len(text))
+    def clean(text):
+        return text.strip()
+
+    m = Metrics()
+    with m.activate():
+        assert current() is m
+        clean("  abc  ")
+    assert m.snapshot()["clean"] == {"calls": 1, "seconds": pytest.approx(0, abs=1), "items": 3, "bytes": 7, "errors": 0}
+    assert current() is not m
+
+
+def test_activate_is_per_thread_and_install_is_the_fallback():
+    run = Metrics()
+    local = Metrics()
+    seen = {}
+
+    def worker():
+        seen["thread"] = current()
+
+    with run.install(), local.activate():
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        assert current() is local
+    assert seen["thread"] is run
+    assert current() is metrics_module.REGISTRY
+
+
+def test_sinks_receive_events_and_errors_are_ignored():
+    events = []
+    m = Metrics()
+    m.add_sink(events.append)
+    m.add_sink(lambda event: 1 / 0)
+    m.record("extract", 0.2, items=3, document_id="a")
+    assert events == [{"stage": "extract", "seconds": 0.2, "items": 3, "bytes": 0, "errors": 0, "document_id": "a"}]
+
+
+def test_write_summary_and_load_sink(tmp_path):
+    m = Metrics()
+    m.record("parse", 0.1, document_id="a")
+    path = tmp_path / "metrics.json"
+    m.write_summary(str(path))
+    data = json.loads(path.read_text())
+    assert data["stages"]["parse"]["calls"] == 1
+    assert "a" in data["documents"]
+
+    assert load_sink("json:dumps") is json.dumps
+    with pytest.raises(ValueError):
+        load_sink("json.dumps")
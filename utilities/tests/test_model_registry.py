@@ -0,0 +1,88 @@
+import gc
+import threading
+
+import pytest
+
+from model_registry import ModelRegistry, tensor_bytes
+
+
+class FakeTensor:
+    def __init__(self, n, size=4):
+        self.n, self.size = n, size
+
+    def nelement(self):
+        return self.n
+
+    def element_size(self):
+        return self.size
+
+
+class FakeModule:
+    def __init__(self):
+        self.warmed_up = 0
+
+    def state_dict(self):
+        return {"weight": FakeTensor(1000), "scale": FakeTensor(10, size=1), "config": "not a tensor"}
+
+
+def test_tensor_bytes_counts_state_dict_tensors():
+    assert tensor_bytes(FakeModule()) == 4010
+    assert tensor_bytes(object()) is None
+
+
+def test_get_loads_once_across_threads_and_warms_up():
+    registry = ModelRegistry()
+    loads = []
+    started = threading.Event()
+
+    def loader():
+        started.wait(1)
+        loads.append(1)
+        return FakeModule()
+
+    def warmup(model):
+        model.warmed_up += 1
+
+    registry.register("m", loader, warmup)
+    registry.register("m", lambda: pytest.fail("second registration must not replace the first"))
+    assert not registry.is_loaded("m") and registry.loaded("m") is None
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("m"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(model) for model in results}) == 1
+    assert results[0].warmed_up == 1
+    report = registry.report()["m"]
+    assert report["loaded"] and report["tensor_bytes"] == 4010
+    assert "load_seconds" in report and "warmup_seconds" in report
+
+    registry.unload("m")
+    assert registry.report() == {"m": {"loaded": False}}
+    with pytest.raises(KeyError):
+        registry.get("unknown")
+
+
+def test_failed_warmup_still_loads_the_model():
+    registry = ModelRegistry()
+    registry.register("m", FakeModule, warmup=lambda model: 1 / 0)
+    assert isinstance(registry.get("m"), FakeModule)
+    assert "warmup_seconds" not in registry.report()["m"]
+
+
+def test_preload_loads_models_and_freezes_the_heap():
+    registry = ModelRegistry()
+    registry.register("a", FakeModule)
+    registry.register("b", FakeModule)
+    try:
+        assert registry.preload(["b"]) == ["b"]
+        assert registry.is_loaded("b") and not registry.is_loaded("a")
+        assert gc.get_freeze_count() > 0
+        assert registry.preload() == ["a", "b"]
+    finally:
+        gc.unfreeze()
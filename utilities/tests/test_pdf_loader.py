@@ -66,3 +66,157 @@ def test_load_pdfs_from_folder_handles_extraction_error(tmp_path, monkeypatch):
     assert docs == []
 
 
+def test_iter_pdfs_from_folder_yields_documents_with_page_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "walk", lambda root: [(str(tmp_path), [], ["b.pdf", "a.pdf"])])
+
+    page_texts = ["first page", "", "third page"]
+
+    class FakeTextPage:
+        def __init__(self, text):
+            self._text = text
+
+        def get_text_range(self):
+            return self._text
+
+    class FakePage:
+        def __init__(self, text):
+            self._text = text
+
+        def get_textpage(self):
+            return FakeTextPage(self._text)
+
+    class FakePdf:
+        def __len__(self):
+            return len(page_texts)
+
+        def __getitem__(self, idx):
+            return FakePage(page_texts[idx])
+
+        def close(self):
+            pass
+
+    fake_pdfium = types.SimpleNamespace(PdfDocument=lambda path: FakePdf())
+    monkeypatch.setitem(sys.modules, "pypdfium2", fake_pdfium)
+
+    import importlib
+
+    pdf_loader = importlib.import_module("pdf_loader")
+    importlib.reload(pdf_loader)
+
+    docs = pdf_loader.iter_pdfs_from_folder(str(tmp_path))
+    first = next(docs)
+    assert first["path"].endswith("a.pdf")  # sorted order
+    text = first["text"]
+    assert [text[s:e] for s, e in first["pages"]] == page_texts
+    assert next(docs)["path"].endswith("b.pdf")
+
+    # Cleaned page by page: same text as cleaning the whole document, spans over the cleaned text
+    from text_cleaner import clean_contract_text
+
+    page_texts[:] = ["first  page\nPage 1 of 3", "", "third\tpage ﬁn"]
+    cleaned = pdf_loader.load_pdf(first["path"], clean=True)
+    assert cleaned["cleaned"] is True
+    assert cleaned["text"] == clean_contract_text("first  page\nPage 1 of 3\nthird\tpage ﬁn\n")
+    assert [cleaned["text"][s:e].strip() for s, e in cleaned["pages"]] == ["first page", "", "third page fin"]
+
+
+def test_pages_for_span_maps_offsets_to_page_numbers(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pypdfium2", types.SimpleNamespace(PdfDocument=None))
+
+    import importlib
+
+    pdf_loader = importlib.import_module("pdf_loader")
+    importlib.reload(pdf_loader)
+
+    pages = [(0, 10), (11, 11), (11, 20), (21, 30)]
+    assert pdf_loader.pages_for_span(pages, 2, 5) == [1]
+    assert pdf_loader.pages_for_span(pages, 5, 15) == [1, 3]
+    assert pdf_loader.pages_for_span(pages, 12, 30) == [3, 4]
+    assert pdf_loader.pages_for_span(pages, 5, 5) == []
+    assert pdf_loader.pages_for_span([], 0, 5) == []
+
+
+def test_load_pdf_extracts_large_files_in_page_ranges(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    opened = []
+
+    class FakeTextPage:
+        def __init__(self, idx):
+            self._idx = idx
+
+        def get_text_range(self):
+            return f"page {self._idx + 1}"
+
+    class FakePage:
+        def __init__(self, idx):
+            self._idx = idx
+
+        def get_textpage(self):
+            return FakeTextPage(self._idx)
+
+    class FakePdf:
+        def __init__(self, path):
+            opened.append(path)
+
+        def __len__(self):
+            return 7
+
+        def __getitem__(self, idx):
+            return FakePage(idx)
+
+        def close(self):
+            pass
+
+    monkeypatch.setitem(sys.modules, "pypdfium2", types.SimpleNamespace(PdfDocument=FakePdf))
+
+    import importlib
+
+    pdf_loader = importlib.import_module("pdf_loader")
+    importlib.reload(pdf_loader)
+    monkeypatch.setattr(pdf_loader, "PARALLEL_PAGE_THRESHOLD", 5)
+    monkeypatch.setattr(pdf_loader, "PAGES_PER_RANGE", 3)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        doc = pdf_loader.load_pdf(str(tmp_path / "big.pdf"), executor)
+
+    # 1 handle to count pages + 3 ranges (0-3, 3-6, 6-7)
+    assert len(opened) == 4
+    assert [doc["text"][s:e] for s, e in doc["pages"]] == [f"page {i}" for i in range(1, 8)]
+
+    # Below the threshold the single-pass path is used even with an executor
+    opened.clear()
+    monkeypatch.setattr(pdf_loader, "PARALLEL_PAGE_THRESHOLD", 100)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        small = pdf_loader.load_pdf(str(tmp_path / "small.pdf"), executor)
+    assert len(opened) == 1
+    assert small["text"] == doc["text"]
+
+
+def test_iter_pdfs_extracts_in_the_given_pool_without_closing_it(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pypdfium2", types.SimpleNamespace(PdfDocument=None))
+
+    import importlib
+
+    pdf_loader = importlib.import_module("pdf_loader")
+    importlib.reload(pdf_loader)
+
+    seen = []
+
+    def fake_load_pdf(file_path, executor=None, clean=False):
+        seen.append(executor)
+        return {"text": "text", "pages": [(0, 4)], "filepath": file_path, "cleaned": clean}
+
+    monkeypatch.setattr(pdf_loader, "load_pdf", fake_load_pdf)
+
+    pool = pdf_loader.process_pool(2, start_method="spawn")
+    try:
+        assert pool._mp_context.get_start_method() == "spawn"
+        docs = list(pdf_loader.iter_pdfs([str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")], executor=pool))
+        assert [d["filepath"] for d in docs] == [str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")]
+        assert seen == [pool, pool]
+        assert pool.submit(pow, 2, 3).result() == 8
+    finally:
+        pool.shutdown()
+
+    assert pdf_loader.process_pool(1) is None
@@ -0,0 +1,237 @@
+import sys
+import types
+import threading
+import importlib
+
+import pytest
+
+
+def _import_pipeline(monkeypatch):
+    # pipeline -> pdf_loader imports pypdfium2 at import time
+    monkeypatch.setitem(sys.modules, "pypdfium2", types.SimpleNamespace(PdfDocument=None))
+    monkeypatch.delitem(sys.modules, "utilities.pdf_loader", raising=False)
+    monkeypatch.delitem(sys.modules, "pipeline", raising=False)
+    return importlib.import_module("pipeline")
+
+
+DOCS = [
+    {"path": "/data/a.pdf", "text": "1. Definitions\n1.1 Tenant means the lessee.\n2. Rent\n2.1 The tenant pays the landlord."},
+    {"path": "/data/b.pdf", "text": "This Non-Disclosure agreement covers proprietary information."},
+    {"path": "/data/c.pdf", "text": "ARTICLE 1 SCOPE\n1.1 Scope of work as described."},
+]
+
+
+def test_process_document_cleans_parses_chunks_and_classifies(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    result = pl.process_document(DOCS[0])
+    assert result["error"] is None
+    assert result["document_id"] == "a.pdf"
+    assert result["chunks"]
+    assert all(c["contract_type"] == "Lease" for c in result["chunks"])
+
+
+def test_process_document_uses_given_document_id_and_contract_type(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    result = pl.process_document({"document_id": "user_contract_1", "text": DOCS[0]["text"], "contract_type": "General"})
+    assert result["path"] is None
+    assert all(c["document_id"] == "user_contract_1" for c in result["chunks"])
+    assert all(c["contract_type"] == "General" for c in result["chunks"])
+    # Re-sending the contract yields the same object ids
+    again = pl.process_document({"document_id": "user_contract_1", "text": DOCS[0]["text"], "contract_type": "General"})
+    assert [c["uuid"] for c in again["chunks"]] == [c["uuid"] for c in result["chunks"]]
+    assert len({c["uuid"] for c in result["chunks"]}) == len(result["chunks"])
+
+
+def test_process_document_reports_errors_instead_of_raising(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    result = pl.process_document({"path": "/data/bad.pdf", "text": 123})
+    assert result["chunks"] == []
+    assert result["error"]
+
+
+def test_process_documents_pool_matches_sequential_order(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    sequential = list(pl.process_documents(DOCS, workers=1))
+    pooled = list(pl.process_documents((d for d in DOCS), workers=2))
+    assert [r["document_id"] for r in pooled] == ["a.pdf", "b.pdf", "c.pdf"]
+    # Timings differ between runs; the stages that ran must not
+    assert [sorted(r.pop("metrics")) for r in pooled] == [sorted(r.pop("metrics")) for r in sequential]
+    assert pooled == sequential
+
+
+def test_ingest_documents_parses_in_the_given_pool_without_closing_it(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+
+    def embed(chunks):
+        for c in chunks:
+            c["vector"] = [0.1]
+        return chunks
+
+    # Started before any pipeline thread, with a start method that never forks this process
+    pool = pl.process_pool(2, start_method="spawn")
+    assert pool._mp_context.get_start_method() == "spawn"
+    try:
+        stats = pl.ingest_documents(DOCS, embed_fn=embed, insert_fn=lambda chunks: True,
+                                    parse_workers=2, parse_executor=pool)
+        assert stats["documents"] == 3 and stats["inserted_chunks"] == stats["chunks"] > 0
+        assert pool.submit(pow, 2, 3).result() == 8  # still open: the caller owns it
+    finally:
+        pool.shutdown()
+    assert pl.process_pool(1) is None
+
+
+def test_process_document_records_page_numbers(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    page1 = "1. Definitions\n1.1 Tenant means the lessee.\n"
+    page2 = "Page 2 of 2\n2. Rent\n2.1 The tenant pays the landlord."
+    text = page1 + "\n" + page2 + "\n"
+    doc = {
+        "path": "/data/paged.pdf",
+        "text": text,
+        "pages": [(0, len(page1)), (len(page1) + 1, len(page1) + 1 + len(page2))],
+    }
+    result = pl.process_document(doc)
+    by_section = {c["section"]: c["pages"] for c in result["chunks"] if c["chunk_level"] == 1}
+    assert by_section["1. Definitions"] == [1]
+    assert by_section["2. Rent"] == [2]
+
+
+def test_run_pipeline_overlaps_stages_and_yields_every_item(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    threads = set()
+
+    def double(x):
+        threads.add(threading.current_thread().name)
+        return x * 2
+
+    stages = [pl.Stage("double", double, workers=3), pl.Stage("inc", lambda x: x + 1)]
+    out = list(pl.run_pipeline(range(20), stages, queue_size=1))
+    assert sorted(out) == [x * 2 + 1 for x in range(20)]
+    assert all(name.startswith("pipeline-double") for name in threads)
+
+
+def test_run_pipeline_drops_none_and_raises_stage_errors(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    assert list(pl.run_pipeline(range(5), [pl.Stage("odd", lambda x: x if x % 2 else None)])) == [1, 3]
+
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    with pytest.raises(pl.PipelineError) as excinfo:
+        list(pl.run_pipeline(range(100), [pl.Stage("boom", boom)], queue_size=1))
+    assert excinfo.value.stage == "boom"
+
+
+def test_ingest_documents_batches_embeds_and_inserts(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    seen_docs = []
+    batches = []
+
+    def embed(chunks):
+        for c in chunks:
+            c["vector"] = [0.1]
+        return chunks
+
+    inserted = []
+    docs = DOCS + [{"path": "/data/bad.pdf", "text": 123}]
+    stats = pl.ingest_documents(
+        docs,
+        embed_fn=embed,
+        insert_fn=lambda chunks: inserted.extend(chunks) or True,
+        batch_size=1,
+        on_document=lambda r: seen_docs.append(r["document_id"]),
+        on_batch=batches.append,
+    )
+    assert seen_docs == ["a.pdf", "b.pdf", "c.pdf", "bad.pdf"]
+    assert stats["documents"] == 4
+    assert stats["failed_documents"] == 1
+    assert stats["batches"] == 3
+    assert stats["inserted_chunks"] == stats["chunks"] == len(inserted)
+    assert all(b["inserted"] for b in batches)
+    assert all("vector" in c for c in inserted)
+
+
+def test_ingest_documents_waits_for_background_inserts(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pl = _import_pipeline(monkeypatch)
+
+    def embed(chunks):
+        for c in chunks:
+            c["vector"] = [0.1]
+        return chunks
+
+    batches = []
+    with ThreadPoolExecutor(max_workers=1) as background:
+        # The second document's insert fails in the background
+        submit = lambda chunks: background.submit(lambda: chunks[0]["document_id"] != "b.pdf")
+        stats = pl.ingest_documents(DOCS, embed_fn=embed, insert_fn=submit, batch_size=1, on_batch=batches.append)
+
+    assert {b["documents"][0]["document_id"]: b["inserted"] for b in batches} == {"a.pdf": True, "b.pdf": False, "c.pdf": True}
+    assert stats["inserted_chunks"] == stats["chunks"] - sum(len(b["chunks"]) for b in batches if not b["inserted"])
+
+
+def test_ingest_documents_collects_stage_metrics(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    from utilities.metrics import Metrics, timed
+
+    @timed("embed", items=lambda result, chunks: len(chunks))
+    def embed(chunks):
+        return chunks
+
+    metrics = Metrics()
+    docs = DOCS + [{"path": "/data/bad.pdf", "text": 123}]
+    stats = pl.ingest_documents(docs, embed_fn=embed, insert_fn=lambda chunks: True, batch_size=1, metrics=metrics)
+
+    summary = metrics.summary(include_documents=True)["stages"]
+    assert summary["document"]["calls"] == 4
+    assert summary["document"]["errors"] == 1
+    assert summary["parse"]["calls"] == 3
+    assert summary["chunk"]["calls"] == 3
+    assert summary["embed"]["items"] == stats["chunks"]
+    assert set(metrics.documents) == {"a.pdf", "b.pdf", "c.pdf", "bad.pdf"}
+    assert "clean" in metrics.documents["a.pdf"]
+
+
+def test_ingest_documents_reclassifies_keyword_documents_by_centroids(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    from utilities.centroid_classifier import CentroidClassifier
+
+    centroids = CentroidClassifier.fit([("Services Agreement", [0.0, 1.0])], min_chunks=1)
+
+    def embed(chunks):
+        for c in chunks:
+            c["vector"] = [0.1, 1.0]
+        return chunks
+
+    inserted = []
+    given = {"document_id": "given", "text": DOCS[0]["text"], "contract_type": "Lease"}
+    stats = pl.ingest_documents(DOCS[:1] + [given], embed_fn=embed, insert_fn=lambda chunks: inserted.extend(chunks) or True,
+                                centroids=centroids, dedup=False)
+    assert stats["centroid_classified"] == 1
+    # Keyword-classified "Lease" document relabeled before insert; the given type is kept
+    assert {c["document_id"]: c["contract_type"] for c in inserted} == {"a.pdf": "Services Agreement", "given": "Lease"}
+    # Only the given and keyword labels are used to rebuild the centroids
+    assert {c["document_id"]: c["contract_type_source"] for c in inserted} == {"a.pdf": "centroid", "given": "given"}
+
+
+def test_pdf_document_id_is_the_path_relative_to_the_data_folder(monkeypatch):
+    import os
+
+    pl = _import_pipeline(monkeypatch)
+    root = os.path.join("data", "RAG_DATA")
+    assert pl.pdf_document_id(os.path.join(root, "nda.pdf"), root) == "nda.pdf"
+    assert pl.pdf_document_id(os.path.join(root, "acme", "nda.pdf"), root) == "acme/nda.pdf"
+
+
+def test_contract_documents_rejects_contracts_without_document_id(monkeypatch):
+    pl = _import_pipeline(monkeypatch)
+    # Both would get the chunk ids of one shared document_id and overwrite each other
+    contracts = [{"text": DOCS[0]["text"]}, {"text": DOCS[1]["text"], "document_id": ""}]
+    with pytest.raises(ValueError, match="indexes 0, 1"):
+        pl.contract_documents(contracts)
+
+    docs = pl.contract_documents([{"text": DOCS[0]["text"], "document_id": "c1", "contract_type": "Lease"}, {"text": ""}])
+    assert docs == [{"text": DOCS[0]["text"], "document_id": "c1", "contract_type": "Lease"}]
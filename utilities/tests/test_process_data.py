@@ -0,0 +1,40 @@
+import sys
+import json
+import types
+import importlib
+
+
+def _import_process_data(monkeypatch):
+    # process_data pulls in pdfium, sentence-transformers and weaviate at import time
+    monkeypatch.setitem(sys.modules, "pypdfium2", types.SimpleNamespace(PdfDocument=None))
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=None))
+    fake_config = types.SimpleNamespace(Property=None, DataType=None, Configure=None, Tokenization=None)
+    monkeypatch.setitem(sys.modules, "weaviate", types.SimpleNamespace(connect_to_local=None))
+    monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
+    monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+
+    for name in ["utilities.pdf_loader", "utilities.pipeline", "utilities.embedder",
+                 "utilities.weaviate_manager", "utilities.process_data"]:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module("utilities.process_data")
+
+
+def test_resolve_workers(monkeypatch):
+    pd = _import_process_data(monkeypatch)
+    assert pd.resolve_workers(3) == 3
+    assert pd.resolve_workers(0) >= 1
+
+
+def test_prune_jsonl_keeps_only_unchanged_documents(monkeypatch, tmp_path):
+    pd = _import_process_data(monkeypatch)
+    path = tmp_path / "chunks.jsonl"
+    lines = [json.dumps({"document_id": d, "text": t}) for d, t in [("a.pdf", "x"), ("b.pdf", "y"), ("a.pdf", "z")]]
+    path.write_text("\n".join(lines) + "\nnot json\n")
+
+    pd.prune_jsonl(str(path), {"a.pdf"})
+    kept = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [k["text"] for k in kept] == ["x", "z"]
+
+    missing = tmp_path / "new.jsonl"
+    pd.prune_jsonl(str(missing), set())
+    assert missing.read_text() == ""
@@ -0,0 +1,17 @@
+from benchmarks.synthetic_corpus import generate_corpus
+
+
+def test_generate_corpus_is_deterministic_and_covers_styles():
+    first = list(generate_corpus(8, seed=1, long_pages=5, long_every=4))
+    second = list(generate_corpus(8, seed=1, long_pages=5, long_every=4))
+    assert first == second
+    assert len(first) == 8
+
+    texts = [d["text"] for d in first]
+    assert any("ARTICLE 1" in t for t in texts)
+    assert any("(a) " in t for t in texts)
+    assert any("Page 5 of 5" in t for t in texts)
+
+    for doc in first:
+        assert doc["path"].endswith(".pdf")
+        assert all(0 <= s <= e <= len(doc["text"]) for s, e in doc["pages"])
@@ -1,4 +1,8 @@
-from text_cleaner import clean_contract_text
+import random
+
+import pytest
+
+from text_cleaner import clean_contract_text, clean_pages, StreamingCleaner
 
 
 def test_clean_contract_text_empty():
@@ -24,3 +28,47 @@ def test_clean_contract_text_ligatures_headers_bullets():
     assert "-  Bullet one" in cleaned or "- Bullet one" in cleaned
 
 
+PIECES = ["Page 1 of 10", "page 2", "PAGE 3", "Page\n4", "of 5", "\n", "\n\n\n", " ", "   ", "\t", "\xa0",
+          "\u2022", "\u25E6", "\ufb01", "\u00e6", "The tenant", "1. Definitions", "\r", "12", " \n ", ""]
+
+
+def _reference_clean(text):
+    # The original multi-pass implementation
+    import re
+    if not text:
+        return ""
+    for search, replace in {"\ufb01": "fi", "\ufb02": "fl", "\u00e6": "ae"}.items():
+        text = text.replace(search, replace)
+    text = text.replace("\xa0", " ")
+    text = re.sub(r"(?i)^\s*Page\s+\d+\s+of\s+\d+\s*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"(?i)^\s*Page\s+\d+\s*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"[\u2022\u2023\u25E6\u2043\u2219]", "- ", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fused_cleaner_matches_multi_pass_reference(seed):
+    rng = random.Random(seed)
+    text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 30)))
+    assert clean_contract_text(text) == _reference_clean(text)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_clean_pages_matches_cleaning_the_joined_document(seed):
+    rng = random.Random(seed)
+    pages = ["".join(rng.choice(PIECES) for _ in range(rng.randint(0, 12))) for _ in range(rng.randint(0, 6))]
+    text, spans = clean_pages(pages)
+    assert text == clean_contract_text("".join(p + "\n" for p in pages if p))
+    assert len(spans) == len(pages)
+    assert all(0 <= s <= e <= len(text) for s, e in spans)
+    assert all(spans[i][1] <= spans[i + 1][0] for i in range(len(spans) - 1))
+
+
+def test_streaming_cleaner_emits_finished_text_before_close():
+    cleaner = StreamingCleaner()
+    first = cleaner.feed("1. Definitions\nThe   tenant pays.\nPage 1 of 2")
+    assert first == "1. Definitions\nThe tenant pays."
+    rest = cleaner.feed("Page 2 of 2") + cleaner.close()
+    assert rest == ""
@@ -1,8 +1,9 @@
+import re
 import sys
 import types
 
 
-def test_initialize_schema_and_batch_insert_chunks_with_mocked_weaviate(monkeypatch):
+def test_initialize_schema_and_batch_insert_chunks_with_mocked_weaviate(monkeypatch, tmp_path):
     # Minimal fake weaviate + config types used by weaviate_manager
     class FakeCollections:
         def __init__(self, exists=False):
@@ -17,59 +18,53 @@ def test_initialize_schema_and_batch_insert_chunks_with_mocked_weaviate(monkeypa
         def get(self, name):
             return FakeCollection()
 
-    class FakeBatch:
-        def __init__(self, failed=None):
-            self.failed_objects = failed or []
-
     class FakeClient:
-        def __init__(self, exists=False, failed=None):
+        def __init__(self, exists=False):
             self.collections = FakeCollections(exists=exists)
-            self.batch = FakeBatch(failed=failed)
 
         def close(self):
             pass
 
-    class FakeDynamicBatchCtx:
-        def __enter__(self):
-            return self
-
-        def __exit__(self, exc_type, exc, tb):
-            return False
-
-        def add_object(self, properties=None, vector=None):
-            return None
-
     class FakeCollection:
-        class batch:
+        class data:
             @staticmethod
-            def dynamic():
-                return FakeDynamicBatchCtx()
+            def insert_many(objects):
+                return types.SimpleNamespace(errors={})
 
     fake_weaviate = types.SimpleNamespace(connect_to_local=lambda **kwargs: FakeClient())
     fake_config = types.SimpleNamespace(
         Property=lambda **kwargs: kwargs,
         DataType=types.SimpleNamespace(TEXT="text", INT="int"),
         Configure=types.SimpleNamespace(Vectorizer=types.SimpleNamespace(none=lambda: None)),
+        Tokenization=types.SimpleNamespace(FIELD="field"),
     )
 
     # Provide nested import paths: weaviate.classes.config
     monkeypatch.setitem(sys.modules, "weaviate", fake_weaviate)
     monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
     monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+    monkeypatch.setitem(sys.modules, "weaviate.classes.data", types.SimpleNamespace(DataObject=lambda **kwargs: kwargs))
 
     import importlib
 
     wm = importlib.import_module("weaviate_manager")
     importlib.reload(wm)
+    wm.get_inserter(dead_letter_path=str(tmp_path / "dead.jsonl"))
 
     wm.initialize_schema()
-    wm.batch_insert_chunks([{"text": "x", "document_id": "d", "chunk_level": 1, "vector": [0.1]}])
+    assert wm.batch_insert_chunks([{"text": "x", "document_id": "d", "chunk_level": 1, "vector": [0.1]}])
 
 
-def test_batch_insert_chunks_skips_missing_vector_and_reports_failed_objects(monkeypatch):
+def test_batch_insert_chunks_skips_missing_vector_and_dead_letters_failed_objects(monkeypatch, tmp_path):
     import sys
+    import json
     import types
     import importlib
+    import numpy as np
+
+    vectors = np.arange(6, dtype=np.float32).reshape(3, 2)
+
+    requests = []
 
     class FakeCollections:
         def exists(self, name):
@@ -78,50 +73,273 @@ def test_batch_insert_chunks_skips_missing_vector_and_reports_failed_objects(mon
         def get(self, name):
             return FakeCollection()
 
-    class FakeBatch:
-        def __init__(self):
-            self.failed_objects = ["fail1"]
-
     class FakeClient:
         def __init__(self):
             self.collections = FakeCollections()
-            self.batch = FakeBatch()
 
         def close(self):
             pass
 
-    class FakeDynamicBatchCtx:
-        def __enter__(self):
-            return self
-
-        def __exit__(self, exc_type, exc, tb):
-            return False
-
-        def add_object(self, properties=None, vector=None):
-            return None
-
     class FakeCollection:
-        class batch:
+        class data:
             @staticmethod
-            def dynamic():
-                return FakeDynamicBatchCtx()
+            def insert_many(objects):
+                requests.append(objects)
+                # The object with text "bad" is rejected by the server every time
+                errors = {i: types.SimpleNamespace(message="invalid object") for i, obj in enumerate(objects)
+                          if obj["properties"]["text"] == "bad"}
+                return types.SimpleNamespace(errors=errors)
 
     fake_weaviate = types.SimpleNamespace(connect_to_local=lambda **kwargs: FakeClient())
     fake_config = types.SimpleNamespace(
         Property=lambda **kwargs: kwargs,
         DataType=types.SimpleNamespace(TEXT="text", INT="int"),
         Configure=types.SimpleNamespace(Vectorizer=types.SimpleNamespace(none=lambda: None)),
+        Tokenization=types.SimpleNamespace(FIELD="field"),
     )
     monkeypatch.setitem(sys.modules, "weaviate", fake_weaviate)
     monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
     monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+    monkeypatch.setitem(sys.modules, "weaviate.classes.data", types.SimpleNamespace(DataObject=lambda **kwargs: kwargs))
 
     wm = importlib.import_module("weaviate_manager")
     importlib.reload(wm)
+    dead_letter = tmp_path / "dead.jsonl"
+    wm.get_inserter(dead_letter_path=str(dead_letter), max_retries=2, sleep=lambda seconds: None)
 
-    wm.batch_insert_chunks([
+    assert not wm.batch_insert_chunks([
         {"text": "skip", "document_id": "d", "chunk_level": 1},  # no vector
         {"text": "ok", "document_id": "d2", "chunk_level": 1, "vector": [0.1]},
+        {"text": "empty", "document_id": "d3", "chunk_level": 1, "vector": np.zeros(0, dtype=np.float32)},
+        {"text": "row", "document_id": "d4", "chunk_level": 1, "vector": vectors[1]},
     ])
+    # numpy rows go to the client as they are (no list conversion)
+    assert [obj["properties"]["text"] for obj in requests[0]] == ["ok", "row"]
+    row = requests[0][1]["vector"]
+    assert isinstance(row, np.ndarray) and np.shares_memory(row, vectors)
+
+    assert wm.batch_insert_chunks([{"text": "good", "document_id": "d5", "chunk_level": 1, "vector": [0.2]},
+                                   {"text": "bad", "document_id": "d5", "chunk_level": 1, "vector": vectors[2]}]) is False
+    # Only the failed object is retried, then written to the dead-letter file
+    assert [[obj["properties"]["text"] for obj in request] for request in requests[1:]] == [["good", "bad"], ["bad"], ["bad"]]
+    records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert [(r["properties"]["document_id"], r["vector"], r["error"], r["attempts"]) for r in records] == [
+        ("d5", [4.0, 5.0], "invalid object", 3)
+    ]
+    assert wm.get_inserter().report()["dead_lettered"] == 1
+
+
+def test_delete_document_chunks_deletes_exact_document_ids_only(monkeypatch):
+    doc = lambda document_id: {"document_id": document_id, "text": "t", "chunk_level": 1}
+    store = _FakeStore({"1": doc("a.pdf"), "2": doc("a.pdf"), "3": doc("b.pdf"), "4": doc("a_amendment.pdf")})
+    wm = _import_with_store(monkeypatch, store)
+
+    assert wm.delete_document_chunks([]) == 0
+    # "a.pdf" matches the tokens of "a_amendment.pdf" too
+    assert wm.delete_document_chunks(["a.pdf", "c.pdf"]) == 2
+    assert sorted(store.objects) == ["3", "4"]
+
+
+def test_iter_labeled_vectors_streams_types_and_vectors(monkeypatch):
+    import sys
+    import types
+    import importlib
+
+    objects = [
+        types.SimpleNamespace(properties={"contract_type": "Lease", "contract_type_source": "keyword"}, vector=[0.1, 0.2]),
+        types.SimpleNamespace(properties={}, vector={"default": [0.3, 0.4]}),
+        types.SimpleNamespace(properties={"contract_type": "NDA", "contract_type_source": "centroid"}, vector=[0.5, 0.6]),
+    ]
+    closed = []
+
+    class FakeCollection:
+        def iterator(self, include_vector=False, return_properties=None):
+            assert include_vector and return_properties == ["contract_type", "contract_type_source"]
+            return iter(objects)
+
+    class FakeClient:
+        def __init__(self):
+            self.collections = types.SimpleNamespace(get=lambda name: FakeCollection())
+
+        def close(self):
+            closed.append(True)
+
+    fake_weaviate = types.SimpleNamespace(connect_to_local=lambda **kwargs: FakeClient())
+    fake_config = types.SimpleNamespace(
+        Property=lambda **kwargs: kwargs,
+        DataType=types.SimpleNamespace(TEXT="text", INT="int"),
+        Configure=types.SimpleNamespace(Vectorizer=types.SimpleNamespace(none=lambda: None)),
+        Tokenization=types.SimpleNamespace(FIELD="field"),
+    )
+    monkeypatch.setitem(sys.modules, "weaviate", fake_weaviate)
+    monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
+    monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+
+    wm = importlib.import_module("weaviate_manager")
+    importlib.reload(wm)
+
+    assert list(wm.iter_labeled_vectors()) == [("Lease", [0.1, 0.2]), ("", [0.3, 0.4]), ("NDA", [0.5, 0.6])]
+    # Centroid labels never train the centroids; chunks without a source are left out too
+    assert list(wm.iter_labeled_vectors(["given", "keyword"])) == [("Lease", [0.1, 0.2])]
+    assert closed == [True, True]
+
+
+def test_pooled_connections_use_the_configured_endpoint(monkeypatch):
+    import sys
+    import types
+    import importlib
 
+    connects = []
 
+    class FakeClient:
+        def __init__(self, **kwargs):
+            connects.append(kwargs)
+            properties = [types.SimpleNamespace(name="contract_type_source")]
+            config = types.SimpleNamespace(get=lambda: types.SimpleNamespace(properties=properties))
+            self.collections = types.SimpleNamespace(exists=lambda name: True,
+                                                     get=lambda name: types.SimpleNamespace(config=config))
+
+        def close(self):
+            pass
+
+    fake_config = types.SimpleNamespace(
+        Property=lambda **kwargs: kwargs,
+        DataType=types.SimpleNamespace(TEXT="text", INT="int"),
+        Configure=types.SimpleNamespace(Vectorizer=types.SimpleNamespace(none=lambda: None)),
+        Tokenization=types.SimpleNamespace(FIELD="field"),
+    )
+    monkeypatch.setitem(sys.modules, "weaviate", types.SimpleNamespace(connect_to_local=lambda **kwargs: FakeClient(**kwargs)))
+    monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
+    monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+    monkeypatch.setenv("WEAVIATE_HOST", "weaviate.internal")
+    monkeypatch.setenv("WEAVIATE_HTTP_PORT", "9090")
+    monkeypatch.setenv("WEAVIATE_GRPC_PORT", "50099")
+
+    wm = importlib.reload(importlib.import_module("weaviate_manager"))
+    wm.initialize_schema()
+    wm.initialize_schema()
+
+    # One long-lived connection, reused by the second call
+    assert connects == [{"host": "weaviate.internal", "port": 9090, "grpc_port": 50099}]
+
+
+class _FakeIdFilter:
+    @staticmethod
+    def by_property(name):
+        return types.SimpleNamespace(equal=lambda value: (name, value))
+
+    @staticmethod
+    def by_id():
+        return types.SimpleNamespace(contains_any=lambda ids: ("id", list(ids)))
+
+
+class _FakeStore:
+    """A ContractChunk collection: { uuid: properties }."""
+
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.closed = 0
+        store = self
+
+        class Data:
+            @staticmethod
+            def delete_many(where=None):
+                _, ids = where
+                hits = [i for i in ids if i in store.objects]
+                for i in hits:
+                    del store.objects[i]
+                return types.SimpleNamespace(successful=len(hits))
+
+        class Query:
+            @staticmethod
+            def fetch_objects(filters=None, limit=None, offset=0, return_properties=None):
+                name, value = filters
+                # WORD tokenization: every token of the value appears in the property
+                tokens = lambda text: set(re.findall(r"[A-Za-z0-9]+", text.lower()))
+                matches = [types.SimpleNamespace(uuid=u, properties=p) for u, p in sorted(store.objects.items())
+                           if tokens(value) <= tokens(p[name])]
+                return types.SimpleNamespace(objects=matches[offset:offset + limit])
+
+        self.collection = types.SimpleNamespace(
+            data=Data(), query=Query(),
+            iterator=lambda return_properties=None: iter(
+                [types.SimpleNamespace(uuid=u, properties=p) for u, p in sorted(store.objects.items())]),
+        )
+
+    def client(self, **kwargs):
+        store = self
+
+        class FakeClient:
+            collections = types.SimpleNamespace(get=lambda name: store.collection)
+
+            def close(self):
+                store.closed += 1
+
+        return FakeClient()
+
+
+def _import_with_store(monkeypatch, store):
+    import importlib
+
+    fake_config = types.SimpleNamespace(
+        Property=lambda **kwargs: kwargs,
+        DataType=types.SimpleNamespace(TEXT="text", INT="int"),
+        Configure=types.SimpleNamespace(Vectorizer=types.SimpleNamespace(none=lambda: None)),
+        Tokenization=types.SimpleNamespace(FIELD="field"),
+    )
+    monkeypatch.setitem(sys.modules, "weaviate", types.SimpleNamespace(connect_to_local=store.client))
+    monkeypatch.setitem(sys.modules, "weaviate.classes", types.SimpleNamespace(config=fake_config))
+    monkeypatch.setitem(sys.modules, "weaviate.classes.config", fake_config)
+    monkeypatch.setitem(sys.modules, "weaviate.classes.query", types.SimpleNamespace(Filter=_FakeIdFilter))
+    return importlib.reload(importlib.import_module("weaviate_manager"))
+
+
+def test_replace_batch_documents_deletes_only_stale_chunks_of_the_batch_documents(monkeypatch):
+    doc = lambda document_id: {"document_id": document_id, "text": "t", "chunk_level": 1}
+    store = _FakeStore({"a-new": doc("a"), "a-old": doc("a"), "a-dup": doc("a"), "b-old": doc("b"), "c": doc("c"),
+                        "a-amendment": doc("a_amendment")})
+    wm = _import_with_store(monkeypatch, store)
+    monkeypatch.setattr(wm, "STALE_SCAN_PAGE", 2)  # the ids of a document span several pages
+
+    batch = {
+        "chunks": [{"document_id": "a", "uuid": "a-new"}],
+        # b's chunks were all dropped: its old ones go too
+        "documents": [{"document_id": "a"}, {"document_id": "b"}],
+        "inserted": False,
+    }
+    assert wm.replace_batch_documents(batch) == 0  # not inserted: the previous chunks stay
+    assert len(store.objects) == 6
+
+    batch["inserted"] = True
+    assert wm.replace_batch_documents(batch) == 3
+    # "a" matches the tokens of "a_amendment" too: only exact ids are stale
+    assert sorted(store.objects) == ["a-amendment", "a-new", "c"]
+
+
+def test_compact_duplicates_keeps_one_copy_per_chunk(monkeypatch):
+    chunk = lambda document_id, text, level=1: {"document_id": document_id, "chunk_level": level, "section": "S",
+                                                 "clause_number": "1", "text": text}
+    store = _FakeStore({
+        "1": chunk("a", "x"), "2": chunk("a", "x"), "3": chunk("a", "x"),
+        "4": chunk("a", "x", level=2), "5": chunk("b", "x"), "6": chunk("a", "y"),
+    })
+    wm = _import_with_store(monkeypatch, store)
+
+    assert wm.compact_duplicates(dry_run=True) == {"scanned": 6, "duplicates": 2, "deleted": 0}
+    assert len(store.objects) == 6
+    assert wm.compact_duplicates() == {"scanned": 6, "duplicates": 2, "deleted": 2}
+    assert sorted(store.objects) == ["1", "4", "5", "6"]
+    assert store.closed == 2
+
+
+def test_compact_duplicates_keeps_the_deterministic_id(monkeypatch):
+    chunk = lambda text: {"document_id": "a", "chunk_level": 1, "section": "S", "clause_number": "1", "text": text}
+    store = _FakeStore({"0-random": chunk("x"), "1-random": chunk("y")})
+    wm = _import_with_store(monkeypatch, store)
+    # Re-ingested since: position 1 holds "x" under its chunk_uuid, scanned after the random copy
+    current = wm.chunk_uuid("a", 1, 1)
+    assert current > "0-random"
+    store.objects[current] = chunk("x")
+
+    assert wm.compact_duplicates() == {"scanned": 3, "duplicates": 1, "deleted": 1}
+    assert sorted(store.objects) == sorted(["1-random", current])
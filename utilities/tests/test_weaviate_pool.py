@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from weaviate_pool import ClientPool
+
+
+class FakeClient:
+    def __init__(self, ready=True):
+        self.ready = ready
+        self.closed = False
+
+    def is_ready(self):
+        if self.ready is None:
+            raise ConnectionError("down")
+        return self.ready
+
+    def close(self):
+        self.closed = True
+
+
+def test_connections_are_reused_and_bounded_by_size():
+    created = []
+    pool = ClientPool(lambda: created.append(FakeClient()) or created[-1], size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as again:
+        assert again is first
+
+    in_use = []
+    barrier = threading.Barrier(2)
+
+    def use():
+        with pool.connection() as client:
+            in_use.append(client)
+            barrier.wait(1)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 2  # the other callers waited for a free client
+    assert pool.report()["connects"] == 2 and pool.report()["idle"] == 2
+
+
+def test_idle_client_is_health_checked_and_replaced_when_down():
+    created = []
+    pool = ClientPool(lambda: created.append(FakeClient()) or created[-1], size=1, health_interval=0.0)
+
+    with pool.connection() as client:
+        pass
+    client.ready = None  # server went away
+    time.sleep(0.01)
+    with pool.connection() as replacement:
+        assert replacement is not client
+    assert client.closed
+    assert pool.stats == {"connects": 2, "reconnects": 1, "health_checks": 1}
+
+
+def test_client_in_use_during_an_error_is_checked_before_reuse():
+    created = []
+    pool = ClientPool(lambda: created.append(FakeClient()) or created[-1], size=1, health_interval=3600)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as client:
+            raise RuntimeError("query failed")
+    with pool.connection() as same:
+        assert same is client  # still healthy: kept
+    assert pool.stats["health_checks"] == 1 and pool.stats["reconnects"] == 0
+
+
+def test_close_closes_idle_clients_and_refuses_new_callers():
+    pool = ClientPool(FakeClient, size=2)
+    with pool.connection() as client:
+        pass
+    pool.close()
+    assert client.closed
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass
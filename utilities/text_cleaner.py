@@ -1,5 +1,44 @@
 import re
+from typing import Iterable, List, Tuple
 
+from utilities.metrics import timed
+
+# 1./2./4. Ligatures, non-breaking spaces and bullets are single characters,
+# so one translation table covers all of them. It is applied by a regex over
+# just those characters: they are rare, and str.translate with multi-character
+# replacements would look up every character of the document.
+LIGATURES = {
+    'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬀ': 'ff', 'ﬃ': 'ffi', 'ﬄ': 'ffl',
+    'ﬅ': 'ft', 'ﬆ': 'st', 'Ꜳ': 'AA', 'Æ': 'AE', 'ꜳ': 'aa', 'æ': 'ae',
+    'Œ': 'OE', 'œ': 'oe'
+}
+BULLETS = '\u2022\u2023\u25E6\u2043\u2219'
+
+TRANSLATION = str.maketrans({
+    **LIGATURES,
+    '\xa0': ' ',
+    **{bullet: '- ' for bullet in BULLETS},
+})
+_SPECIAL_CHARS_RE = re.compile('[' + ''.join(chr(c) for c in TRANSLATION) + ']')
+
+def normalize_characters(text: str) -> str:
+    """
+    Applies TRANSLATION (ligatures, NBSP, bullets) in one pass.
+    """
+    return _SPECIAL_CHARS_RE.sub(lambda m: TRANSLATION[ord(m.group())], text)
+
+# 3. Headers/footers like "Page 7 of 32" or "Page 7" on a line of their own
+HEADER_RE = re.compile(r'(?im)^\s*Page\s+\d+(?:\s+of\s+\d+)?\s*$')
+
+# 5. Runs of spaces/tabs -> one space (single spaces are left alone)
+SPACES_RE = re.compile(r'[ \t]{2,}|\t')
+# 6. 3+ newlines -> one empty line
+NEWLINES_RE = re.compile(r'\n{3,}')
+
+def _collapse_whitespace(text: str) -> str:
+    return NEWLINES_RE.sub('\n\n', SPACES_RE.sub(' ', text))
+
+@timed("clean", nbytes=lambda result, text, *a, **k: len(text or ""))
 def clean_contract_text(text: str) -> str:
     """
     Cleans and normalizes contract text by handling ligatures, headers/footers,
@@ -14,38 +53,101 @@ def clean_contract_text(text: str) -> str:
     if not text:
         return ""
 
-    # 1. Expand ligatures
-    ligatures = {
-        'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬀ': 'ff', 'ﬃ': 'ffi', 'ﬄ': 'ffl',
-        'ﬅ': 'ft', 'ﬆ': 'st', 'Ꜳ': 'AA', 'Æ': 'AE', 'ꜳ': 'aa', 'æ': 'ae',
-        'Œ': 'OE', 'œ': 'oe'
-    }
-    for search, replace in ligatures.items():
-        text = text.replace(search, replace)
-
-    # 2. Normalize whitespace characters (turns non-breaking spaces into normal spaces)
-    text = text.replace(u'\xa0', u' ')
-
-    # 3. Remove headers/footers like "Page 7 of 32" or "Page 7" at the start/end of lines
-    # Case insensitive, matching "Page X of Y" or just "Page X" if it's on a standalone line
-    text = re.sub(r'(?i)^\s*Page\s+\d+\s+of\s+\d+\s*$', '', text, flags=re.MULTILINE)
-    text = re.sub(r'(?i)^\s*Page\s+\d+\s*$', '', text, flags=re.MULTILINE)
-
-    # 4. Normalize bullets
-    # Replace various bullet characters with a standard hyphen
-    text = re.sub(r'[\u2022\u2023\u25E6\u2043\u2219]', '- ', text)
-    
-    # 5. Remove multiple horizontal spaces (but preserve newlines)
-    # [ \t]+ matches one or more spaces or tabs, excludes \n
-    text = re.sub(r'[ \t]+', ' ', text)
-
-    # 6. Remove excessive newlines
-    # Collapse 3 or more newlines into 2 (one empty line between paragraphs)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = normalize_characters(text)
+    text = HEADER_RE.sub('', text)
+    text = _collapse_whitespace(text)
     
     # Trim leading/trailing whitespace
     return text.strip()
 
+# A character that can't be part of a page header/footer ("Page", "of", digits, whitespace)
+_CONTENT_CHAR_RE = re.compile(r'[^\s\dPpAaGgEeOoFf]')
+
+class StreamingCleaner:
+    """
+    clean_contract_text for a document that arrives page by page, so the raw
+    text of the whole document never has to be assembled. The concatenated
+    output of feed() and close() equals clean_contract_text of the pages
+    joined with "\n" after each page.
+
+    Text is only cleaned up to a point no header match or whitespace run can
+    cross: header removal runs up to the end of the last line with content
+    that can't belong to a header, and whitespace collapsing up to the last
+    non-whitespace character. The rest is carried over to the next page.
+    """
+
+    def __init__(self):
+        self._pending = ""   # translated, headers not yet removed
+        self._unspaced = ""  # headers removed, whitespace not yet collapsed
+        self._started = False
+        self.length = 0      # characters emitted so far
+
+    def feed(self, page_text: str) -> str:
+        """
+        Adds one page and returns the cleaned text that is now final.
+        """
+        self._pending += normalize_characters(page_text) + "\n"
+
+        # Cut after the newline that ends the last content line
+        end = self._pending.rfind("\n")
+        cut = 0
+        while end > 0:
+            start = self._pending.rfind("\n", 0, end) + 1
+            if _CONTENT_CHAR_RE.search(self._pending, start, end):
+                cut = end + 1
+                break
+            end = start - 1
+        if not cut:
+            return ""
+
+        self._unspaced += HEADER_RE.sub('', self._pending[:cut])
+        self._pending = self._pending[cut:]
+
+        keep = len(self._unspaced.rstrip())
+        return self._emit(self._unspaced[:keep], self._unspaced[keep:])
+
+    def close(self) -> str:
+        """
+        Cleans whatever is still carried over (end of the document).
+        """
+        self._unspaced += HEADER_RE.sub('', self._pending)
+        self._pending = ""
+        return self._emit(self._unspaced.rstrip(), "")
+
+    def _emit(self, ready: str, carry: str) -> str:
+        self._unspaced = carry
+        cleaned = _collapse_whitespace(ready)
+        if not self._started:
+            cleaned = cleaned.lstrip()
+            self._started = bool(cleaned)
+        self.length += len(cleaned)
+        return cleaned
+
+def clean_pages(page_texts: Iterable[str]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Cleans a document page by page (see StreamingCleaner).
+
+    Returns:
+        The cleaned text and each page's (start, end) span inside it. A page
+        starts where the previous one's cleaned output ended; pages without
+        text get an empty span.
+    """
+    cleaner = StreamingCleaner()
+    parts = []
+    pages = []
+    last = None  # the last page with text also gets what close() flushes
+    for page_text in page_texts:
+        start = cleaner.length
+        if page_text:
+            parts.append(cleaner.feed(page_text))
+            last = len(pages)
+        pages.append((start, cleaner.length))
+    parts.append(cleaner.close())
+    if last is not None:
+        pages[last] = (pages[last][0], cleaner.length)
+        pages[last + 1:] = [(cleaner.length, cleaner.length)] * (len(pages) - last - 1)
+    return "".join(parts), pages
+
 if __name__ == "__main__":  # pragma: no cover
     # Test cases
     raw_sample = """
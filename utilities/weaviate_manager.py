@@ -1,89 +1,333 @@
 import weaviate
-from weaviate.classes.config import Property, DataType, Configure
-from typing import List, Dict, Any
+from weaviate.classes.config import Property, DataType, Configure, Tokenization
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
 import os
+import atexit
+import hashlib
+import argparse
+import threading
+from concurrent.futures import Future
+
+from utilities.metrics import current, timed
+from utilities.weaviate_pool import ClientPool
+from utilities.batch_inserter import BatchInserter
+from utilities.chunker import chunk_uuid
+
+# Weaviate endpoint (docker-compose.yml maps HTTP 8081 and gRPC 50052)
+WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "localhost")
+WEAVIATE_HTTP_PORT = int(os.getenv("WEAVIATE_HTTP_PORT", "8081"))
+WEAVIATE_GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50052"))
 
 def get_client():
-    # Connect to local Weaviate
-    # User specified http://localhost:8080
+    """
+    A new connection to Weaviate; the caller closes it. Short operations
+    should use a pooled one instead (client_pool().connection()).
+    """
     return weaviate.connect_to_local(
-        port=8081,
-        grpc_port=50052
+        host=WEAVIATE_HOST,
+        port=WEAVIATE_HTTP_PORT,
+        grpc_port=WEAVIATE_GRPC_PORT
     )
 
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+def client_pool() -> ClientPool:
+    """
+    The process-wide pool of long-lived Weaviate clients (closed at exit).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool(get_client)
+            atexit.register(_pool.close)
+        return _pool
+
 def initialize_schema():
     """
     Ensures the 'ContractChunk' class exists with the correct properties.
     """
-    client = get_client()
     try:
-        class_name = "ContractChunk"
-        
-        # Check if class exists
-        if not client.collections.exists(class_name):
-            print(f"Creating class {class_name}...")
-            client.collections.create(
-                name=class_name,
-                properties=[
-                    Property(name="text", data_type=DataType.TEXT),
-                    Property(name="document_id", data_type=DataType.TEXT),
-                    Property(name="section", data_type=DataType.TEXT),
-                    Property(name="clause_number", data_type=DataType.TEXT),
-                    Property(name="chunk_level", data_type=DataType.INT), # 1, 2, or 3
-                    Property(name="contract_type", data_type=DataType.TEXT),
-                ],
-                # We are bringing our own vectors, so we might not need to configure a vectorizer 
-                # strictly if we use the underlying client to insert vectors directly.
-                # But explicitly setting it to none is good practice if we provide vectors.
-                vectorizer_config=Configure.Vectorizer.none() 
-            )
-            print(f"Class {class_name} created.")
-        else:
-            print(f"Class {class_name} already exists.")
+        with client_pool().connection() as client:
+            class_name = "ContractChunk"
+
+            # Check if class exists
+            if not client.collections.exists(class_name):
+                print(f"Creating class {class_name}...")
+                client.collections.create(
+                    name=class_name,
+                    properties=[
+                        Property(name="text", data_type=DataType.TEXT),
+                        # FIELD tokenization so document_id filters match whole ids only
+                        Property(name="document_id", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                        Property(name="section", data_type=DataType.TEXT),
+                        Property(name="clause_number", data_type=DataType.TEXT),
+                        Property(name="chunk_level", data_type=DataType.INT), # 1, 2, or 3
+                        Property(name="contract_type", data_type=DataType.TEXT),
+                        # "given", "keyword" or "centroid": only the first two build centroids
+                        Property(name="contract_type_source", data_type=DataType.TEXT),
+                    ],
+                    # We are bringing our own vectors, so we might not need to configure a vectorizer 
+                    # strictly if we use the underlying client to insert vectors directly.
+                    # But explicitly setting it to none is good practice if we provide vectors.
+                    vectorizer_config=Configure.Vectorizer.none() 
+                )
+                print(f"Class {class_name} created.")
+            else:
+                print(f"Class {class_name} already exists.")
+                collection = client.collections.get(class_name)
+                if "contract_type_source" not in {p.name for p in collection.config.get().properties}:
+                    collection.config.add_property(Property(name="contract_type_source", data_type=DataType.TEXT))
             
     except Exception as e:
         print(f"Error initializing schema: {e}")
+
+def chunk_object(chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The Weaviate object of a chunk ({ properties, vector, uuid }), or None if
+    the chunk has no vector.
+    """
+    vector = chunk.get("vector")
+    if vector is None or len(vector) == 0:
+        print(f"Skipping chunk without vector: {chunk.get('document_id')}")
+        return None
+    return {
+        "properties": {
+            "text": chunk["text"],
+            "document_id": chunk["document_id"],
+            "section": chunk.get("section", ""),
+            "clause_number": chunk.get("clause_number", ""),
+            "chunk_level": chunk["chunk_level"],
+            "contract_type": chunk.get("contract_type", "Unknown"),
+            "contract_type_source": chunk.get("contract_type_source") or "",
+        },
+        "vector": vector,
+        "uuid": chunk.get("uuid"),
+    }
+
+def insert_objects(objects: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Inserts objects in one request (gRPC batch) on a pooled connection.
+    Returns { index: error message } of the objects that failed.
+    """
+    from weaviate.classes.data import DataObject
+
+    with client_pool().connection() as client:
+        collection = client.collections.get("ContractChunk")
+        # numpy rows are passed as is: the client packs them into
+        # float32 bytes for gRPC, without a list of Python floats
+        result = collection.data.insert_many([
+            DataObject(properties=obj["properties"], vector=obj["vector"], uuid=obj.get("uuid"))
+            for obj in objects
+        ])
+    return {index: getattr(error, "message", str(error)) for index, error in result.errors.items()}
+
+_inserter: Optional[BatchInserter] = None
+_inserter_lock = threading.Lock()
+
+def get_inserter(**kwargs) -> BatchInserter:
+    """
+    The process-wide BatchInserter for chunks (see batch_inserter.py); its
+    settings (batch_size, concurrency, ...) are taken from the first call.
+    """
+    global _inserter
+    with _inserter_lock:
+        if _inserter is None:
+            _inserter = BatchInserter(insert_objects, to_object=chunk_object, **kwargs)
+            atexit.register(_inserter.close)
+        return _inserter
+
+def submit_chunks(chunks: List[Dict[str, Any]]) -> "Future[bool]":
+    """
+    Queues chunks for background insertion (blocks while the inserter is
+    backed up). The Future is True once every chunk is inserted.
+    """
+    return get_inserter().submit(chunks)
+
+@timed("insert", items=lambda result, chunks, *a, **k: len(chunks))
+def batch_insert_chunks(chunks: List[Dict[str, Any]]) -> bool:
+    """
+    Inserts chunks into Weaviate with their vectors and waits for them.
+    Failed objects are retried, then dead-lettered (see batch_inserter.py).
+    Returns True if every chunk was inserted.
+    """
+    inserted = submit_chunks(chunks).result()
+    if inserted:
+        print(f"Successfully inserted {len(chunks)} chunks.")
+    return inserted
+
+STALE_SCAN_PAGE = 1000  # object ids fetched per request when looking for stale chunks
+
+def _delete_ids(collection, ids: List[str]) -> int:
+    from weaviate.classes.query import Filter
+
+    deleted = 0
+    for i in range(0, len(ids), 100):
+        result = collection.data.delete_many(where=Filter.by_id().contains_any(ids[i:i + 100]))
+        deleted += result.successful
+    return deleted
+
+def _document_object_ids(collection, document_id: str) -> Iterator[str]:
+    """
+    Ids of the chunks of `document_id`. Collections created before document_id
+    had FIELD tokenization match it word by word ("contract_1.pdf" also matches
+    "contract_1_amendment.pdf"), so the filter only narrows the scan and the id
+    is compared exactly here.
+    """
+    from weaviate.classes.query import Filter
+
+    offset = 0
+    while True:
+        page = collection.query.fetch_objects(
+            filters=Filter.by_property("document_id").equal(document_id),
+            limit=STALE_SCAN_PAGE, offset=offset, return_properties=["document_id"],
+        ).objects
+        for obj in page:
+            if obj.properties.get("document_id") == document_id:
+                yield str(obj.uuid)
+        if len(page) < STALE_SCAN_PAGE:
+            return
+        offset += len(page)
+
+@timed("delete", items=lambda deleted, *a, **k: deleted)
+def delete_document_chunks(document_ids: List[str]) -> int:
+    """
+    Deletes every chunk whose document_id is in `document_ids` (exact match,
+    see _document_object_ids). Returns the number of deleted objects.
+    """
+    if not document_ids:
+        return 0
+
+    deleted = 0
+    try:
+        with client_pool().connection() as client:
+            collection = client.collections.get("ContractChunk")
+            for document_id in document_ids:
+                ids = list(_document_object_ids(collection, document_id))
+                if ids:
+                    deleted += _delete_ids(collection, ids)
+        print(f"Deleted {deleted} chunks of {len(document_ids)} documents.")
+    except Exception as e:
+        print(f"Error deleting chunks: {e}")
+
+    return deleted
+
+@timed("delete_stale", items=lambda deleted, *a, **k: deleted)
+def delete_stale_chunks(keep: Dict[str, Iterable[str]]) -> int:
+    """
+    Completes the replacement of re-ingested documents: for each document_id
+    of `keep`, deletes its chunks whose id is not in the given ids (chunks of
+    a previous version, or duplicates inserted with random ids).
+    Call it once the new chunks are inserted, so the document is never
+    missing from search while it is being replaced.
+    Returns the number of deleted objects.
+    """
+    deleted = 0
+    try:
+        with client_pool().connection() as client:
+            collection = client.collections.get("ContractChunk")
+            for document_id, ids in keep.items():
+                ids = set(ids)
+                stale = [object_id for object_id in _document_object_ids(collection, document_id) if object_id not in ids]
+                if stale:
+                    deleted += _delete_ids(collection, stale)
+        if deleted:
+            print(f"Deleted {deleted} stale chunks of {len(keep)} re-ingested documents.")
+    except Exception as e:
+        print(f"Error deleting stale chunks: {e}")
+    return deleted
+
+def replace_batch_documents(batch: Dict[str, Any]) -> int:
+    """
+    on_batch helper for ingest_documents: once a batch is inserted, drops
+    the stale chunks of its documents (see delete_stale_chunks). Batches
+    that were not fully inserted are left as they are: the chunks that were
+    inserted already overwrote their positions, so a document can mix new
+    and old chunks until it is re-ingested.
+    """
+    if not batch["inserted"]:
+        return 0
+    keep: Dict[str, Set[str]] = {doc["document_id"]: set() for doc in batch["documents"]}
+    for chunk in batch["chunks"]:
+        if chunk.get("uuid") is not None:
+            keep.setdefault(chunk["document_id"], set()).add(chunk["uuid"])
+    return delete_stale_chunks(keep)
+
+def compact_duplicates(dry_run: bool = False) -> Dict[str, int]:
+    """
+    One-off cleanup of the duplicates left by earlier ingests (random ids):
+    keeps one object per (document_id, chunk_level, section, clause_number,
+    text) and deletes the others. The position in the document is not stored,
+    so it is not part of the key. The kept copy is the one whose id is a
+    chunk_uuid of its document and level, when there is one (a later
+    re-ingest overwrites it), else the first one scanned. Uses its own
+    connection, like iter_labeled_vectors. Returns { scanned, duplicates, deleted }.
+    """
+    properties = ["document_id", "chunk_level", "section", "clause_number", "text"]
+    first: Dict[bytes, str] = {}
+    groups: Dict[bytes, Tuple[Tuple[str, Any], List[str]]] = {}  # keys seen twice: (document_id, level), ids
+    counts: Dict[Tuple[str, Any], int] = {}  # objects per (document_id, chunk_level)
+    scanned = 0
+    client = get_client()
+    try:
+        collection = client.collections.get("ContractChunk")
+        for obj in collection.iterator(return_properties=properties):
+            scanned += 1
+            doc_level = (obj.properties.get("document_id"), obj.properties.get("chunk_level"))
+            counts[doc_level] = counts.get(doc_level, 0) + 1
+            key = hashlib.sha1("\x00".join(str(obj.properties.get(name)) for name in properties).encode("utf-8")).digest()
+            if key not in first:
+                first[key] = str(obj.uuid)
+            else:
+                groups.setdefault(key, (doc_level, [first[key]]))[1].append(str(obj.uuid))
+
+        # A document's positions at a level are below its object count there
+        deterministic: Dict[Tuple[str, Any], Set[str]] = {}
+        duplicates: List[str] = []
+        for doc_level, ids in groups.values():
+            if doc_level not in deterministic:
+                document_id, level = doc_level
+                deterministic[doc_level] = {chunk_uuid(document_id, level, position)
+                                            for position in range(counts[doc_level])}
+            keep = next((i for i in ids if i in deterministic[doc_level]), ids[0])
+            duplicates.extend(i for i in ids if i != keep)
+        # Deleted after the scan: the iterator pages through the collection by id
+        deleted = 0 if dry_run else _delete_ids(collection, duplicates)
     finally:
         client.close()
+    print(f"Scanned {scanned} chunks: {len(duplicates)} duplicates"
+          + (" (dry run, nothing deleted)." if dry_run else f", {deleted} deleted."))
+    return {"scanned": scanned, "duplicates": len(duplicates), "deleted": deleted}
 
-def batch_insert_chunks(chunks: List[Dict[str, Any]]):
+def iter_labeled_vectors(sources: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, List[float]]]:
     """
-    Batches inserts chunks into Weaviate with their vectors.
+    Streams (contract_type, vector) of every chunk in the collection, or only
+    of the chunks whose contract_type_source is in `sources` (used to build
+    the contract type centroids, see centroid_classifier).
+    Uses its own connection: a long scan should not hold a pooled one.
     """
+    sources = set(sources) if sources is not None else None
     client = get_client()
-    
     try:
         collection = client.collections.get("ContractChunk")
-        
-        with collection.batch.dynamic() as batch:
-            for chunk in chunks:
-                if not chunk.get("vector"):
-                    print(f"Skipping chunk without vector: {chunk.get('document_id')}")
-                    continue
-                
-                # Prepare properties
-                properties = {
-                    "text": chunk["text"],
-                    "document_id": chunk["document_id"],
-                    "section": chunk.get("section", ""),
-                    "clause_number": chunk.get("clause_number", ""),
-                    "chunk_level": chunk["chunk_level"],
-                    "contract_type": chunk.get("contract_type", "Unknown")
-                }
-                
-                batch.add_object(
-                    properties=properties,
-                    vector=chunk["vector"] 
-                )
-                
-        if len(client.batch.failed_objects) > 0:
-            print(f"Failed to insert {len(client.batch.failed_objects)} objects.")
-            for failed in client.batch.failed_objects[:5]:
-                print(f"Error: {failed}")
-        else:
-            print(f"Successfully inserted {len(chunks)} chunks.")
-
-    except Exception as e:
-        print(f"Error inserting batches: {e}")
+        for obj in collection.iterator(include_vector=True, return_properties=["contract_type", "contract_type_source"]):
+            if sources is not None and obj.properties.get("contract_type_source") not in sources:
+                continue
+            vector = obj.vector
+            # Collections with named vectors return { name: vector }
+            if isinstance(vector, dict):
+                vector = vector.get("default") or next(iter(vector.values()), None)
+            yield obj.properties.get("contract_type") or "", vector
     finally:
         client.close()
+
+if __name__ == "__main__":  # pragma: no cover
+    # python -m utilities.weaviate_manager --compact (from the project root)
+    parser = argparse.ArgumentParser(description="Maintenance of the ContractChunk collection.")
+    parser.add_argument("--compact", action="store_true", help="Delete duplicate chunks left by earlier ingests.")
+    parser.add_argument("--dry-run", action="store_true", help="With --compact: only count the duplicates.")
+    args = parser.parse_args()
+    if args.compact:
+        compact_duplicates(dry_run=args.dry_run)
+    else:
+        parser.print_help()
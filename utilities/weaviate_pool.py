@@ -0,0 +1,110 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+# Long-lived Weaviate connections shared by every thread of a process, so a
+# /query or an insert batch does not pay for an HTTP + gRPC connection setup
+WEAVIATE_POOL_SIZE = int(os.getenv("WEAVIATE_POOL_SIZE", "4"))                 # connections per process
+WEAVIATE_HEALTH_INTERVAL = float(os.getenv("WEAVIATE_HEALTH_INTERVAL", "30"))  # seconds idle before a re-check
+
+def is_healthy(client: Any) -> bool:
+    """
+    True if the server answers its readiness probe through this client.
+    """
+    try:
+        return bool(client.is_ready())
+    except Exception:
+        return False
+
+class ClientPool:
+    """
+    Up to `size` clients created by connect(), handed out one caller at a
+    time by connection(); callers beyond `size` wait for a free one.
+
+    A client idle for more than `health_interval` seconds, or that was in use
+    when an exception was raised, is health checked before it is used again
+    and replaced by a new connection if the check fails.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = WEAVIATE_POOL_SIZE,
+                 health_interval: float = WEAVIATE_HEALTH_INTERVAL):
+        self._connect = connect
+        self.size = max(1, size)
+        self.health_interval = health_interval
+        self._slots = threading.BoundedSemaphore(self.size)
+        # Most recently used first: fewer clients go idle long enough to need a check
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"connects": 0, "reconnects": 0, "health_checks": 0}
+
+    def _new_client(self) -> Any:
+        client = self._connect()
+        with self._lock:
+            self.stats["connects"] += 1
+        return client
+
+    def _discard(self, client: Any):
+        try:
+            client.close()
+        except Exception as e:
+            print(f"Error closing Weaviate client: {e}")
+
+    def _checkout(self) -> Any:
+        try:
+            client, last_used, suspect = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_client()
+        if suspect or time.monotonic() - last_used > self.health_interval:
+            with self._lock:
+                self.stats["health_checks"] += 1
+            if not is_healthy(client):
+                print("Weaviate connection failed its health check: reconnecting.")
+                self._discard(client)
+                client = self._new_client()
+                with self._lock:
+                    self.stats["reconnects"] += 1
+        return client
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        A pooled client for the duration of the block. Do not close it.
+        """
+        if self._closed:
+            raise RuntimeError("Weaviate client pool is closed")
+        self._slots.acquire()
+        client = None
+        suspect = False
+        try:
+            client = self._checkout()
+            yield client
+        except BaseException:
+            suspect = True
+            raise
+        finally:
+            if client is not None:
+                if self._closed:
+                    self._discard(client)
+                else:
+                    self._idle.put((client, time.monotonic(), suspect))
+            self._slots.release()
+
+    def close(self):
+        """
+        Closes the idle clients; clients in use are closed when returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                client, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": self.size, "idle": self._idle.qsize(), **self.stats}